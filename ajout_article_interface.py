@@ -1,12 +1,18 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 import sqlite3
+from executeur_bd import ExecuteurBD
+from cache_articles import maj_index_codes_barres, invalider_articles
+from gestion_stock import enregistrer_mouvements
+from gestion_articles import recuperer_codes_barres, calculer_marge_brute, calculer_prix_vente_ttc
 
 
 class AjouterModifierArticle:
-    def __init__(self, root, on_article_saved, mode="ajouter", article_data=None):
+    def __init__(self, root, on_article_saved, mode="ajouter", article_data=None, executeur=None):
         """
         Initialise la fenêtre pour ajouter ou modifier un article.
+        on_article_saved est appelée avec la liste des identifiants des articles sauvegardés.
+        executeur est l'ExecuteurBD de la fenêtre appelante ; à défaut, la fenêtre ouvre le sien.
         """
         self.root = root
         self.root.title("Ajouter un article" if mode == "ajouter" else "Modifier un article")
@@ -18,6 +24,12 @@ class AjouterModifierArticle:
         self.fields = {}
         self.codes_barres = []
 
+        # Accès à la base hors du thread de l'interface
+        self.executeur = executeur
+        if executeur is None:
+            self.executeur = ExecuteurBD(self.root)
+            self.root.bind("<Destroy>", self.sur_fermeture, add="+")
+
         self.create_form()
         if self.mode == "modifier":
             self.pre_remplir_champs()
@@ -57,9 +69,17 @@ class AjouterModifierArticle:
         tk.Button(button_frame, text="Supprimer Code-Barre", command=self.supprimer_code_barre).pack(side=tk.LEFT, padx=5)
 
         # Boutons d'action
-        tk.Button(self.root, text="Valider", command=self.sauvegarder_article).pack(side=tk.RIGHT, padx=10, pady=10)
+        self.bouton_valider = tk.Button(self.root, text="Valider", command=self.sauvegarder_article)
+        self.bouton_valider.pack(side=tk.RIGHT, padx=10, pady=10)
         tk.Button(self.root, text="Annuler", command=self.root.destroy).pack(side=tk.RIGHT, padx=10, pady=10)
 
+    def sur_fermeture(self, event):
+        """
+        Arrête l'exécuteur propre à la fenêtre à sa fermeture.
+        """
+        if event.widget is self.root:
+            self.executeur.arreter()
+
     def create_calculated_field(self, parent, label, row):
         var = tk.StringVar()
         tk.Label(parent, text=label).grid(row=row, column=0, sticky="w", pady=5)
@@ -82,10 +102,12 @@ class AjouterModifierArticle:
             prix_achat_ht = float(self.article_data.get('prix_achat_ht', 0.0))
             prix_vente_ht = float(self.article_data.get('prix_vente_ht', 0.0))
             tva = float(self.article_data.get('tva', 0.0))
+            # Le PMP enregistré est conservé ; le prix d'achat ne le remplace que s'il est vide
+            prix_moyen_pondere = float(self.article_data.get('prix_moyen_pondere') or 0.0) or prix_achat_ht
 
             # Recalcul des champs calculés
-            self.prix_moyen_pondere.set(f"{prix_achat_ht:.3f}")
-            marge_brute = ((prix_vente_ht - prix_achat_ht) / prix_achat_ht * 100) if prix_achat_ht > 0 else 0.0
+            self.prix_moyen_pondere.set(f"{prix_moyen_pondere:.3f}")
+            marge_brute = ((prix_vente_ht - prix_moyen_pondere) / prix_moyen_pondere * 100) if prix_moyen_pondere > 0 else 0.0
             self.marge_brute.set(f"{marge_brute:.3f}%")
             prix_ttc = prix_vente_ht * (1 + tva / 100)
             self.prix_vente_ttc.set(f"{prix_ttc:.3f}")
@@ -105,16 +127,16 @@ class AjouterModifierArticle:
         """
         self.codes_barres_listbox.delete(0, tk.END)
         if self.article_data.get("id"):
-            try:
-                conn = sqlite3.connect("appli.db")
-                cursor = conn.cursor()
-                cursor.execute("SELECT code_barre FROM code_barres WHERE article_id = ?", (self.article_data["id"],))
-                self.codes_barres = [row[0] for row in cursor.fetchall()]
-                conn.close()
-                for code in self.codes_barres:
-                    self.codes_barres_listbox.insert(tk.END, code)
-            except sqlite3.Error as e:
-                messagebox.showerror("Erreur", f"Erreur chargement codes-barres : {e}")
+            self.executeur.soumettre(
+                recuperer_codes_barres, self.article_data["id"], succes=self.afficher_codes_barres,
+                erreur=lambda e: messagebox.showerror("Erreur", f"Erreur chargement codes-barres : {e}")
+            )
+
+    def afficher_codes_barres(self, codes):
+        self.codes_barres = [code_barre for _, code_barre in codes]
+        self.codes_barres_listbox.delete(0, tk.END)
+        for code in self.codes_barres:
+            self.codes_barres_listbox.insert(tk.END, code)
 
     def ajouter_code_barre(self):
         code = simpledialog.askstring("Code-Barre", "Entrez un code-barre :")
@@ -132,76 +154,118 @@ class AjouterModifierArticle:
         """
         Sauvegarde l'article (ajout ou modification) dans la base de données.
         Gère également l'ajout des codes-barres associés.
+        L'écriture est faite par l'exécuteur ; la fenêtre reste utilisable pendant ce temps.
         """
-        try:
-            # Vérifier les champs obligatoires
-            if not self.fields["nom"].get():
-                messagebox.showerror("Erreur", "Le champ 'Nom' est obligatoire.")
-                return
-
-            # Collecte des données du formulaire
-            article = {key: var.get() for key, var in self.fields.items()}
-            article.update({
-                "prix_moyen_pondere": round(float(self.prix_moyen_pondere.get()), 3) if self.prix_moyen_pondere.get() else 0.0,
-                "marge_brute": round(float(self.marge_brute.get().replace("%", "")), 3) if self.marge_brute.get() else 0.0,
-                "prix_vente_ttc": round(float(self.prix_vente_ttc.get()), 3) if self.prix_vente_ttc.get() else 0.0
-            })
-
-            # Connexion à la base
-            conn = sqlite3.connect("appli.db")
-            cursor = conn.cursor()
-
-            if self.mode == "ajouter":
-                # Requête d'ajout d'article
-                cursor.execute("""
-                    INSERT INTO articles (nom, categorie, sous_categorie, description, stock, stock_minimum,
-                                        fournisseur, ref_fournisseur, prix_achat_ht, tva, prix_vente_ht,
-                                        prix_moyen_pondere, marge_brute, prix_vente_ttc)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    article["nom"], article.get("categorie"), article.get("sous_categorie"), article.get("description"),
-                    article.get("stock", 0), article.get("stock_minimum", 0), article.get("fournisseur"),
-                    article.get("ref_fournisseur"), round(article.get("prix_achat_ht", 0.0), 3),
-                    round(article.get("tva", 0.0), 3), round(article.get("prix_vente_ht", 0.0), 3),
-                    article.get("prix_moyen_pondere", 0.0), article.get("marge_brute", 0.0),
-                    article.get("prix_vente_ttc", 0.0)
-                ))
-                article_id = cursor.lastrowid  # Récupérer l'ID de l'article inséré
-            else:
-                # Requête de modification d'article
-                cursor.execute("""
-                    UPDATE articles SET
-                        nom = ?, categorie = ?, sous_categorie = ?, description = ?, stock = ?, stock_minimum = ?,
-                        fournisseur = ?, ref_fournisseur = ?, prix_achat_ht = ?, tva = ?, prix_vente_ht = ?,
-                        prix_moyen_pondere = ?, marge_brute = ?, prix_vente_ttc = ?
-                    WHERE id = ?
-                """, (
-                    article["nom"], article.get("categorie"), article.get("sous_categorie"), article.get("description"),
-                    article.get("stock", 0), article.get("stock_minimum", 0), article.get("fournisseur"),
-                    article.get("ref_fournisseur"), round(article.get("prix_achat_ht", 0.0), 3),
-                    round(article.get("tva", 0.0), 3), round(article.get("prix_vente_ht", 0.0), 3),
-                    article.get("prix_moyen_pondere", 0.0), article.get("marge_brute", 0.0),
-                    article.get("prix_vente_ttc", 0.0), self.article_data["id"]
-                ))
-                article_id = self.article_data["id"]
-
-                # Supprimer les anciens codes-barres associés
-                cursor.execute("DELETE FROM code_barres WHERE article_id = ?", (article_id,))
-
-            # Insérer les nouveaux codes-barres
-            for code_barre in self.codes_barres:
-                cursor.execute("""
-                    INSERT INTO code_barres (article_id, code_barre)
-                    VALUES (?, ?)
-                """, (article_id, code_barre))
-
-            # Sauvegarder et fermer
-            conn.commit()
-            conn.close()
-
-            messagebox.showinfo("Succès", "Article sauvegardé avec succès avec les codes-barres.")
-            self.on_article_saved()
-            self.root.destroy()
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Erreur", f"Impossible de sauvegarder l'article : {e}")
+        # Vérifier les champs obligatoires
+        if not self.fields["nom"].get():
+            messagebox.showerror("Erreur", "Le champ 'Nom' est obligatoire.")
+            return
+
+        # Collecte des données du formulaire
+        article = {key: var.get() for key, var in self.fields.items()}
+        article.update({
+            "prix_moyen_pondere": round(float(self.prix_moyen_pondere.get()), 3) if self.prix_moyen_pondere.get() else 0.0,
+            "marge_brute": round(float(self.marge_brute.get().replace("%", "")), 3) if self.marge_brute.get() else 0.0,
+            "prix_vente_ttc": round(float(self.prix_vente_ttc.get()), 3) if self.prix_vente_ttc.get() else 0.0
+        })
+        # Le stock de la grille peut dater : il n'est envoyé que si l'utilisateur l'a modifié
+        if self.mode == "modifier" and article["stock"] == int(self.article_data.get("stock") or 0):
+            del article["stock"]
+
+        self.bouton_valider.config(state="disabled")
+        self.executeur.soumettre(enregistrer_article, self.mode, article, self.article_data.get("id"),
+                                 list(self.codes_barres), succes=self.sur_article_sauvegarde,
+                                 erreur=self.sur_erreur_sauvegarde)
+
+    def sur_article_sauvegarde(self, article_id):
+        messagebox.showinfo("Succès", "Article sauvegardé avec succès avec les codes-barres.")
+        self.on_article_saved([article_id])
+        self.root.destroy()
+
+    def sur_erreur_sauvegarde(self, erreur):
+        self.bouton_valider.config(state="normal")
+        messagebox.showerror("Erreur", f"Impossible de sauvegarder l'article : {erreur}")
+
+
+def enregistrer_article(conn, mode, article, article_id, codes_barres):
+    """
+    Ajoute ou modifie un article et remplace ses codes-barres, dans une transaction.
+    Exécutée par le thread de l'exécuteur.
+    En modification, le stock n'est écrit que s'il figure dans `article`, et le prix moyen pondéré
+    et la marge sont recalculés depuis la base comme dans gestion_articles.modifier_article.
+    :return: Identifiant de l'article.
+    """
+    try:
+        cursor = conn.cursor()
+
+        if mode == "ajouter":
+            # Requête d'ajout d'article
+            cursor.execute("""
+                INSERT INTO articles (nom, categorie, sous_categorie, description, stock, stock_minimum,
+                                    fournisseur, ref_fournisseur, prix_achat_ht, tva, prix_vente_ht,
+                                    prix_moyen_pondere, marge_brute, prix_vente_ttc)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                article["nom"], article.get("categorie"), article.get("sous_categorie"), article.get("description"),
+                article.get("stock", 0), article.get("stock_minimum", 0), article.get("fournisseur"),
+                article.get("ref_fournisseur"), round(article.get("prix_achat_ht", 0.0), 3),
+                round(article.get("tva", 0.0), 3), round(article.get("prix_vente_ht", 0.0), 3),
+                article.get("prix_moyen_pondere", 0.0), article.get("marge_brute", 0.0),
+                article.get("prix_vente_ttc", 0.0)
+            ))
+            article_id = cursor.lastrowid  # Récupérer l'ID de l'article inséré
+            anciens_codes = []
+            enregistrer_mouvements(cursor, [(article_id, "ouverture", article.get("stock", 0), None)])
+        else:
+            # Un stock modifié dans le formulaire est consigné comme ajustement
+            if "stock" in article:
+                cursor.execute("SELECT stock FROM articles WHERE id = ?", (article_id,))
+                ancien_stock = (cursor.fetchone() or (0,))[0] or 0
+                enregistrer_mouvements(cursor, [(article_id, "ajustement", article["stock"] - ancien_stock, None)])
+
+            # Requête de modification d'article : un stock absent garde sa valeur
+            cursor.execute("""
+                UPDATE articles SET
+                    nom = ?, categorie = ?, sous_categorie = ?, description = ?, stock = COALESCE(?, stock),
+                    stock_minimum = ?, fournisseur = ?, ref_fournisseur = ?, prix_achat_ht = ?, tva = ?,
+                    prix_vente_ht = ?
+                WHERE id = ?
+            """, (
+                article["nom"], article.get("categorie"), article.get("sous_categorie"), article.get("description"),
+                article.get("stock"), article.get("stock_minimum", 0), article.get("fournisseur"),
+                article.get("ref_fournisseur"), round(article.get("prix_achat_ht", 0.0), 3),
+                round(article.get("tva", 0.0), 3), round(article.get("prix_vente_ht", 0.0), 3), article_id
+            ))
+
+            # Recalculer les champs dérivés depuis la base : le PMP est tenu par les réceptions
+            cursor.execute("""
+                SELECT prix_achat_ht, prix_vente_ht, tva, prix_moyen_pondere FROM articles WHERE id = ?
+            """, (article_id,))
+            prix_achat_ht, prix_vente_ht, tva, prix_moyen_pondere = cursor.fetchone()
+            prix_moyen_pondere = prix_moyen_pondere or prix_achat_ht
+            cursor.execute("""
+                UPDATE articles SET prix_moyen_pondere = ?, marge_brute = ?, prix_vente_ttc = ?
+                WHERE id = ?
+            """, (prix_moyen_pondere, calculer_marge_brute(prix_vente_ht, prix_moyen_pondere),
+                  calculer_prix_vente_ttc(prix_vente_ht, tva), article_id))
+
+            # Supprimer les anciens codes-barres associés
+            cursor.execute("DELETE FROM code_barres WHERE article_id = ? RETURNING code_barre", (article_id,))
+            anciens_codes = [row[0] for row in cursor.fetchall()]
+
+        # Insérer les nouveaux codes-barres
+        for code_barre in codes_barres:
+            cursor.execute("""
+                INSERT INTO code_barres (article_id, code_barre)
+                VALUES (?, ?)
+            """, (article_id, code_barre))
+
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    # Mettre à jour les caches d'articles
+    invalider_articles(conn, [article_id])
+    maj_index_codes_barres(conn, ajoutes=[(code, article_id) for code in codes_barres], supprimes=anciens_codes)
+    return article_id
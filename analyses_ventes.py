@@ -0,0 +1,332 @@
+import json
+import os
+from datetime import date
+from base_donnees import CHEMIN_BASE
+from gestion_caisse import ETATS_COMPTABILISES, lister_archives_ventes, interroger_archives
+
+try:
+    import numpy as np
+except ImportError:  # Dépendance facultative : seules les analyses en ont besoin
+    np = None
+
+
+# Colonnes chargées depuis DES (et l'entête DAT de chaque ligne), avec leur type NumPy
+COLONNES = {
+    "des_id": "int64",
+    "doc_id": "int64",
+    "article_id": "int64",
+    "jour": "int32",          # date.toordinal() de DAT.doc_date
+    "quantite": "float64",
+    "total_ht": "float64",
+    "total_ttc": "float64",
+    "doc_type": "int8",
+    "etat": "int8",           # Dernier état connu du document
+}
+
+# Factures et BL : les devis ne sont pas des ventes
+TYPES_VENTES = (1, 2)
+
+TAILLE_LECTURE = 50000
+
+
+def _verifier_numpy():
+    if np is None:
+        raise ImportError("Les analyses des ventes nécessitent NumPy (pip install numpy).")
+
+
+def _ordinal(jour):
+    """
+    Convertit une date (date ou 'AAAA-MM-JJ') en ordinal, comme la colonne jour.
+    """
+    if isinstance(jour, str):
+        jour = date.fromisoformat(jour)
+    return jour.toordinal()
+
+
+class AnalysesVentes:
+    """
+    Lignes de ventes (DES) en colonnes NumPy, pour des agrégations sur plusieurs années sans requête SQL.
+
+    Les colonnes sont enregistrées dans un dossier à côté de la base (un fichier binaire brut par colonne,
+    le nombre de lignes valides dans meta.json) et rouvertes en mémoire projetée (mmap) au lancement suivant.
+    rafraichir() ne lit que les lignes dont l'id dépasse la dernière chargée, en lisant aussi les archives
+    des ventes si nécessaire, et les ajoute en fin de fichier sans réécrire les précédentes.
+    L'état des documents, qui peut changer après coup (modifier_etat_vente), est corrigé sur place pour
+    les seuls documents apparus dans journal_etats_ventes depuis le dernier passage ; celui des documents
+    archivés est figé.
+    """
+
+    def __init__(self, chemin_base=CHEMIN_BASE, dossier=None):
+        """
+        :param dossier: Dossier des fichiers de colonnes (par défaut <base>.analyses), None avec une base
+                        en mémoire : les colonnes ne sont alors pas persistées.
+        """
+        _verifier_numpy()
+        if dossier is None and chemin_base != ":memory:":
+            dossier = f"{chemin_base}.analyses"
+        self.dossier = dossier
+        self.colonnes = {nom: np.empty(0, dtype=type_) for nom, type_ in COLONNES.items()}
+        self.dernier_des_id = 0
+        self.dernier_journal_id = None  # Dernière entrée de journal_etats_ventes appliquée
+        self._etats_a_jour = False
+        self.charger()
+
+    def __len__(self):
+        return len(self.colonnes["des_id"])
+
+    def _chemin(self, nom):
+        return os.path.join(self.dossier, f"{nom}.col")
+
+    def _ouvrir(self, lignes):
+        """
+        Ouvre les `lignes` premières valeurs de chaque fichier de colonne en mémoire projetée ;
+        la colonne etat l'est en écriture, pour être corrigée sur place.
+        """
+        if not lignes:
+            return {nom: np.empty(0, dtype=type_) for nom, type_ in COLONNES.items()}
+        return {nom: np.memmap(self._chemin(nom), dtype=type_, mode="r+" if nom == "etat" else "r",
+                               shape=(lignes,))
+                for nom, type_ in COLONNES.items()}
+
+    def charger(self):
+        """
+        Ouvre les colonnes enregistrées en mémoire projetée, si elles existent et sont complètes.
+        Les valeurs écrites après le dernier meta.json (enregistrement interrompu) sont tronquées.
+        :return: Vrai si des colonnes ont été chargées.
+        """
+        if not self.dossier or not os.path.exists(os.path.join(self.dossier, "meta.json")):
+            return False
+        try:
+            with open(os.path.join(self.dossier, "meta.json"), encoding="utf-8") as fichier:
+                meta = json.load(fichier)
+            lignes = meta["lignes"]
+            for nom, type_ in COLONNES.items():
+                taille = lignes * np.dtype(type_).itemsize
+                if os.path.getsize(self._chemin(nom)) < taille:
+                    return False
+                if os.path.getsize(self._chemin(nom)) > taille:
+                    os.truncate(self._chemin(nom), taille)
+            colonnes = self._ouvrir(lignes)
+        except (OSError, ValueError, KeyError):
+            return False
+        self.colonnes = colonnes
+        self.dernier_des_id = meta["dernier_des_id"]
+        self.dernier_journal_id = meta.get("dernier_journal_id")
+        return True
+
+    def _enregistrer_meta(self):
+        """
+        Écrit meta.json (fichier temporaire remplacé en dernier) : seules les lignes qu'il compte sont valides.
+        """
+        os.makedirs(self.dossier, exist_ok=True)
+        temporaire = os.path.join(self.dossier, "meta.json.tmp")
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            json.dump({"dernier_des_id": self.dernier_des_id, "lignes": len(self),
+                       "dernier_journal_id": self.dernier_journal_id}, fichier)
+        os.replace(temporaire, os.path.join(self.dossier, "meta.json"))
+
+    def _ajouter(self, ajouts):
+        """
+        Ajoute des lignes en fin de colonnes : en fin de fichier, sans toucher aux lignes déjà
+        enregistrées (ni aux fichiers projetés en mémoire), ou en mémoire sans dossier.
+        Des colonnes vides (premier chargement, base recréée) remplacent les fichiers existants.
+        :param ajouts: Dictionnaire {colonne: tableau des nouvelles valeurs}.
+        """
+        if not self.dossier:
+            self.colonnes = {nom: np.concatenate([self.colonnes[nom], ajouts[nom]]) for nom in COLONNES}
+            return
+        os.makedirs(self.dossier, exist_ok=True)
+        mode = "ab" if len(self) else "wb"
+        lignes = len(self) + len(ajouts["des_id"])
+        for nom in COLONNES:
+            with open(self._chemin(nom), mode) as fichier:
+                fichier.write(ajouts[nom].tobytes())
+        self.colonnes = self._ouvrir(lignes)
+
+    def _corriger_etats(self, doc_ids, etats):
+        """
+        Donne aux lignes des documents doc_ids (triés, distincts) l'état correspondant de `etats`.
+        """
+        colonne_docs = self.colonnes["doc_id"]
+        positions = np.nonzero(np.isin(colonne_docs, doc_ids))[0]
+        if not len(positions):
+            return
+        self.colonnes["etat"][positions] = etats[np.searchsorted(doc_ids, colonne_docs[positions])]
+        if isinstance(self.colonnes["etat"], np.memmap):
+            self.colonnes["etat"].flush()
+
+    def _reinitialiser(self):
+        self.colonnes = {nom: np.empty(0, dtype=type_) for nom, type_ in COLONNES.items()}
+        self.dernier_des_id = 0
+        self.dernier_journal_id = None
+
+    def rafraichir(self, conn):
+        """
+        Ajoute les lignes de DES créées depuis le dernier chargement, puis corrige l'état des documents
+        modifiés depuis, d'après journal_etats_ventes (ou en relisant tout DAT si le journal manque).
+        :return: Nombre de lignes ajoutées.
+        """
+        cursor = conn.cursor()
+        # Plus grand DES.id jamais attribué, y compris pour des lignes archivées depuis
+        cursor.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'DES'), 0)")
+        if cursor.fetchone()[0] < self.dernier_des_id:
+            self._reinitialiser()  # Base recréée ou restaurée : tout est rechargé
+
+        requete = """
+            SELECT s.id, s.doc_id, s.article_id,
+                   COALESCE(CAST(julianday(d.doc_date) - 1721424.5 AS INTEGER), 0),
+                   s.quantite, s.prix_total_ht, s.prix_total_ttc, CAST(d.doc_type AS INTEGER), d.etat
+            FROM {schema}.DES s JOIN {schema}.DAT d ON d.id = s.doc_id
+            WHERE s.id > ?
+        """
+        # Lignes archivées depuis le dernier chargement (en pratique : premier chargement après un archivage)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                       "AND name IN ('archives_ventes', 'journal_etats_ventes')")
+        tables = {nom for nom, in cursor.fetchall()}
+        annees = set()
+        if "archives_ventes" in tables:
+            cursor.execute("SELECT annee FROM archives_ventes WHERE dernier_des_id > ?", (self.dernier_des_id,))
+            annees = {annee for annee, in cursor.fetchall()}
+        archives = [archive for archive in lister_archives_ventes(conn) if archive[0] in annees]
+        lignes = interroger_archives(conn, archives, requete.format(schema="archive"), (self.dernier_des_id,))
+        cursor.execute(requete.format(schema="main"), (self.dernier_des_id,))
+        lignes += cursor.fetchall()
+        lignes.sort()
+
+        if lignes:
+            self._ajouter({nom: np.array(valeurs, dtype=COLONNES[nom])
+                           for nom, valeurs in zip(COLONNES, zip(*lignes))})
+            self.dernier_des_id = int(self.colonnes["des_id"][-1])
+
+        # Les lignes lues ci-dessus ont l'état du moment : seuls les changements postérieurs
+        # au dernier passage restent à appliquer, le dernier de chaque document l'emportant
+        journal_lu = self.dernier_journal_id
+        if "journal_etats_ventes" in tables and self.dernier_journal_id is not None:
+            cursor.execute("SELECT id, doc_id, etat FROM journal_etats_ventes WHERE id > ? ORDER BY id",
+                           (self.dernier_journal_id,))
+            changements = {}
+            for journal_lu, doc_id, etat in cursor.fetchall():
+                changements[doc_id] = etat
+            if changements:
+                doc_ids = np.array(sorted(changements), dtype="int64")
+                self._corriger_etats(doc_ids, np.array([changements[doc_id] for doc_id in doc_ids], dtype="int8"))
+        else:
+            # Premier passage, ou base sans journal : états relus dans DAT, journal repris à sa fin
+            if "journal_etats_ventes" in tables:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM journal_etats_ventes")
+                journal_lu = cursor.fetchone()[0]
+            self._relire_etats(cursor)
+
+        modifie = lignes or journal_lu != self.dernier_journal_id
+        self.dernier_journal_id = journal_lu
+        if self.dossier and modifie:
+            self._enregistrer_meta()
+        self._etats_a_jour = True
+        return len(lignes)
+
+    def _relire_etats(self, cursor):
+        """
+        Relit l'état de tous les documents encore dans DAT et corrige les lignes dont l'état a changé.
+        """
+        # États actuels des documents encore dans DAT, indexés par DAT.id (-1 : document absent)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM DAT")
+        etats_docs = np.full(cursor.fetchone()[0] + 1, -1, dtype="int8")
+        cursor.execute("SELECT id, etat FROM DAT")
+        while True:
+            lots = cursor.fetchmany(TAILLE_LECTURE)
+            if not lots:
+                break
+            ids, etats = zip(*lots)
+            etats_docs[np.array(ids, dtype="int64")] = np.array(etats, dtype="int8")
+        doc_ids = np.asarray(self.colonnes["doc_id"])
+        connus = doc_ids < len(etats_docs)
+        actuels = np.full(len(doc_ids), -1, dtype="int8")
+        actuels[connus] = etats_docs[doc_ids[connus]]
+        positions = np.nonzero((actuels >= 0) & (actuels != self.colonnes["etat"]))[0]
+        if len(positions):
+            self.colonnes["etat"][positions] = actuels[positions]
+            if isinstance(self.colonnes["etat"], np.memmap):
+                self.colonnes["etat"].flush()
+
+    def _masque(self, debut=None, fin=None, doc_types=TYPES_VENTES):
+        """
+        Sélectionne les lignes des documents comptabilisés de type doc_types entre debut et fin inclus.
+        """
+        if not self._etats_a_jour:
+            raise RuntimeError("Les analyses doivent être rafraîchies avant d'être interrogées.")
+        masque = np.isin(self.colonnes["etat"], ETATS_COMPTABILISES) & np.isin(self.colonnes["doc_type"], doc_types)
+        if debut is not None:
+            masque &= self.colonnes["jour"] >= _ordinal(debut)
+        if fin is not None:
+            masque &= self.colonnes["jour"] <= _ordinal(fin)
+        return masque
+
+    def _par_article(self, valeurs, masque):
+        """
+        Somme des valeurs par article_id (tableau indexé par article_id).
+        """
+        article_ids = self.colonnes["article_id"][masque]
+        if not len(article_ids):
+            return np.zeros(0)
+        return np.bincount(article_ids, weights=valeurs[masque])
+
+    def top_articles(self, n=10, debut=None, fin=None, critere="quantite", doc_types=TYPES_VENTES):
+        """
+        Retourne les n articles les plus vendus sur la période.
+        :param critere: "quantite" ou "total_ht" (chiffre d'affaires HT).
+        :return: Liste de (article_id, valeur) par valeur décroissante.
+        """
+        if critere not in ("quantite", "total_ht", "total_ttc"):
+            raise ValueError(f"Critère inconnu : {critere}")
+        sommes = self._par_article(self.colonnes[critere], self._masque(debut, fin, doc_types))
+        ordre = np.argsort(-sommes, kind="stable")[:n]
+        return [(int(article_id), float(sommes[article_id])) for article_id in ordre if sommes[article_id] > 0]
+
+    def vitesse_ventes(self, jours=30, fin=None, doc_types=TYPES_VENTES):
+        """
+        Quantité moyenne vendue par jour de chaque article sur les `jours` jours se terminant à `fin`.
+        :return: Dictionnaire {article_id: quantité par jour}.
+        """
+        fin = _ordinal(fin or date.today())
+        debut = fin - jours + 1
+        masque = self._masque(doc_types=doc_types)
+        masque &= (self.colonnes["jour"] >= debut) & (self.colonnes["jour"] <= fin)
+        sommes = self._par_article(self.colonnes["quantite"], masque)
+        article_ids = np.nonzero(sommes)[0]
+        return {int(article_id): float(sommes[article_id]) / jours for article_id in article_ids}
+
+    def classification_abc(self, debut=None, fin=None, seuils=(0.8, 0.95), doc_types=TYPES_VENTES):
+        """
+        Classe les articles vendus selon leur part cumulée du chiffre d'affaires HT :
+        A jusqu'à seuils[0], B jusqu'à seuils[1], C au-delà.
+        :return: Dictionnaire {article_id: "A" | "B" | "C"}.
+        """
+        sommes = self._par_article(self.colonnes["total_ht"], self._masque(debut, fin, doc_types))
+        article_ids = np.nonzero(sommes > 0)[0]
+        if not len(article_ids):
+            return {}
+        ordre = article_ids[np.argsort(-sommes[article_ids], kind="stable")]
+        # Part cumulée avant l'article : le premier article qui franchit un seuil reste dans la classe
+        parts = (np.cumsum(sommes[ordre]) - sommes[ordre]) / sommes[ordre].sum()
+        classes = np.where(parts < seuils[0], "A", np.where(parts < seuils[1], "B", "C"))
+        return {int(article_id): str(classe) for article_id, classe in zip(ordre, classes)}
+
+    def marge_par_categorie(self, conn, debut=None, fin=None, doc_types=TYPES_VENTES):
+        """
+        Chiffre d'affaires HT et marge par catégorie d'article. DES ne conservant pas le coût
+        des lignes, la marge est estimée avec le prix moyen pondéré actuel des articles.
+        :return: Dictionnaire {categorie: (total_ht, marge)}.
+        """
+        masque = self._masque(debut, fin, doc_types)
+        ventes = self._par_article(self.colonnes["total_ht"], masque)
+        quantites = self._par_article(self.colonnes["quantite"], masque)
+        resultat = {}
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, categorie, COALESCE(prix_moyen_pondere, prix_achat_ht, 0) FROM articles")
+        for article_id, categorie, prix_moyen_pondere in cursor.fetchall():
+            if article_id >= len(ventes) or not quantites[article_id]:
+                continue
+            total_ht, marge = resultat.get(categorie, (0.0, 0.0))
+            resultat[categorie] = (total_ht + ventes[article_id],
+                                   marge + ventes[article_id] - quantites[article_id] * prix_moyen_pondere)
+        return {categorie: (round(total_ht, 3), round(marge, 3)) for categorie, (total_ht, marge) in resultat.items()}
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+from datetime import datetime
+from base_donnees import chemin_base, attacher_base, detacher_base
+
+
+# Index des tables archivées (le schéma 'archive' est la base de l'année attachée)
+INDEX_ARCHIVE = """
+    CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_dat_doc_num ON DAT (doc_num);
+    CREATE INDEX IF NOT EXISTS archive.idx_dat_date_etat ON DAT (doc_date, etat);
+    CREATE INDEX IF NOT EXISTS archive.idx_dat_client ON DAT (client_id);
+    CREATE INDEX IF NOT EXISTS archive.idx_des_doc ON DES (doc_id);
+    CREATE INDEX IF NOT EXISTS archive.idx_des_article ON DES (article_id);
+"""
+
+
+def initialiser_archives_ventes(conn, lever=False):
+    """
+    Initialise le registre des bases d'archive des ventes : une base par année,
+    dans le dossier de la base principale.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archives_ventes (
+                annee INTEGER PRIMARY KEY,
+                fichier TEXT NOT NULL, -- relatif au dossier de la base principale
+                nb_documents INTEGER NOT NULL DEFAULT 0,
+                dernier_des_id INTEGER NOT NULL DEFAULT 0, -- plus grand DES.id archivé
+                date_archivage TEXT
+            )
+        """)
+        conn.commit()
+    except sqlite3.Error as e:
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation des archives des ventes : {e}")
+
+
+def fichier_archive(conn, annee):
+    """
+    Nom du fichier d'archive d'une année, ex. appli.archive-2023.db pour appli.db.
+    """
+    racine = os.path.splitext(os.path.basename(chemin_base(conn)))[0]
+    return f"{racine}.archive-{annee}.db"
+
+
+def _preparer_archive(conn, table):
+    """
+    Crée (ou complète) la table dans la base attachée 'archive' avec les colonnes de la table principale,
+    sans les clés étrangères : clients et articles restent dans la base principale.
+    :return: Liste des colonnes de la table principale.
+    """
+    colonnes = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    existantes = {ligne[1] for ligne in conn.execute(f"PRAGMA archive.table_info({table})")}
+    definitions = []
+    for _, nom, type_, notnull, defaut, cle in colonnes:
+        definition = f"{nom} {type_}"
+        if cle:
+            definition += " PRIMARY KEY"
+        elif notnull:
+            definition += " NOT NULL"
+        if defaut is not None:
+            definition += f" DEFAULT {defaut}"
+        definitions.append((nom, definition))
+
+    if not existantes:
+        conn.execute(f"CREATE TABLE archive.{table} ({', '.join(definition for _, definition in definitions)})")
+    else:
+        for nom, definition in definitions:
+            if nom not in existantes:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {definition.replace(' NOT NULL', '')}")
+    return [ligne[1] for ligne in colonnes]
+
+
+def archiver_ventes(conn, date_cloture=None, compacter=False):
+    """
+    Déplace de DAT et DES vers les bases d'archive annuelles les documents archivés (etat 2)
+    et tous les documents des périodes closes (jusqu'à date_cloture incluse), avec leurs lignes.
+
+    Le résumé des ventes reste dans la base principale : les rapports ne changent pas.
+    Chaque année est traitée en une transaction ; les copies étant faites par INSERT OR REPLACE,
+    un archivage interrompu peut être relancé sans risque.
+
+    :param date_cloture: Dernière date (AAAA-MM-JJ) de la période close, ou None pour les seuls documents archivés.
+    :param compacter: Si vrai, la base principale est compactée (VACUUM) après l'archivage.
+    :return: Dictionnaire {annee: nombre de documents déplacés}.
+    """
+    if not chemin_base(conn):
+        raise ValueError("L'archivage nécessite une base enregistrée dans un fichier.")
+    dossier = os.path.dirname(chemin_base(conn))
+    initialiser_archives_ventes(conn)
+
+    condition = "(etat = 2 OR doc_date <= ?)"
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT DISTINCT substr(doc_date, 1, 4) FROM DAT WHERE {condition} ORDER BY 1",
+                   (date_cloture or "",))
+    annees = [int(annee) for annee, in cursor.fetchall()]
+
+    deplaces = {}
+    for annee in annees:
+        fichier = fichier_archive(conn, annee)
+        attacher_base(conn, os.path.join(dossier, fichier), "archive")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            colonnes_dat = ", ".join(_preparer_archive(conn, "DAT"))
+            colonnes_des = ", ".join(_preparer_archive(conn, "DES"))
+            for instruction in INDEX_ARCHIVE.split(";"):  # executescript validerait la transaction
+                if instruction.strip():
+                    conn.execute(instruction)
+
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS docs_a_archiver (id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.docs_a_archiver")
+            conn.execute(f"""
+                INSERT INTO temp.docs_a_archiver (id)
+                SELECT id FROM main.DAT WHERE {condition} AND doc_date >= ? AND doc_date < ?
+            """, (date_cloture or "", f"{annee:04d}", f"{annee + 1:04d}"))
+            selection = "SELECT id FROM temp.docs_a_archiver"
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.DAT ({colonnes_dat})
+                SELECT {colonnes_dat} FROM main.DAT WHERE id IN ({selection})
+            """)
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.DES ({colonnes_des})
+                SELECT {colonnes_des} FROM main.DES WHERE doc_id IN ({selection})
+            """)
+            conn.execute(f"DELETE FROM main.DES WHERE doc_id IN ({selection})")
+            deplaces[annee] = conn.execute(f"DELETE FROM main.DAT WHERE id IN ({selection})").rowcount
+
+            conn.execute("""
+                INSERT INTO archives_ventes (annee, fichier, nb_documents, dernier_des_id, date_archivage)
+                VALUES (?, ?, (SELECT COUNT(*) FROM archive.DAT), (SELECT COALESCE(MAX(id), 0) FROM archive.DES), ?)
+                ON CONFLICT (annee) DO UPDATE SET
+                    fichier = excluded.fichier,
+                    nb_documents = excluded.nb_documents,
+                    dernier_des_id = excluded.dernier_des_id,
+                    date_archivage = excluded.date_archivage
+            """, (annee, fichier, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            detacher_base(conn, "archive")
+
+    if compacter and deplaces:
+        conn.execute("VACUUM")
+    return deplaces
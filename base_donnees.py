@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+import time
+import weakref
+
+
+CHEMIN_BASE = "appli.db"
+
+# Réglages appliqués à chaque connexion ouverte par ce module.
+PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -65536,        # 64 Mo de cache de pages (valeur négative = Kio)
+    "mmap_size": 268435456,      # 256 Mo lus via mmap
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+_local = threading.local()
+_registres = {}
+_verrou_registres = threading.Lock()
+
+
+class Connexion(sqlite3.Connection):
+    """
+    Connexion SQLite portant le registre de caches partagé par les connexions d'un même fichier.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.registre_caches = {}
+
+
+_fabrique = Connexion
+
+# Intervalle minimal (secondes) entre deux vérifications des modifications faites par d'autres connexions
+DELAI_VERIFICATION = 1.0
+
+
+class SuiviModifications:
+    """
+    Détecte, pour un cache en mémoire, les modifications validées par d'autres connexions
+    (autres caisses, autres processus) grâce à PRAGMA data_version, qui change sur une connexion
+    à chaque validation d'une autre connexion. La vérification coûte une requête et n'est faite
+    qu'au plus une fois par `delai` secondes et par connexion.
+    """
+
+    def __init__(self, delai=DELAI_VERIFICATION):
+        """
+        :param delai: Intervalle minimal entre deux vérifications ; 0 pour vérifier à chaque appel,
+                      pour un cache qui ne doit jamais servir une valeur périmée.
+        """
+        self.delai = delai
+        self.verifications = weakref.WeakKeyDictionary()  # connexion -> (data_version, instant)
+        self.verifications_par_id = {}  # id(connexion) -> idem, pour les sqlite3.Connection de base
+
+    def modifiee(self, conn):
+        """
+        Indique si la base a pu être modifiée par une autre connexion depuis la dernière vérification
+        faite sur celle-ci ; toujours vrai au premier appel pour une connexion.
+        """
+        maintenant = time.monotonic()
+        # Une sqlite3.Connection de base n'accepte pas les références faibles
+        if isinstance(conn, Connexion):
+            verifications, cle = self.verifications, conn
+        else:
+            verifications, cle = self.verifications_par_id, id(conn)
+        data_version, verifie_a = verifications.get(cle, (None, 0.0))
+        if data_version is not None and maintenant - verifie_a < self.delai:
+            return False
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        verifications[cle] = (version, maintenant)
+        return version != data_version
+
+
+def chemin_base(conn):
+    """
+    Retourne le chemin du fichier de la base principale ('' pour une base en mémoire).
+    """
+    for _, nom, fichier in conn.execute("PRAGMA database_list"):
+        if nom == "main":
+            return fichier or ""
+    return ""
+
+
+def _registre_pour(cle):
+    with _verrou_registres:
+        return _registres.setdefault(cle, {})
+
+
+def registre_caches(conn):
+    """
+    Retourne le dictionnaire des caches en mémoire associés à la base de la connexion.
+    Toutes les connexions ouvertes sur un même fichier partagent le même registre.
+    Une base en mémoire ouverte hors de ce module n'a pas de registre durable.
+    """
+    if isinstance(conn, Connexion):
+        return conn.registre_caches
+    fichier = chemin_base(conn)
+    return _registre_pour(fichier) if fichier else {}
+
+
+def configurer_connexion(conn):
+    """
+    Active le journal WAL et les pragmas de performance sur une connexion existante.
+    """
+    if chemin_base(conn):
+        conn.execute("PRAGMA journal_mode = WAL")
+    for pragma, valeur in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {valeur}")
+    return conn
+
+
+def definir_fabrique_connexion(fabrique):
+    """
+    Choisit la classe (sous-classe de Connexion) des connexions ouvertes ensuite,
+    par exemple les connexions instrumentées du module instrumentation.
+    """
+    global _fabrique
+    _fabrique = fabrique
+
+
+def ouvrir_connexion(chemin=CHEMIN_BASE, timeout=5.0):
+    """
+    Ouvre une nouvelle connexion configurée sur la base donnée.
+    """
+    conn = sqlite3.connect(chemin, timeout=timeout, factory=_fabrique, cached_statements=256)
+    configurer_connexion(conn)
+    fichier = chemin_base(conn)
+    conn.registre_caches = _registre_pour(fichier) if fichier else {}
+    return conn
+
+
+def obtenir_connexion(chemin=CHEMIN_BASE):
+    """
+    Retourne la connexion partagée du thread courant pour la base donnée,
+    en l'ouvrant au premier appel.
+    """
+    connexions = getattr(_local, "connexions", None)
+    if connexions is None:
+        connexions = _local.connexions = {}
+    conn = connexions.get(chemin)
+    if conn is None:
+        conn = connexions[chemin] = ouvrir_connexion(chemin)
+    return conn
+
+
+def attacher_base(conn, chemin, alias):
+    """
+    Attache une autre base à la connexion sous le nom `alias` (hors transaction).
+    """
+    conn.execute(f"ATTACH DATABASE ? AS {alias}", (chemin,))
+
+
+def detacher_base(conn, alias):
+    conn.execute(f"DETACH DATABASE {alias}")
+
+
+def fermer_connexions():
+    """
+    Ferme les connexions partagées du thread courant.
+    """
+    connexions = getattr(_local, "connexions", {})
+    for conn in connexions.values():
+        conn.close()
+    connexions.clear()
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from base_donnees import ouvrir_connexion
+from cache_articles import article_par_code_barre, charger_index_codes_barres
+from gestion_articles import lister_articles_page
+from gestion_caisse import creer_vente, rapport_journalier, rechercher_vente
+from gestion_clients import rechercher_client
+from recherche_clients import chercher_clients, invalider_recherche_clients
+from recherche_articles import rechercher_articles
+from generateur_donnees import ECHELLES, generer_base
+
+
+def mesurer(fonction, valeurs, repetitions):
+    """
+    Chronomètre fonction(valeur) pour chaque valeur, `repetitions` fois par valeur.
+    :return: Dictionnaire de statistiques en millisecondes (appels, min, mediane, p95, moyenne).
+    """
+    durees = []
+    for _ in range(repetitions):
+        for valeur in valeurs:
+            debut = time.perf_counter()
+            fonction(valeur)
+            durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return {
+        "appels": len(durees),
+        "min": round(durees[0], 4),
+        "mediane": round(statistics.median(durees), 4),
+        "p95": round(durees[min(len(durees) - 1, int(len(durees) * 0.95))], 4),
+        "moyenne": round(statistics.fmean(durees), 4),
+    }
+
+
+def _echantillon(conn, requete, rng, taille):
+    valeurs = [ligne[0] for ligne in conn.execute(requete).fetchall()]
+    return rng.sample(valeurs, min(taille, len(valeurs)))
+
+
+def _copier_base(chemin, destination):
+    """
+    Copie une base SQLite par l'API de sauvegarde, journal WAL compris.
+    """
+    source = sqlite3.connect(chemin)
+    copie = sqlite3.connect(destination)
+    try:
+        source.backup(copie)
+    finally:
+        copie.close()
+        source.close()
+
+
+def executer_benchmarks(chemin, repetitions=5, graine=42, taille_echantillon=50):
+    """
+    Mesure les chemins critiques de la caisse sur une base existante.
+    Les mesures de creer_vente ajoutent des ventes : elles sont faites sur une copie temporaire
+    de la base, qui n'est jamais modifiée.
+
+    :param chemin: Base à mesurer, par exemple créée par generer_base.
+    :param repetitions: Nombre de passes sur chaque échantillon de valeurs.
+    :return: Dictionnaire {mesure: statistiques}.
+    """
+    with tempfile.TemporaryDirectory() as dossier:
+        copie = os.path.join(dossier, os.path.basename(chemin))
+        _copier_base(chemin, copie)
+        return _mesurer_base(copie, repetitions, graine, taille_echantillon)
+
+
+def _mesurer_base(chemin, repetitions, graine, taille_echantillon):
+    rng = random.Random(graine)
+    conn = ouvrir_connexion(chemin)
+    try:
+        doc_nums = _echantillon(conn, "SELECT doc_num FROM DAT", rng, taille_echantillon)
+        jours = _echantillon(conn, "SELECT DISTINCT doc_date FROM DAT", rng, taille_echantillon)
+        telephones = _echantillon(conn, "SELECT telephone FROM clients WHERE telephone IS NOT NULL",
+                                  rng, taille_echantillon)
+        codes = _echantillon(conn, "SELECT code_barre FROM code_barres", rng, taille_echantillon)
+        article_ids = _echantillon(conn, "SELECT id FROM articles WHERE etat = 0", rng, taille_echantillon)
+        noms = [nom.split()[0] for nom in _echantillon(conn, "SELECT nom FROM articles", rng, 10)]
+        page = lister_articles_page(conn, "nom")
+        apres = (page[-1][1], page[-1][0]) if page else None
+
+        def vendre(article_id):
+            creer_vente(conn, 1, [{"article_id": article_id, "quantite": 1, "remise": 0}], "cash")
+
+        def chercher_client(saisie):
+            invalider_recherche_clients(conn)  # Mesure de la requête, pas du cache
+            chercher_clients(conn, saisie)
+
+        def code_barre_froid(code):
+            charger_index_codes_barres(conn)  # Chargement complet de l'index, comme au démarrage
+            article_par_code_barre(conn, code)
+
+        resultats = {
+            "creer_vente": mesurer(vendre, article_ids, repetitions),
+            "rapport_journalier": mesurer(lambda jour: rapport_journalier(conn, jour), jours, repetitions),
+            "rechercher_vente": mesurer(lambda doc_num: rechercher_vente(conn, "doc_num", doc_num),
+                                        doc_nums, repetitions),
+            "rechercher_client": mesurer(lambda telephone: rechercher_client(conn, "telephone", telephone),
+                                         telephones, repetitions),
+            "chercher_clients": mesurer(chercher_client, [telephone[-4:] for telephone in telephones[:10]]
+                                        + [nom[:3] for nom in ("Mohamed", "Ben Salah", "Ines")], repetitions),
+            "lister_articles_premiere_page": mesurer(lambda _: lister_articles_page(conn, "nom"),
+                                                     range(10), repetitions),
+            "lister_articles_page_suivante": mesurer(lambda _: lister_articles_page(conn, "nom", apres=apres),
+                                                     range(10), repetitions),
+            "code_barre": mesurer(lambda code: article_par_code_barre(conn, code), codes, repetitions),
+            "code_barre_index_froid": mesurer(code_barre_froid, codes[:5], 1),
+        }
+        try:
+            resultats["rechercher_articles"] = mesurer(lambda terme: rechercher_articles(conn, terme),
+                                                       noms, repetitions)
+        except sqlite3.OperationalError:
+            pass  # SQLite compilé sans FTS5
+        return resultats
+    finally:
+        conn.close()
+
+
+def comparer(reference, resultats, seuil=0.2):
+    """
+    Compare deux fichiers de résultats sur la médiane de chaque mesure commune.
+    :param seuil: Ralentissement relatif au-delà duquel une mesure est signalée (0.2 = +20 %).
+    :return: Liste des régressions (mesure, mediane_reference, mediane, rapport).
+    """
+    regressions = []
+    for mesure, stats in resultats["resultats"].items():
+        ancien = reference["resultats"].get(mesure)
+        if ancien is None or not ancien["mediane"]:
+            continue
+        rapport = stats["mediane"] / ancien["mediane"]
+        if rapport > 1 + seuil:
+            regressions.append((mesure, ancien["mediane"], stats["mediane"], round(rapport, 2)))
+    return regressions
+
+
+def enregistrer_resultats(chemin_sortie, resultats, echelle=None):
+    """
+    Écrit les résultats dans un fichier JSON, avec les versions de Python et de SQLite.
+    :return: Contenu écrit.
+    """
+    contenu = {
+        "horodatage": datetime.now().isoformat(timespec="seconds"),
+        "echelle": echelle,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "resultats": resultats,
+    }
+    with open(chemin_sortie, "w", encoding="utf-8") as fichier:
+        json.dump(contenu, fichier, indent=2, ensure_ascii=False)
+    return contenu
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure les performances de la caisse sur une base générée.")
+    parser.add_argument("--echelle", choices=ECHELLES, default="10k")
+    parser.add_argument("--base", help="Base existante à mesurer, sur une copie (générée dans un dossier temporaire sinon)")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--sortie", default="benchmark.json", help="Fichier JSON des résultats")
+    parser.add_argument("--reference", help="Résultats précédents à comparer")
+    parser.add_argument("--seuil", type=float, default=0.2)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = arguments.base
+        if chemin is None:
+            chemin = os.path.join(dossier, f"benchmark-{arguments.echelle}.db")
+            print(f"Génération de la base {arguments.echelle}...")
+            generer_base(chemin, *ECHELLES[arguments.echelle])
+        resultats = executer_benchmarks(chemin, arguments.repetitions)
+
+    contenu = enregistrer_resultats(arguments.sortie, resultats, None if arguments.base else arguments.echelle)
+    for mesure, stats in resultats.items():
+        print(f"{mesure:32} médiane {stats['mediane']:9.3f} ms   p95 {stats['p95']:9.3f} ms")
+
+    if arguments.reference:
+        with open(arguments.reference, encoding="utf-8") as fichier:
+            regressions = comparer(json.load(fichier), contenu, arguments.seuil)
+        for mesure, ancien, nouveau, rapport in regressions:
+            print(f"Régression : {mesure} {ancien:.3f} ms -> {nouveau:.3f} ms (x{rapport})")
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,175 @@
+from collections import namedtuple
+from base_donnees import SuiviModifications, registre_caches
+from depots import lire_par_ids
+
+
+class IndexCodesBarres:
+    """
+    Index en mémoire code-barre -> identifiant d'article, chargé en bloc depuis code_barres.
+    Dès qu'une autre connexion (autre caisse) a validé des modifications, l'index est vidé :
+    les codes sont alors relus un par un en base, à leur prochain passage au scanner.
+    """
+
+    def __init__(self):
+        self.articles = {}
+        self.modifications = SuiviModifications(delai=0)
+
+    def charger(self, conn):
+        """
+        Recharge tout l'index en une seule requête.
+        """
+        self.modifications.modifiee(conn)  # Version lue avant le chargement : rien ne peut échapper
+        cursor = conn.cursor()
+        cursor.execute("SELECT code_barre, article_id FROM code_barres")
+        self.articles = dict(cursor.fetchall())
+
+    def ajouter(self, code_barre, article_id):
+        self.articles[code_barre] = article_id
+
+    def retirer(self, code_barre):
+        self.articles.pop(code_barre, None)
+
+
+def charger_index_codes_barres(conn):
+    """
+    Charge (ou recharge) l'index des codes-barres de la base, typiquement au démarrage.
+    """
+    index = IndexCodesBarres()
+    index.charger(conn)
+    registre_caches(conn)["codes_barres"] = index
+    return index
+
+
+def index_codes_barres(conn):
+    """
+    Retourne l'index des codes-barres de la base, en le chargeant au premier appel.
+    """
+    index = registre_caches(conn).get("codes_barres")
+    if index is None:
+        index = charger_index_codes_barres(conn)
+    return index
+
+
+def article_par_code_barre(conn, code_barre):
+    """
+    Retourne l'identifiant de l'article associé à un code-barre scanné, ou None.
+    Un code absent de l'index est recherché en base, au cas où une autre caisse l'aurait ajouté.
+    """
+    index = index_codes_barres(conn)
+    if index.modifications.modifiee(conn):
+        index.articles.clear()
+    article_id = index.articles.get(code_barre)
+    if article_id is None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT article_id FROM code_barres WHERE code_barre = ?", (code_barre,))
+        result = cursor.fetchone()
+        if result:
+            article_id = result[0]
+            index.ajouter(code_barre, article_id)
+    return article_id
+
+
+def maj_index_codes_barres(conn, ajoutes=(), supprimes=()):
+    """
+    Répercute sur l'index, s'il est chargé, des codes-barres ajoutés [(code_barre, article_id)]
+    ou supprimés [code_barre]. À appeler après validation de la transaction.
+    """
+    index = registre_caches(conn).get("codes_barres")
+    if index is None:
+        return
+    for code_barre in supprimes:
+        index.retirer(code_barre)
+    for code_barre, article_id in ajoutes:
+        index.ajouter(code_barre, article_id)
+
+
+# Champs chauds lus pour les ventes
+PrixArticle = namedtuple("PrixArticle", ("id", "prix_vente_ht", "tva", "prix_vente_min", "stock"))
+
+
+class CachePrixArticles:
+    """
+    Cache à lecture traversante des champs chauds des articles, par identifiant :
+    (prix_vente_ht, tva, prix_vente_min, stock).
+    Le compteur de version est incrémenté à chaque invalidation, ce qui empêche une lecture
+    commencée avant une modification de remettre en cache un prix périmé.
+    Les modifications des autres connexions (autres caisses) vident le cache dès la lecture suivante :
+    PRAGMA data_version est vérifié à chaque appel, pour qu'une vente ne soit jamais calculée
+    avec un prix modifié depuis sa mise en cache (voir SuiviModifications).
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.articles = {}
+        self.modifications = SuiviModifications(delai=0)
+
+    def obtenir(self, conn, article_ids):
+        """
+        Retourne {article_id: (prix_vente_ht, tva, prix_vente_min, stock)} pour les articles demandés,
+        en chargeant les absents par lots. Les identifiants inconnus sont ignorés.
+        """
+        if self.modifications.modifiee(conn):
+            self.invalider()
+        resultat, manquants = {}, []
+        for article_id in set(article_ids):
+            valeurs = self.articles.get(article_id)
+            if valeurs is None:
+                manquants.append(article_id)
+            else:
+                resultat[article_id] = valeurs
+
+        version = self.version
+        for article_id, prix in lire_par_ids(conn, "articles", PrixArticle, manquants).items():
+            resultat[article_id] = prix[1:]
+
+        # Ne mettre en cache que si aucune invalidation n'a eu lieu pendant la lecture
+        if manquants and version == self.version:
+            for article_id in manquants:
+                if article_id in resultat:
+                    self.articles[article_id] = resultat[article_id]
+        return resultat
+
+    def invalider(self, article_ids=None):
+        """
+        Retire des articles du cache (tous si article_ids vaut None).
+        """
+        self.version += 1
+        if article_ids is None:
+            self.articles.clear()
+        else:
+            for article_id in article_ids:
+                self.articles.pop(article_id, None)
+
+    def ajuster_stocks(self, sorties):
+        """
+        Décrémente le stock en cache des quantités vendues {article_id: quantite}.
+        """
+        for article_id, quantite in sorties.items():
+            valeurs = self.articles.get(article_id)
+            if valeurs is not None:
+                self.articles[article_id] = valeurs[:3] + (valeurs[3] - quantite,)
+
+
+def cache_prix_articles(conn):
+    """
+    Retourne le cache des prix d'articles de la base, en le créant au premier appel.
+    """
+    registre = registre_caches(conn)
+    cache = registre.get("prix_articles")
+    if cache is None:
+        cache = registre["prix_articles"] = CachePrixArticles()
+    return cache
+
+
+def prix_articles(conn, article_ids):
+    """
+    Retourne {article_id: (prix_vente_ht, tva, prix_vente_min, stock)} en passant par le cache.
+    """
+    return cache_prix_articles(conn).obtenir(conn, article_ids)
+
+
+def invalider_articles(conn, article_ids=None):
+    """
+    Signale la modification d'articles (tous si article_ids vaut None) au cache des prix.
+    """
+    cache_prix_articles(conn).invalider(article_ids)
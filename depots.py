@@ -0,0 +1,58 @@
+import functools
+
+
+# Tailles des lots de lecture par identifiants : un lot est complété jusqu'à la taille suivante
+# en répétant son dernier identifiant, de sorte que chaque table n'a que quelques requêtes
+# distinctes, toutes gardées dans le cache d'instructions de la connexion
+TAILLES_LOTS = (1, 8, 32, 128, 512)
+
+
+def fabrique_lignes(type_ligne):
+    """
+    Fabrique de lignes (row_factory) construisant des lignes du type donné, un namedtuple
+    dont les champs sont les colonnes lues, ex. cursor.row_factory = fabrique_lignes(Article).
+    """
+    construire = type_ligne._make
+    return lambda cursor, ligne: construire(ligne)
+
+
+@functools.lru_cache(maxsize=None)
+def requete_par_ids(table, colonnes, taille, filtre=""):
+    """
+    Texte de la requête lisant `taille` lignes d'une table par identifiant.
+    :param colonnes: Tuple des colonnes lues, la première étant l'identifiant.
+    :param filtre: Condition supplémentaire, ex. "AND etat = 0".
+    """
+    return f"""
+        SELECT {", ".join(colonnes)} FROM {table}
+        WHERE {colonnes[0]} IN ({", ".join("?" * taille)}) {filtre}
+    """
+
+
+def lots_par_ids(ids):
+    """
+    Découpe des identifiants en lots de tailles TAILLES_LOTS, complétés par répétition.
+    :return: Itérateur sur des listes d'identifiants.
+    """
+    ids = list(dict.fromkeys(ids))
+    taille_max = TAILLES_LOTS[-1]
+    for i in range(0, len(ids), taille_max):
+        lot = ids[i:i + taille_max]
+        taille = next(taille for taille in TAILLES_LOTS if taille >= len(lot))
+        yield lot + lot[-1:] * (taille - len(lot))
+
+
+def lire_par_ids(conn, table, type_ligne, ids, filtre=""):
+    """
+    Lit des lignes d'une table par identifiant, avec un petit nombre de requêtes fixes.
+    :param type_ligne: Namedtuple dont les champs sont les colonnes lues, l'identifiant en premier.
+    :return: Dictionnaire {id: ligne} ; les identifiants introuvables sont absents.
+    """
+    lignes = {}
+    cursor = conn.cursor()
+    cursor.row_factory = fabrique_lignes(type_ligne)
+    for lot in lots_par_ids(ids):
+        cursor.execute(requete_par_ids(table, type_ligne._fields, len(lot), filtre), lot)
+        for ligne in cursor.fetchall():
+            lignes[ligne[0]] = ligne
+    return lignes
@@ -0,0 +1,162 @@
+import itertools
+import queue
+import threading
+from base_donnees import CHEMIN_BASE, obtenir_connexion, fermer_connexions
+
+
+class Tache:
+    """
+    Requête soumise à l'exécuteur : fonction(conn, *args, **kwargs) et ses rappels.
+    """
+
+    def __init__(self, fonction, args, kwargs, succes, erreur, cle, generation):
+        self.fonction = fonction
+        self.args = args
+        self.kwargs = kwargs
+        self.succes = succes
+        self.erreur = erreur
+        self.cle = cle
+        self.generation = generation
+
+
+class ExecuteurBD:
+    """
+    Exécute les accès à la base sur un thread dédié, avec sa propre connexion,
+    et rend les résultats au thread de l'interface en les relevant avec root.after.
+
+    Une requête soumise avec une clé remplace les précédentes de même clé :
+    celles qui n'ont pas commencé ne sont pas exécutées, et le résultat des autres est ignoré.
+    """
+
+    INTERVALLE_MS = 30
+
+    def __init__(self, root, chemin=CHEMIN_BASE, sur_activite=None):
+        """
+        :param root: Fenêtre Tk dont la boucle reçoit les résultats.
+        :param chemin: Base ouverte par le thread de l'exécuteur.
+        :param sur_activite: Fonction facultative appelée dans l'interface avec True quand des requêtes
+                             sont en cours et False quand il n'y en a plus (indicateur de chargement).
+        """
+        self.root = root
+        self.chemin = chemin
+        self.sur_activite = sur_activite
+        self._requetes = queue.Queue()
+        self._resultats = queue.Queue()
+        self._verrou = threading.Lock()
+        self._generations = {}
+        self._compteur = itertools.count(1)
+        self._en_cours = 0
+        self._actif = False
+        self._releve = None
+        self._arrete = False
+        self._thread = threading.Thread(target=self._executer, name="executeur-bd", daemon=True)
+        self._thread.start()
+        self._relever()
+
+    def soumettre(self, fonction, *args, succes=None, erreur=None, cle=None, **kwargs):
+        """
+        Planifie fonction(conn, *args, **kwargs) sur le thread de l'exécuteur. Utilisable depuis tout thread.
+        :param succes: Appelée dans l'interface avec le résultat.
+        :param erreur: Appelée dans l'interface avec l'exception levée (affichée dans la console par défaut).
+        :param cle: Clé de remplacement, ex. "tableau" pour les chargements d'une même liste.
+        """
+        with self._verrou:
+            generation = next(self._compteur)
+            if cle is not None:
+                self._generations[cle] = generation
+            self._en_cours += 1
+        self._requetes.put(Tache(fonction, args, kwargs, succes, erreur, cle, generation))
+
+    def dans_interface(self, fonction, *args):
+        """
+        Fait exécuter fonction(*args) par la boucle de l'interface. Utilisable depuis tout thread.
+        """
+        appel = Tache(None, (), {}, lambda _: fonction(*args), None, None, 0)
+        self._resultats.put((appel, None, None))
+
+    def annuler(self, cle):
+        """
+        Abandonne les requêtes en attente ou en cours de clé donnée.
+        """
+        with self._verrou:
+            self._generations[cle] = next(self._compteur)
+
+    def _perimee(self, tache):
+        with self._verrou:
+            return tache.cle is not None and self._generations.get(tache.cle) != tache.generation
+
+    def _executer(self):
+        """
+        Boucle du thread de l'exécuteur.
+        """
+        conn = obtenir_connexion(self.chemin)
+        try:
+            while True:
+                tache = self._requetes.get()
+                if tache is None:
+                    break
+                if self._perimee(tache):
+                    self._resultats.put((tache, None, None))
+                    continue
+                try:
+                    resultat = tache.fonction(conn, *tache.args, **tache.kwargs)
+                    self._resultats.put((tache, resultat, None))
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._resultats.put((tache, None, e))
+        finally:
+            fermer_connexions()
+
+    def _relever(self):
+        """
+        Rend dans l'interface les résultats disponibles, puis se replanifie.
+        """
+        try:
+            while True:
+                try:
+                    tache, resultat, erreur = self._resultats.get_nowait()
+                except queue.Empty:
+                    break
+                if tache.fonction is not None:  # Pas un simple appel transmis par dans_interface
+                    with self._verrou:
+                        self._en_cours -= 1
+                if self._perimee(tache):
+                    continue
+                elif erreur is not None:
+                    if tache.erreur is not None:
+                        tache.erreur(erreur)
+                    else:
+                        print(f"Erreur lors de l'accès à la base : {erreur}")
+                elif tache.succes is not None:
+                    tache.succes(resultat)
+
+            actif = self._en_cours > 0
+            if actif != self._actif:
+                self._actif = actif
+                if self.sur_activite is not None:
+                    self.sur_activite(actif)
+        finally:
+            if not self._arrete:
+                self._releve = self.root.after(self.INTERVALLE_MS, self._relever)
+
+    def occupe(self):
+        """
+        Indique si des requêtes sont en attente ou en cours.
+        """
+        return self._en_cours > 0
+
+    def arreter(self):
+        """
+        Arrête le thread après les requêtes déjà soumises et cesse de relever les résultats.
+        """
+        if self._arrete:
+            return
+        self._arrete = True
+        if self._releve is not None:
+            try:
+                self.root.after_cancel(self._releve)
+            except Exception:
+                pass  # Fenêtre déjà détruite
+            self._releve = None
+        self._requetes.put(None)
@@ -1,4 +1,4 @@
-import sqlite3
+from base_donnees import ouvrir_connexion
 from gestion_clients import (
     initialiser_clients,
     ajouter_client,
@@ -9,7 +9,7 @@ from gestion_clients import (
 
 
 def exemple_utilisation():
-    conn = sqlite3.connect("appli.db")
+    conn = ouvrir_connexion()
     initialiser_clients(conn)
 
     # Ajouter un client
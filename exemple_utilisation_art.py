@@ -1,4 +1,4 @@
-import sqlite3
+from base_donnees import ouvrir_connexion
 from gestion_articles import (
     initialiser_articles,
     ajouter_article,
@@ -8,7 +8,7 @@ from gestion_articles import (
 
 
 def exemple_utilisation():
-    conn = sqlite3.connect("appli.db")
+    conn = ouvrir_connexion()
     initialiser_articles(conn)
 
     ajouter_article(conn, "Carnet2", "Papeterie", "A5", "Pages lignées", 50, 5, "Fournisseur Y", "REF456", 10, 2, 3, 6)
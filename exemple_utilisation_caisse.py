@@ -1,4 +1,4 @@
-import sqlite3
+from base_donnees import ouvrir_connexion
 from gestion_caisse import (
     initialiser_vente,
     initialiser_detail_vente,
@@ -10,7 +10,7 @@ from gestion_caisse import (
 
 
 def exemple_utilisation():
-    conn = sqlite3.connect("appli.db")
+    conn = ouvrir_connexion()
 
     # Initialisation des tables
     initialiser_vente(conn)
@@ -0,0 +1,255 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from base_donnees import CHEMIN_BASE, ouvrir_connexion, obtenir_connexion
+from cache_articles import cache_prix_articles
+from gestion_parametres import AllocateurSequence, obtenir_parametre
+from gestion_caisse import CLES_SEQUENCES, TIMBRE_FISCAL_DEFAUT, chiffrer_articles, creer_ventes_batch
+
+
+_ARRET = object()
+
+
+class FileVentes:
+    """
+    File d'écriture différée des ventes : le ticket validé est chiffré aux prix du moment,
+    consigné dans un journal et reçoit aussitôt son numéro, puis un thread d'écriture dédié
+    enregistre les tickets en attente par lots, une transaction par lot, sans les rechiffrer.
+
+    Les numéros sont pris dans des blocs réservés (AllocateurSequence) : comme pour la caisse,
+    les numéros d'un bloc non utilisés à l'arrêt sont perdus.
+    Après un arrêt brutal, les tickets du journal absents de DAT sont rejoués à l'ouverture.
+    """
+
+    def __init__(self, chemin_base=CHEMIN_BASE, chemin_journal=None, taille_max=1000, taille_lot=100,
+                 delai_lot=0.05, allocateurs=None, synchroniser=True):
+        """
+        :param chemin_base: Base où les ventes sont enregistrées.
+        :param chemin_journal: Journal des tickets en attente (par défaut à côté de la base).
+        :param taille_max: Nombre maximal de tickets en attente ; au-delà, ajouter() patiente.
+        :param taille_lot: Nombre maximal de tickets enregistrés par transaction.
+        :param delai_lot: Attente (en secondes) pour regrouper les tickets suivants dans le lot.
+        :param allocateurs: Dictionnaire {doc_type: AllocateurSequence} en mode bloc ;
+                            par défaut un allocateur de 50 numéros par type de document.
+        :param synchroniser: Si vrai, chaque ticket est forcé sur le disque (fsync) avant d'être accepté.
+        """
+        self.chemin_base = chemin_base
+        self.chemin_journal = chemin_journal or f"{chemin_base}.file-ventes"
+        self.taille_lot = taille_lot
+        self.delai_lot = delai_lot
+        self.synchroniser = synchroniser
+        self.echecs = []  # (doc_num, motif) des tickets refusés par la base, aussi consignés dans .rejets
+
+        self._conn_allocation = None
+        if allocateurs is None:
+            self._conn_allocation = ouvrir_connexion(chemin_base)
+            allocateurs = {doc_type: AllocateurSequence(self._conn_allocation, cle)
+                           for doc_type, cle in CLES_SEQUENCES.items()}
+        if any(allocateur.sans_trou for allocateur in allocateurs.values()):
+            raise ValueError("La file des ventes nécessite des allocateurs par blocs (sans_trou=False).")
+        self.allocateurs = allocateurs
+
+        self._file = queue.Queue()
+        self._places = threading.Semaphore(taille_max)
+        self._verrou_journal = threading.Lock()
+        self._tickets = {}  # Tickets acceptés pas encore enregistrés, par doc_num, dans l'ordre du journal
+        self._journal = open(self.chemin_journal, "a+", encoding="utf-8")
+
+        self._thread = threading.Thread(target=self._ecrire, name="file-ventes", daemon=True)
+        self._thread.start()
+        self.recuperes = self._recuperer()
+
+    def _recuperer(self):
+        """
+        Remet en file les tickets du journal qui n'ont pas été enregistrés dans DAT.
+        :return: Nombre de tickets récupérés.
+        """
+        self._journal.seek(0)
+        tickets = [json.loads(ligne) for ligne in self._journal if ligne.strip()]
+        if not tickets:
+            return 0
+
+        conn = ouvrir_connexion(self.chemin_base)
+        try:
+            doc_nums = [ticket["doc_num"] for ticket in tickets]
+            enregistres = set()
+            for i in range(0, len(doc_nums), 500):
+                lot = doc_nums[i:i + 500]
+                cursor = conn.execute(f"SELECT doc_num FROM DAT WHERE doc_num IN ({', '.join('?' * len(lot))})", lot)
+                enregistres.update(ligne[0] for ligne in cursor.fetchall())
+        finally:
+            conn.close()
+
+        recuperes = [ticket for ticket in tickets if ticket["doc_num"] not in enregistres]
+        with self._verrou_journal:
+            self._tickets.update((ticket["doc_num"], ticket) for ticket in recuperes)
+            self._reecrire_journal()
+        for ticket in recuperes:
+            self._places.acquire()
+            self._file.put(ticket)
+        return len(recuperes)
+
+    def _reecrire_journal(self):
+        """
+        Remplace le journal par les seuls tickets encore en attente (sous _verrou_journal).
+        Le nouveau journal est écrit à côté puis substitué, pour ne jamais perdre de ticket en cas d'arrêt.
+        """
+        temporaire = f"{self.chemin_journal}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as journal:
+            for ticket in self._tickets.values():
+                journal.write(json.dumps(ticket) + "\n")
+            journal.flush()
+            if self.synchroniser:
+                os.fsync(journal.fileno())
+        self._journal.close()
+        os.replace(temporaire, self.chemin_journal)
+        self._journal = open(self.chemin_journal, "a+", encoding="utf-8")
+
+    def ajouter(self, doc_type, articles, mode_paiement, client_id=None, timeout=None):
+        """
+        Accepte une vente validée et retourne immédiatement son numéro de document.
+        La vente est chiffrée aux prix et au timbre fiscal en vigueur à l'acceptation : ce sont ces
+        lignes et totaux, ceux du ticket remis au client, qui sont journalisés puis enregistrés.
+        Si la file est pleine, patiente jusqu'à `timeout` secondes (indéfiniment si None).
+
+        :param articles: Liste de dictionnaires (article_id, quantite, remise), comme pour creer_vente.
+        :return: Numéro de document attribué.
+        :raises ValueError: Si un article est introuvable.
+        """
+        if doc_type not in self.allocateurs:
+            raise ValueError(f"Type de document inconnu : {doc_type}")
+        if not articles:
+            raise ValueError("La vente ne contient aucun article.")
+        if not self._thread.is_alive():
+            raise RuntimeError("La file des ventes est arrêtée.")
+
+        # Chiffrage sur la connexion du thread appelant, depuis le cache des prix
+        conn = obtenir_connexion(self.chemin_base)
+        prix = cache_prix_articles(conn).obtenir(conn, [article["article_id"] for article in articles])
+        lignes, totaux = chiffrer_articles(articles, prix, obtenir_parametre(conn, "tva_default", 0))
+        timbre_fiscal = obtenir_parametre(conn, "timbre_fiscal", TIMBRE_FISCAL_DEFAUT)
+
+        if not self._places.acquire(timeout=timeout):
+            raise RuntimeError("La file des ventes est pleine : l'enregistrement est en retard.")
+
+        try:
+            ticket = {
+                "doc_num": f"{doc_type}-{self.allocateurs[doc_type].suivant()}",
+                "doc_type": doc_type, "articles": articles, "mode_paiement": mode_paiement,
+                "client_id": client_id, "date_vente": datetime.now().isoformat(timespec="seconds"),
+                "lignes": lignes, "totaux": totaux, "timbre_fiscal": timbre_fiscal,
+            }
+            with self._verrou_journal:
+                self._journal.write(json.dumps(ticket) + "\n")
+                self._journal.flush()
+                if self.synchroniser:
+                    os.fsync(self._journal.fileno())
+                self._tickets[ticket["doc_num"]] = ticket
+                self._file.put(ticket)
+        except Exception:
+            self._places.release()
+            raise
+        return ticket["doc_num"]
+
+    def _prochain_lot(self):
+        """
+        Attend un premier ticket puis regroupe ceux qui arrivent dans le délai du lot.
+        Le marqueur d'arrêt est aussitôt compté comme traité, pour que vider() ne l'attende pas.
+        :return: Liste de tickets, et vrai si l'arrêt a été demandé.
+        """
+        lot = [self._file.get()]
+        if lot[0] is _ARRET:
+            self._file.task_done()
+            return [], True
+        limite = time.monotonic() + self.delai_lot
+        while len(lot) < self.taille_lot:
+            try:
+                ticket = self._file.get(timeout=max(0, limite - time.monotonic()))
+            except queue.Empty:
+                break
+            if ticket is _ARRET:
+                self._file.task_done()
+                return lot, True
+            lot.append(ticket)
+        return lot, False
+
+    def _enregistrer(self, conn, lot):
+        """
+        Enregistre un lot en une transaction ; si un ticket est refusé, les tickets
+        sont repris un par un pour isoler le fautif. Les tickets chiffrés à l'acceptation
+        sont enregistrés tels quels ; ceux d'un ancien journal, sans lignes, sont chiffrés ici.
+        """
+        ventes = [dict(ticket, date_vente=datetime.fromisoformat(ticket["date_vente"])) for ticket in lot]
+        while True:
+            try:
+                creer_ventes_batch(conn, ventes)
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    time.sleep(0.1)  # Base occupée au-delà du délai d'attente : on réessaie
+                    continue
+                motif = str(e)
+            except Exception as e:
+                motif = str(e)
+            break
+
+        if len(lot) == 1:
+            self._rejeter(lot[0], motif)
+        else:
+            for ticket in lot:
+                self._enregistrer(conn, [ticket])
+
+    def _rejeter(self, ticket, motif):
+        self.echecs.append((ticket["doc_num"], motif))
+        with open(f"{self.chemin_journal}.rejets", "a", encoding="utf-8") as rejets:
+            rejets.write(json.dumps(dict(ticket, motif=motif)) + "\n")
+
+    def _ecrire(self):
+        """
+        Boucle du thread d'écriture, avec sa propre connexion.
+        """
+        conn = ouvrir_connexion(self.chemin_base)
+        try:
+            arret = False
+            while not arret:
+                lot, arret = self._prochain_lot()
+                if not lot:
+                    continue
+                self._enregistrer(conn, lot)
+                # Le journal est compacté après chaque lot : il ne garde que les tickets en attente
+                with self._verrou_journal:
+                    for ticket in lot:
+                        del self._tickets[ticket["doc_num"]]
+                    self._reecrire_journal()
+                for _ in lot:
+                    self._places.release()
+                    self._file.task_done()
+        finally:
+            conn.close()
+
+    def en_attente(self):
+        """
+        Retourne le nombre de tickets acceptés mais pas encore enregistrés.
+        """
+        return len(self._tickets)
+
+    def vider(self):
+        """
+        Attend que tous les tickets acceptés soient enregistrés dans la base.
+        """
+        self._file.join()
+
+    def arreter(self):
+        """
+        Enregistre les tickets en attente, arrête le thread d'écriture et ferme le journal.
+        """
+        if self._thread.is_alive():
+            self._file.put(_ARRET)
+            self._thread.join()
+        self._journal.close()
+        if self._conn_allocation is not None:
+            self._conn_allocation.close()
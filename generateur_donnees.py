@@ -0,0 +1,219 @@
+import argparse
+import itertools
+import math
+import random
+from datetime import date, timedelta
+from base_donnees import ouvrir_connexion
+from migrations import appliquer_migrations
+from gestion_caisse import CLES_SEQUENCES, reconstruire_resume_ventes, reconstruire_stats_clients
+from recherche_clients import reconstruire_cles_clients
+
+
+# Tailles prédéfinies : (articles, clients, ventes)
+ECHELLES = {
+    "10k": (1000, 500, 10000),
+    "100k": (5000, 5000, 100000),
+    "1M": (20000, 50000, 1000000),
+}
+
+CATEGORIES = {
+    "Alimentation": ("Épicerie", "Boissons", "Conserves"),
+    "Papeterie": ("Cahiers", "Stylos", "Classement"),
+    "Droguerie": ("Entretien", "Hygiène"),
+    "Quincaillerie": ("Outillage", "Visserie", "Électricité"),
+    "Maison": ("Cuisine", "Décoration"),
+}
+FOURNISSEURS = ("Sotupa", "Medis", "Elmazraa", "Comptoir Sfax", "Dist. du Nord", "Import Sud")
+TAUX_TVA = (7, 13, 19)
+POIDS_TVA = (2, 1, 7)
+MODES_PAIEMENT = ("cash", "carte", "cheque")
+POIDS_MODES = (70, 25, 5)
+NOMS = ("Ben Salah", "Trabelsi", "Gharbi", "Jebali", "Hammami", "Mansouri", "Ayari", "Bouaziz", "Chaabane")
+PRENOMS = ("Mohamed", "Amira", "Sami", "Leila", "Youssef", "Ines", "Karim", "Nour", "Hela", "Ali")
+
+# Exposant de la loi de Zipf qui régit la popularité des articles
+EXPOSANT_POPULARITE = 1.1
+
+
+def _code_ean13(numero):
+    """
+    Code EAN-13 préfixé 619 (Tunisie) avec sa clé de contrôle.
+    """
+    base = f"619{numero:09d}"
+    somme = sum(int(chiffre) * (3 if i % 2 else 1) for i, chiffre in enumerate(base))
+    return base + str((10 - somme % 10) % 10)
+
+
+def _generer_articles(rng, nb_articles):
+    """
+    :return: Liste de tuples prêts pour l'INSERT des articles, et liste des codes-barres (code, article_id).
+    """
+    articles, codes = [], []
+    categories = list(CATEGORIES.items())
+    for article_id in range(1, nb_articles + 1):
+        categorie, sous_categories = rng.choice(categories)
+        tva = rng.choices(TAUX_TVA, POIDS_TVA)[0]
+        prix_achat_ht = round(math.exp(rng.uniform(math.log(0.2), math.log(200))), 3)
+        prix_vente_ht = round(prix_achat_ht * rng.uniform(1.15, 1.6), 3)
+        articles.append((
+            article_id, f"{rng.choice(sous_categories)} {article_id:07d}", categorie, rng.choice(sous_categories),
+            rng.choice(FOURNISSEURS), f"REF-{rng.randrange(10 ** 6):06d}", tva, prix_achat_ht, prix_achat_ht,
+            round((prix_vente_ht - prix_achat_ht) / prix_achat_ht * 100, 3), round(prix_achat_ht * 1.1, 3),
+            prix_vente_ht, round(prix_vente_ht * (1 + tva / 100), 3), rng.randint(0, 20),
+        ))
+        for _ in range(rng.choice((1, 1, 1, 2))):
+            codes.append((_code_ean13(len(codes) + 1), article_id))
+    return articles, codes
+
+
+def _generer_clients(rng, nb_clients):
+    clients = []
+    for client_id in range(1, nb_clients + 1):
+        nom = f"{rng.choice(PRENOMS)} {rng.choice(NOMS)}"
+        clients.append((
+            client_id, nom, f"{rng.randint(1, 200)} rue {rng.choice(NOMS)}",
+            f"client{client_id}@exemple.tn", f"{rng.choice('2579')}{client_id:07d}",
+            f"{1000000 + client_id}A/M/000" if rng.random() < 0.2 else None,
+        ))
+    return clients
+
+
+def generer_base(chemin, nb_articles, nb_clients, nb_ventes, annees=3, graine=42, date_fin=None,
+                 taille_lot=10000, progression=None):
+    """
+    Crée une base de démonstration réaliste et reproductible : mêmes paramètres et même graine,
+    même contenu. La popularité des articles suit une loi de Zipf et les ventes sont réparties
+    sur `annees` années se terminant à `date_fin`.
+
+    :param chemin: Fichier de la base à créer (doit être vide ou absent).
+    :param date_fin: Date de la dernière vente (aujourd'hui par défaut).
+    :param taille_lot: Nombre de ventes insérées par transaction.
+    :param progression: Fonction facultative appelée avec le nombre de ventes insérées.
+    :return: Dictionnaire récapitulatif (articles, codes_barres, clients, ventes, lignes).
+    """
+    rng = random.Random(graine)
+    date_fin = date_fin or date.today()
+    date_debut = date_fin - timedelta(days=365 * annees - 1)
+
+    conn = ouvrir_connexion(chemin)
+    appliquer_migrations(conn)
+    cursor = conn.cursor()
+    if cursor.execute("SELECT COUNT(*) FROM articles").fetchone()[0]:
+        conn.close()
+        raise ValueError(f"La base {chemin} contient déjà des articles.")
+
+    # Référentiels : articles, codes-barres et clients
+    articles, codes = _generer_articles(rng, nb_articles)
+    clients = _generer_clients(rng, nb_clients)
+    conn.execute("BEGIN")
+    cursor.executemany("""
+        INSERT INTO articles (id, nom, categorie, sous_categorie, fournisseur, ref_fournisseur, tva,
+                              prix_achat_ht, prix_moyen_pondere, marge_brute, prix_vente_min,
+                              prix_vente_ht, prix_vente_ttc, stock_minimum)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, articles)
+    cursor.executemany("INSERT INTO code_barres (code_barre, article_id) VALUES (?, ?)", codes)
+    cursor.executemany("""
+        INSERT INTO clients (id, nom, adresse, email, telephone, matricule_fiscale) VALUES (?, ?, ?, ?, ?, ?)
+    """, clients)
+    conn.commit()
+    reconstruire_cles_clients(conn)
+
+    # Popularité : rang tiré au hasard, poids 1 / rang^s
+    ordre_popularite = [article[0] for article in articles]
+    rng.shuffle(ordre_popularite)
+    poids_cumules = list(itertools.accumulate(1 / rang ** EXPOSANT_POPULARITE for rang in range(1, nb_articles + 1)))
+    tarifs = {article[0]: (article[11], article[6]) for article in articles}
+
+    # Ventes triées par date, numérotées par type de document
+    jours = sorted(rng.randrange((date_fin - date_debut).days + 1) for _ in range(nb_ventes))
+    sequences = dict.fromkeys(CLES_SEQUENCES, 0)
+    sorties = dict.fromkeys(tarifs, 0)
+    nb_lignes = 0
+    doc_id = 0
+    for debut_lot in range(0, nb_ventes, taille_lot):
+        entetes, details, mouvements = [], [], []
+        for jour in jours[debut_lot:debut_lot + taille_lot]:
+            doc_id += 1
+            doc_type = rng.choices((1, 2, 3), (80, 15, 5))[0]
+            sequences[doc_type] += 1
+            doc_date = (date_debut + timedelta(days=jour)).isoformat()
+            doc_heure = f"{rng.randint(8, 19):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+
+            quantites = {}
+            for article_id in rng.choices(ordre_popularite, cum_weights=poids_cumules, k=rng.randint(1, 8)):
+                quantites[article_id] = quantites.get(article_id, 0) + rng.choice((1, 1, 1, 2, 3))
+            tot_htva = tot_tva = tot_ttc = 0
+            for article_id, quantite in quantites.items():
+                prix_unitaire_ht, tva = tarifs[article_id]
+                prix_total_ht = round(quantite * prix_unitaire_ht, 3)
+                prix_total_ttc = round(prix_total_ht * (1 + tva / 100), 3)
+                tot_htva += prix_total_ht
+                tot_tva += prix_total_ttc - prix_total_ht
+                tot_ttc += prix_total_ttc
+                details.append((doc_id, article_id, quantite, prix_unitaire_ht, 0, prix_total_ht, prix_total_ttc))
+                mouvements.append((article_id, f"{doc_date} {doc_heure}", "vente", -quantite, doc_id))
+                sorties[article_id] += quantite
+
+            etat = rng.choices((0, 1, 9), (30, 68, 2))[0]
+            client_id = rng.randint(1, nb_clients) if nb_clients and rng.random() < 0.3 else None
+            entetes.append((doc_id, doc_type, f"{doc_type}-{sequences[doc_type]}", doc_date, doc_heure, client_id,
+                            rng.choices(MODES_PAIEMENT, POIDS_MODES)[0], round(tot_htva, 3), round(tot_tva, 3),
+                            round(tot_ttc, 3), 1, etat))
+
+        conn.execute("BEGIN")
+        cursor.executemany("""
+            INSERT INTO DAT (id, doc_type, doc_num, doc_date, doc_heure, client_id, mode_paiement,
+                             tot_htva, tot_tva, tot_ttc, timbre_fiscal, etat)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, entetes)
+        cursor.executemany("""
+            INSERT INTO DES (doc_id, article_id, quantite, prix_unitaire_ht, remise, prix_total_ht, prix_total_ttc)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, details)
+        cursor.executemany("""
+            INSERT INTO mouvements_stock (article_id, date_mouvement, type_mouvement, quantite, reference_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, mouvements)
+        conn.commit()
+        nb_lignes += len(details)
+        if progression:
+            progression(doc_id)
+
+    # Stock d'ouverture suffisant pour toutes les ventes, puis stock courant cohérent avec le registre
+    conn.execute("BEGIN")
+    ouvertures = {article_id: sortie + rng.randint(0, 50) for article_id, sortie in sorties.items()}
+    cursor.executemany("""
+        INSERT INTO mouvements_stock (article_id, date_mouvement, type_mouvement, quantite)
+        VALUES (?, ?, 'ouverture', ?)
+    """, [(article_id, f"{date_debut.isoformat()} 00:00:00", stock)
+          for article_id, stock in ouvertures.items() if stock])
+    cursor.executemany("UPDATE articles SET stock = ? WHERE id = ?",
+                       [(ouvertures[article_id] - sorties[article_id], article_id) for article_id in tarifs])
+    cursor.executemany("""
+        INSERT INTO parametres (cle, valeur) VALUES (?, ?)
+        ON CONFLICT (cle) DO UPDATE SET valeur = excluded.valeur
+    """, [(CLES_SEQUENCES[doc_type], str(valeur)) for doc_type, valeur in sequences.items()])
+    conn.commit()
+    reconstruire_resume_ventes(conn)
+    reconstruire_stats_clients(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+    return {"articles": nb_articles, "codes_barres": len(codes), "clients": nb_clients,
+            "ventes": nb_ventes, "lignes": nb_lignes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère une base de démonstration pour les mesures de performance.")
+    parser.add_argument("chemin", help="Fichier de la base à créer")
+    parser.add_argument("--echelle", choices=ECHELLES, default="10k")
+    parser.add_argument("--annees", type=int, default=3)
+    parser.add_argument("--graine", type=int, default=42)
+    arguments = parser.parse_args()
+
+    nb_articles, nb_clients, nb_ventes = ECHELLES[arguments.echelle]
+    resume = generer_base(arguments.chemin, nb_articles, nb_clients, nb_ventes, annees=arguments.annees,
+                          graine=arguments.graine, progression=lambda n: print(f"{n} ventes générées"))
+    print(resume)
@@ -0,0 +1,173 @@
+import sqlite3
+from datetime import datetime
+from gestion_articles import calculer_marge_brute, notifier_modifications_articles
+from cache_articles import invalider_articles
+from gestion_stock import enregistrer_mouvements
+from instrumentation import instrumenter
+
+
+def initialiser_receptions(conn, lever=False):
+    """
+    Initialise les tables des réceptions fournisseurs (entêtes) et de leurs lignes.
+    Chaque ligne conserve le PMP de l'article avant et après la réception.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS receptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fournisseur TEXT,
+                ref_document TEXT, -- ex: numéro du bon de livraison fournisseur
+                date_reception TEXT NOT NULL,
+                heure_reception TEXT NOT NULL,
+                tot_ht REAL NOT NULL,
+                etat INTEGER DEFAULT 0 -- 0: Normal, 9: Effacé
+            );
+            CREATE TABLE IF NOT EXISTS details_reception (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                reception_id INTEGER NOT NULL,
+                article_id INTEGER NOT NULL,
+                quantite INTEGER NOT NULL,
+                prix_achat_ht REAL NOT NULL,
+                pmp_avant REAL NOT NULL,
+                pmp_apres REAL NOT NULL,
+                FOREIGN KEY (reception_id) REFERENCES receptions(id),
+                FOREIGN KEY (article_id) REFERENCES articles(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_details_reception_reception ON details_reception (reception_id);
+            CREATE INDEX IF NOT EXISTS idx_details_reception_article ON details_reception (article_id);
+        """)
+        conn.commit()
+    except sqlite3.Error as e:
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation des réceptions : {e}")
+
+
+def calculer_prix_moyen_pondere(stock, prix_moyen_pondere, quantite, prix_achat_ht):
+    """
+    Calcule le nouveau PMP après l'entrée de `quantite` unités au prix `prix_achat_ht`,
+    à partir du seul stock et du PMP courants.
+    Un stock nul ou négatif n'a plus de valeur : le PMP devient alors le prix d'achat.
+    """
+    if stock <= 0 or not prix_moyen_pondere:
+        return round(prix_achat_ht, 3)
+    if stock + quantite <= 0:
+        return round(prix_moyen_pondere, 3)
+    return round((stock * prix_moyen_pondere + quantite * prix_achat_ht) / (stock + quantite), 3)
+
+
+def _lire_articles(cursor, article_ids):
+    """
+    Lit stock, PMP et prix de vente HT des articles, par paquets de 500.
+    """
+    articles = {}
+    article_ids = list(article_ids)
+    for i in range(0, len(article_ids), 500):
+        lot = article_ids[i:i + 500]
+        cursor.execute(f"""
+            SELECT id, COALESCE(stock, 0), COALESCE(prix_moyen_pondere, 0), COALESCE(prix_vente_ht, 0)
+            FROM articles WHERE id IN ({", ".join("?" * len(lot))})
+        """, lot)
+        for article_id, stock, prix_moyen_pondere, prix_vente_ht in cursor.fetchall():
+            articles[article_id] = [stock, prix_moyen_pondere, prix_vente_ht, None]
+    return articles
+
+
+@instrumenter
+def creer_receptions_batch(conn, receptions):
+    """
+    Enregistre plusieurs réceptions fournisseurs dans une seule transaction d'écriture immédiate.
+    Le stock, le PMP, le dernier prix d'achat et la marge brute de chaque article reçu
+    sont mis à jour ligne par ligne à partir de leurs valeurs courantes, sans relire l'historique.
+
+    :param conn: Connexion à la base SQLite.
+    :param receptions: Liste de dictionnaires (lignes, fournisseur et ref_document facultatifs),
+                       où lignes est une liste de dictionnaires (article_id, quantite, prix_achat_ht).
+    :return: Liste des identifiants des réceptions créées, dans l'ordre.
+    """
+    for reception in receptions:
+        for ligne in reception["lignes"]:
+            if ligne["quantite"] <= 0:
+                raise ValueError(f"Quantité invalide pour l'article ID {ligne['article_id']} : {ligne['quantite']}")
+            if ligne["prix_achat_ht"] < 0:
+                raise ValueError(f"Prix d'achat invalide pour l'article ID {ligne['article_id']}.")
+
+    maintenant = datetime.now()
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+        articles = _lire_articles(cursor, {ligne["article_id"] for reception in receptions
+                                           for ligne in reception["lignes"]})
+        reception_ids, details = [], []
+        for reception in receptions:
+            lignes = []
+            for ligne in reception["lignes"]:
+                article = articles.get(ligne["article_id"])
+                if article is None:
+                    raise ValueError(f"L'article ID {ligne['article_id']} est introuvable.")
+                stock, pmp_avant, _, _ = article
+                prix_achat_ht = round(ligne["prix_achat_ht"], 3)
+                pmp_apres = calculer_prix_moyen_pondere(stock, pmp_avant, ligne["quantite"], prix_achat_ht)
+                article[0], article[1], article[3] = stock + ligne["quantite"], pmp_apres, prix_achat_ht
+                lignes.append((ligne["article_id"], ligne["quantite"], prix_achat_ht, pmp_avant, pmp_apres))
+
+            cursor.execute("""
+                INSERT INTO receptions (fournisseur, ref_document, date_reception, heure_reception, tot_ht)
+                VALUES (?, ?, ?, ?, ?)
+            """, (reception.get("fournisseur"), reception.get("ref_document"), maintenant.strftime("%Y-%m-%d"),
+                  maintenant.strftime("%H:%M:%S"),
+                  round(sum(quantite * prix for _, quantite, prix, _, _ in lignes), 3)))
+            reception_ids.append(cursor.lastrowid)
+            details.extend((cursor.lastrowid,) + ligne for ligne in lignes)
+
+        cursor.executemany("""
+            INSERT INTO details_reception (reception_id, article_id, quantite, prix_achat_ht, pmp_avant, pmp_apres)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, details)
+        enregistrer_mouvements(cursor, [(article_id, "reception", quantite, reception_id)
+                                        for reception_id, article_id, quantite, _, _, _ in details], maintenant)
+
+        # Une seule mise à jour par article, avec l'état obtenu après toutes ses lignes
+        cursor.executemany("""
+            UPDATE articles SET stock = ?, prix_moyen_pondere = ?, prix_achat_ht = ?, marge_brute = ?
+            WHERE id = ?
+        """, [(stock, pmp, prix_achat_ht, calculer_marge_brute(prix_vente_ht, pmp), article_id)
+              for article_id, (stock, pmp, prix_vente_ht, prix_achat_ht) in articles.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    invalider_articles(conn, list(articles))
+    notifier_modifications_articles(list(articles))
+    return reception_ids
+
+
+def creer_reception(conn, lignes, fournisseur=None, ref_document=None):
+    """
+    Enregistre la réception d'une livraison fournisseur.
+
+    :param conn: Connexion à la base SQLite.
+    :param lignes: Liste de dictionnaires (article_id, quantite, prix_achat_ht).
+    :param fournisseur: Nom du fournisseur (facultatif).
+    :param ref_document: Référence du bon de livraison du fournisseur (facultatif).
+    :return: Identifiant de la réception créée.
+    """
+    reception = {"lignes": lignes, "fournisseur": fournisseur, "ref_document": ref_document}
+    return creer_receptions_batch(conn, [reception])[0]
+
+
+def lister_details_reception(conn, reception_id):
+    """
+    Retourne les lignes d'une réception (article_id, quantite, prix_achat_ht, pmp_avant, pmp_apres).
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT article_id, quantite, prix_achat_ht, pmp_avant, pmp_apres
+        FROM details_reception WHERE reception_id = ? ORDER BY id
+    """, (reception_id,))
+    return cursor.fetchall()
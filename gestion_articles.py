@@ -1,9 +1,16 @@
 import sqlite3
+from collections import namedtuple
+from cache_articles import maj_index_codes_barres, invalider_articles
+from gestion_stock import initialiser_mouvements_stock, enregistrer_mouvements
+from instrumentation import instrumenter
+from depots import fabrique_lignes, lire_par_ids
 
 
-def initialiser_articles(conn):
+def initialiser_articles(conn, lever=False):
     """
-    Initialise la table articles si elle n'existe pas et ajoute une colonne 'etat'.
+    Initialise la table articles si elle n'existe pas et ajoute une colonne 'etat',
+    ainsi que le registre des mouvements de stock qui alimente articles.stock.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
     """
     try:
         cursor = conn.cursor()
@@ -30,7 +37,31 @@ def initialiser_articles(conn):
         """)
         conn.commit()
     except sqlite3.Error as e:
+        if lever:
+            raise
         print(f"Erreur lors de l'initialisation de la table articles : {e}")
+    initialiser_mouvements_stock(conn, lever=lever)
+
+def initialiser_codes_barres(conn, lever=False):
+    """
+    Initialise la table code_barres si elle n'existe pas.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS code_barres (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                article_id INTEGER NOT NULL,
+                code_barre TEXT UNIQUE NOT NULL,
+                FOREIGN KEY(article_id) REFERENCES articles(id)
+            )
+        """)
+        conn.commit()
+    except sqlite3.Error as e:
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation de la table code_barres : {e}")
 
 def ajouter_code_barre(conn, article_id, code_barre):
     """
@@ -43,6 +74,7 @@ def ajouter_code_barre(conn, article_id, code_barre):
             VALUES (?, ?)
         """, (article_id, code_barre))
         conn.commit()
+        maj_index_codes_barres(conn, ajoutes=[(code_barre, article_id)])
     except sqlite3.IntegrityError:
         raise ValueError("Le code-barre existe déjà.")
     except sqlite3.Error as e:
@@ -54,8 +86,10 @@ def supprimer_code_barre(conn, code_barre_id):
     """
     try:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM code_barres WHERE id = ?", (code_barre_id,))
+        cursor.execute("DELETE FROM code_barres WHERE id = ? RETURNING code_barre", (code_barre_id,))
+        supprimes = [row[0] for row in cursor.fetchall()]
         conn.commit()
+        maj_index_codes_barres(conn, supprimes=supprimes)
     except sqlite3.Error as e:
         raise sqlite3.Error(f"Erreur lors de la suppression du code-barre : {e}")
 
@@ -74,6 +108,109 @@ def recuperer_codes_barres(conn, article_id):
         raise sqlite3.Error(f"Erreur lors de la récupération des codes-barres : {e}")
 
 
+# Colonnes affichées dans la grille des articles, dans l'ordre des colonnes
+COLONNES_ARTICLES = (
+    "id", "nom", "categorie", "sous_categorie", "description", "stock",
+    "stock_minimum", "fournisseur", "ref_fournisseur", "prix_achat_ht",
+    "prix_moyen_pondere", "marge_brute", "prix_vente_ht",
+    "prix_vente_ttc", "tva"
+)
+
+# Ligne d'article lue dans l'ordre de COLONNES_ARTICLES, accessible par nom (article.prix_vente_ht)
+Article = namedtuple("Article", COLONNES_ARTICLES)
+
+
+# Fonctions appelées avec la liste des identifiants d'articles ajoutés, modifiés ou supprimés
+_abonnes_articles = []
+
+
+def abonner_modifications_articles(fonction):
+    """
+    Inscrit une fonction appelée avec les identifiants des articles modifiés.
+    """
+    _abonnes_articles.append(fonction)
+
+
+def desabonner_modifications_articles(fonction):
+    """
+    Retire une fonction inscrite par abonner_modifications_articles.
+    """
+    if fonction in _abonnes_articles:
+        _abonnes_articles.remove(fonction)
+
+
+def notifier_modifications_articles(article_ids):
+    """
+    Signale aux abonnés que des articles ont été ajoutés, modifiés ou supprimés.
+    """
+    for fonction in list(_abonnes_articles):
+        fonction(list(article_ids))
+
+
+@instrumenter
+def lister_articles_par_ids(conn, article_ids, inclure_supprimes=False):
+    """
+    Retourne {id: Article} pour les articles demandés.
+    Les articles inexistants (ou supprimés, sauf inclure_supprimes) sont absents du résultat.
+    """
+    return lire_par_ids(conn, "articles", Article, article_ids, "" if inclure_supprimes else "AND etat = 0")
+
+
+@instrumenter
+def lister_articles_page(conn, colonne_tri="id", ordre_tri="ASC", apres=None, limite=200,
+                         inclure_supprimes=False, avant=None):
+    """
+    Retourne une page d'articles triés par pagination sur clé (keyset).
+    :param colonne_tri: Colonne de tri, parmi COLONNES_ARTICLES.
+    :param ordre_tri: "ASC" ou "DESC".
+    :param apres: Clé (valeur de la colonne de tri, id) de la dernière ligne de la page précédente,
+                  ou None pour la première page.
+    :param limite: Nombre maximal de lignes retournées.
+    :param avant: Clé de la première ligne de la page suivante, pour relire la page qui la précède.
+    :return: Liste d'Article.
+    """
+    if colonne_tri not in COLONNES_ARTICLES:
+        raise ValueError(f"Colonne de tri inconnue : {colonne_tri}")
+    if ordre_tri not in ("ASC", "DESC"):
+        raise ValueError(f"Ordre de tri inconnu : {ordre_tri}")
+    if avant is not None:
+        # L'ordre inverse place aussi les NULL à l'autre bout : la page est lue à rebours puis retournée
+        page = lister_articles_page(conn, colonne_tri, "DESC" if ordre_tri == "ASC" else "ASC", apres=avant,
+                                    limite=limite, inclure_supprimes=inclure_supprimes)
+        return page[::-1]
+
+    conditions, valeurs = [], []
+    if not inclure_supprimes:
+        conditions.append("etat = 0")
+    if apres is not None:
+        valeur, dernier_id = apres
+        # SQLite place les NULL en tête en ASC et en fin en DESC
+        if colonne_tri == "id":
+            conditions.append("id > ?" if ordre_tri == "ASC" else "id < ?")
+            valeurs.append(dernier_id)
+        elif ordre_tri == "ASC" and valeur is None:
+            conditions.append(f"(({colonne_tri} IS NULL AND id > ?) OR {colonne_tri} IS NOT NULL)")
+            valeurs.append(dernier_id)
+        elif ordre_tri == "ASC":
+            conditions.append(f"({colonne_tri} > ? OR ({colonne_tri} = ? AND id > ?))")
+            valeurs.extend((valeur, valeur, dernier_id))
+        elif valeur is None:
+            conditions.append(f"({colonne_tri} IS NULL AND id < ?)")
+            valeurs.append(dernier_id)
+        else:
+            conditions.append(f"({colonne_tri} < ? OR ({colonne_tri} = ? AND id < ?) OR {colonne_tri} IS NULL)")
+            valeurs.extend((valeur, valeur, dernier_id))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    tri = f"id {ordre_tri}" if colonne_tri == "id" else f"{colonne_tri} {ordre_tri}, id {ordre_tri}"
+    cursor = conn.cursor()
+    cursor.row_factory = fabrique_lignes(Article)
+    cursor.execute(f"""
+        SELECT {", ".join(COLONNES_ARTICLES)} FROM articles {where} ORDER BY {tri} LIMIT ?
+    """, valeurs + [limite])
+    return cursor.fetchall()
+
+
 def calculer_prix_vente_ttc(prix_vente_ht, tva):
     """
     Calcule le prix de vente TTC.
@@ -90,6 +227,7 @@ def calculer_marge_brute(prix_vente_ht, prix_achat_ht):
     return round(((prix_vente_ht - prix_achat_ht) / prix_achat_ht * 100), 3)
 
 
+@instrumenter
 def ajouter_article(conn, nom, categorie=None, sous_categorie=None, description=None, stock=0,
                     stock_minimum=0, fournisseur=None, ref_fournisseur=None, tva=0, prix_achat_ht=0,
                     prix_vente_min=0, prix_vente_ht=0):
@@ -114,13 +252,28 @@ def ajouter_article(conn, nom, categorie=None, sous_categorie=None, description=
         """, (nom, categorie, sous_categorie, description, stock, stock_minimum, fournisseur,
               ref_fournisseur, tva, prix_achat_ht, prix_moyen_pondere, marge_brute,
               round(prix_vente_min, 3), prix_vente_ht, prix_vente_ttc))
+        enregistrer_mouvements(cursor, [(cursor.lastrowid, "ouverture", stock, None)])
         conn.commit()
+        invalider_articles(conn, [cursor.lastrowid])
+        notifier_modifications_articles([cursor.lastrowid])
     except sqlite3.IntegrityError as e:
         print(f"Erreur d'intégrité (nom déjà utilisé) : {e}")
     except sqlite3.Error as e:
         print(f"Erreur lors de l'ajout de l'article : {e}")
 
 
+# Champs modifiables par modifier_article
+CHAMPS_MODIFIABLES_ARTICLE = (
+    "nom", "categorie", "sous_categorie", "description", "stock", "stock_minimum", "fournisseur",
+    "ref_fournisseur", "tva", "prix_achat_ht", "prix_vente_min", "prix_vente_ht",
+)
+REQUETE_MODIFIER_ARTICLE = f"""
+    UPDATE articles SET {", ".join(f"{champ} = COALESCE(?, {champ})" for champ in CHAMPS_MODIFIABLES_ARTICLE)}
+    WHERE id = ?
+"""
+
+
+@instrumenter
 def modifier_article(conn, id, **kwargs):
     """
     Modifie les champs d'un article et met à jour les calculs automatisés si nécessaire.
@@ -134,34 +287,28 @@ def modifier_article(conn, id, **kwargs):
         if "tva" in kwargs and kwargs["tva"] is not None:
             kwargs["tva"] = round(kwargs["tva"], 3)
 
-        fields = {
-            "nom": kwargs.get("nom"),
-            "categorie": kwargs.get("categorie"),
-            "sous_categorie": kwargs.get("sous_categorie"),
-            "description": kwargs.get("description"),
-            "stock": kwargs.get("stock"),
-            "stock_minimum": kwargs.get("stock_minimum"),
-            "fournisseur": kwargs.get("fournisseur"),
-            "ref_fournisseur": kwargs.get("ref_fournisseur"),
-            "tva": kwargs.get("tva"),
-            "prix_achat_ht": kwargs.get("prix_achat_ht"),
-            "prix_vente_min": kwargs.get("prix_vente_min"),
-            "prix_vente_ht": kwargs.get("prix_vente_ht"),
-        }
+        fields = {champ: kwargs.get(champ) for champ in CHAMPS_MODIFIABLES_ARTICLE}
 
         cursor = conn.cursor()
-        updates = ", ".join(f"{key} = ?" for key, value in fields.items() if value is not None)
-        values = [value for value in fields.values() if value is not None]
-        values.append(id)
+        # Un changement de stock saisi à la main est consigné comme ajustement
+        if fields["stock"] is not None:
+            cursor.execute("SELECT stock FROM articles WHERE id = ?", (id,))
+            ancien = cursor.fetchone()
+            if ancien:
+                enregistrer_mouvements(cursor, [(id, "ajustement", fields["stock"] - (ancien[0] or 0), None)])
 
-        cursor.execute(f"UPDATE articles SET {updates} WHERE id = ?", values)
+        # Requête unique quels que soient les champs fournis : un champ à None garde sa valeur
+        cursor.execute(REQUETE_MODIFIER_ARTICLE, list(fields.values()) + [id])
 
         # Recalculer les champs dérivés
-        cursor.execute("SELECT prix_achat_ht, prix_vente_ht, tva FROM articles WHERE id = ?", (id,))
+        cursor.execute("""
+            SELECT prix_achat_ht, prix_vente_ht, tva, prix_moyen_pondere FROM articles WHERE id = ?
+        """, (id,))
         article = cursor.fetchone()
         if article:
-            prix_achat_ht, prix_vente_ht, tva = article
-            prix_moyen_pondere = prix_achat_ht
+            prix_achat_ht, prix_vente_ht, tva, prix_moyen_pondere = article
+            # Le PMP est tenu par les réceptions (gestion_achats) ; le prix d'achat ne sert qu'à l'amorcer
+            prix_moyen_pondere = prix_moyen_pondere or prix_achat_ht
             marge_brute = calculer_marge_brute(prix_vente_ht, prix_moyen_pondere)
             prix_vente_ttc = calculer_prix_vente_ttc(prix_vente_ht, tva)
 
@@ -171,5 +318,49 @@ def modifier_article(conn, id, **kwargs):
             """, (prix_moyen_pondere, marge_brute, prix_vente_ttc, id))
 
         conn.commit()
+        invalider_articles(conn, [id])
+        notifier_modifications_articles([id])
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"Erreur lors de la modification de l'article : {e}")
+
+
+@instrumenter
+def supprimer_article(conn, article_id):
+    """
+    Marque un article comme supprimé (etat = 1) sans l'effacer de la base.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE articles SET etat = 1 WHERE id = ?", (article_id,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    invalider_articles(conn, [article_id])
+    notifier_modifications_articles([article_id])
+
+
+@instrumenter
+def ajuster_stock(conn, article_id, quantite, type_mouvement="ajustement", reference_id=None):
+    """
+    Ajoute `quantite` (négative pour une sortie) au stock d'un article et consigne le mouvement.
+    :param type_mouvement: 'ajustement' (inventaire, casse...) ou 'retour'.
+    :return: Nouveau stock de l'article.
+    """
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("UPDATE articles SET stock = stock + ? WHERE id = ? RETURNING stock", (quantite, article_id))
+        result = cursor.fetchone()
+        if result is None:
+            raise ValueError(f"L'article ID {article_id} est introuvable.")
+        enregistrer_mouvements(cursor, [(article_id, type_mouvement, quantite, reference_id)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalider_articles(conn, [article_id])
+    notifier_modifications_articles([article_id])
+    return result[0]
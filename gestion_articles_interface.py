@@ -1,29 +1,58 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from ajout_article_interface import AjouterModifierArticle
-import sqlite3
+import bisect
+import functools
+import itertools
+from base_donnees import obtenir_connexion
+from executeur_bd import ExecuteurBD
+from gestion_articles import (
+    COLONNES_ARTICLES,
+    Article,
+    lister_articles_page,
+    lister_articles_par_ids,
+    supprimer_article,
+    abonner_modifications_articles,
+    desabonner_modifications_articles,
+)
+from recherche_articles import rechercher_articles
+from migrations import appliquer_migrations
 
 
 class GestionArticles:
+    # Colonnes affichées avec trois décimales
+    COLONNES_MONETAIRES = ("prix_achat_ht", "prix_moyen_pondere", "prix_vente_ht", "prix_vente_ttc")
+
+    # Nombre d'articles chargés par requête et nombre de lignes gardées d'avance autour de la zone visible
+    TAILLE_PAGE = 200
+    MARGE_PRECHARGEMENT = 100
+    # Au-delà de la marge, une page de plus est gardée pour ne pas recharger au moindre aller-retour
+    MARGE_CONSERVEE = MARGE_PRECHARGEMENT + TAILLE_PAGE
+
+    # Délai sans frappe avant de lancer la recherche, et résultats affichés par lot
+    DELAI_RECHERCHE_MS = 150
+    LIMITE_RECHERCHE = 200
+    TAILLE_LOT_RESULTATS = 25
+
     def __init__(self, root):
         self.root = root
         self.root.title("Gestion des Articles")
         self.root.geometry("1500x600")
 
-        # Tableau pour afficher les articles
-        self.article_table = ttk.Treeview(self.root, columns=(
-            "id", "nom", "categorie", "sous_categorie", "description", "stock",
-            "stock_minimum", "fournisseur", "ref_fournisseur", "prix_achat_ht",
-            "prix_moyen_pondere", "marge_brute", "prix_vente_ht",
-            "prix_vente_ttc", "tva"
-        ), show="headings", height=15)
+        # Tableau pour afficher les articles, chargé page par page au défilement
+        table_frame = tk.Frame(self.root)
+        table_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.article_table = ttk.Treeview(table_frame, columns=COLONNES_ARTICLES, show="headings", height=15)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.article_table.yview)
+        self.article_table.configure(yscrollcommand=self.sur_defilement)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Configuration des colonnes
         for col in self.article_table["columns"]:
             self.article_table.heading(col, text=col.replace("_", " ").capitalize())
             self.article_table.column(col, width=100)
 
-        self.article_table.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.article_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         # Variable pour inclure les articles supprimés
         self.inclure_supprimes = tk.IntVar(value=0)
@@ -40,6 +69,17 @@ class GestionArticles:
             command=self.afficher_articles
         ).pack(side=tk.LEFT, padx=10)
 
+        # Champ de recherche au fil de la frappe
+        tk.Label(options_frame, text="Rechercher :").pack(side=tk.LEFT, padx=(20, 5))
+        self.terme_recherche = tk.StringVar()
+        self.champ_recherche = tk.Entry(options_frame, textvariable=self.terme_recherche, width=40)
+        self.champ_recherche.pack(side=tk.LEFT)
+        self.etiquette_chargement = tk.Label(options_frame, text="", fg="grey")
+        self.etiquette_chargement.pack(side=tk.RIGHT, padx=10)
+        self.terme_recherche.trace_add("write", lambda *args: self.planifier_recherche())
+        self.recherche_prevue = None
+        self.generation_recherche = 0
+        self.mode_recherche = False
 
         # Frame pour les boutons
         button_frame = tk.Frame(self.root, pady=10)
@@ -53,29 +93,37 @@ class GestionArticles:
         self.colonne_tri = "id"  # Tri par défaut
         self.ordre_tri = "ASC"   # Ordre par défaut
 
+        # État de la pagination : clé de la dernière ligne chargée, début et fin des données
+        self.derniere_cle = None
+        self.fin_atteinte = False
+        self.debut_atteint = True
+        self.chargement_prevu = False
+
+        # Clés de tri (valeur, id) des lignes chargées, dans l'ordre d'affichage
+        self.cles_tri = []
+        self.cles_par_id = {}
+
         # Associer le tri dynamique
-        for col in ["id", "nom", "categorie", "sous_categorie", "description", "stock",
-            "stock_minimum", "fournisseur", "ref_fournisseur", "prix_achat_ht",
-            "prix_moyen_pondere", "marge_brute", "prix_vente_ht",
-            "prix_vente_ttc", "tva"]:
+        for col in COLONNES_ARTICLES:
             self.article_table.heading(col, text=col.capitalize(),
                                         command=lambda c=col: self.afficher_articles_avec_tri(c))
         self.configurer_tableau()
+
+        # Les requêtes passent par un thread dédié ; un nouveau chargement du tableau remplace le précédent
+        self.executeur = ExecuteurBD(self.root, sur_activite=self.afficher_chargement)
         self.afficher_articles()
 
+        # Mettre à jour les lignes concernées quand des articles sont modifiés ailleurs
+        abonner_modifications_articles(self.rafraichir_lignes)
+        self.root.bind("<Destroy>", self.sur_fermeture, add="+")
+
     def ajouter_article(self):
         """
         Ouvre une fenêtre pour ajouter un nouvel article.
         """
-        def refresh_table():
-            """
-            Rafraîchit automatiquement le tableau principal après ajout.
-            """
-            self.afficher_articles()
-
-        # Ouvre une fenêtre pour ajouter un article
+        # Ouvre une fenêtre pour ajouter un article ; seules les lignes sauvegardées sont rafraîchies
         ajouter_window = tk.Toplevel(self.root)
-        AjouterModifierArticle(ajouter_window, refresh_table, mode="ajouter")
+        AjouterModifierArticle(ajouter_window, self.rafraichir_lignes, mode="ajouter", executeur=self.executeur)
     
     def configurer_tableau(self):
         """
@@ -112,33 +160,12 @@ class GestionArticles:
             messagebox.showwarning("Modifier", "Veuillez sélectionner un article.")
             return
 
-        # Récupérer les données de l'article sélectionné
-        item_values = self.article_table.item(selected, "values")
-        article_data = {
-            "id": item_values[0],
-            "nom": item_values[1],
-            "categorie": item_values[2],
-            "sous_categorie": item_values[3],
-            "description": item_values[4],
-            "stock": item_values[5],
-            "stock_minimum": item_values[6],
-            "fournisseur": item_values[7],
-            "ref_fournisseur": item_values[8],
-            "prix_achat_ht": item_values[9],
-            "prix_moyen_pondere": item_values[10],
-            "marge_brute": item_values[11],
-            "prix_vente_ht": item_values[12],
-            "prix_vente_ttc": item_values[13],
-            "tva": item_values[14]
-        }
-        def refresh_table():
-            """
-            Rafraîchit automatiquement le tableau principal après modification.
-            """
-            self.afficher_articles()
-        # Ouvre une fenêtre pour modifier l'article
+        # Récupérer les données de l'article sélectionné, dans l'ordre des colonnes du tableau
+        article_data = dict(zip(COLONNES_ARTICLES, self.article_table.item(selected, "values")))
+        # Ouvre une fenêtre pour modifier l'article ; seules les lignes sauvegardées sont rafraîchies
         modifier_window = tk.Toplevel(self.root)
-        AjouterModifierArticle(modifier_window, refresh_table, mode="modifier", article_data=article_data)
+        AjouterModifierArticle(modifier_window, self.rafraichir_lignes, mode="modifier", article_data=article_data,
+                               executeur=self.executeur)
 
 
     def supprimer_article(self):
@@ -152,42 +179,74 @@ class GestionArticles:
 
         confirm = messagebox.askyesno("Supprimer", "Êtes-vous sûr de vouloir supprimer cet article ?")
         if confirm:
-            item_values = self.article_table.item(selected, "values")
-            article_id = item_values[0]  # Récupère l'ID de l'article
-            try:
-                conn = sqlite3.connect("appli.db")
-                cursor = conn.cursor()
-                cursor.execute("UPDATE articles SET etat = 1 WHERE id = ?", (article_id,))
-                conn.commit()
-                conn.close()
-                messagebox.showinfo("Succès", "L'article a été marqué comme supprimé.")
-                self.afficher_articles()  # Actualise le tableau
-            except sqlite3.Error as e:
-                messagebox.showerror("Erreur", f"Impossible de supprimer l'article : {e}")
+            article_id = int(self.article_table.set(selected, "id"))
+            # La ligne est actualisée par la notification de modification de l'article
+            self.executeur.soumettre(
+                supprimer_article, article_id,
+                succes=lambda _: messagebox.showinfo("Succès", "L'article a été marqué comme supprimé."),
+                erreur=lambda e: messagebox.showerror("Erreur", f"Impossible de supprimer l'article : {e}")
+            )
 
 
     def rechercher_article(self):
         """
-        Rechercher un article par nom.
+        Place le curseur dans le champ de recherche.
         """
-        search_window = tk.Toplevel(self.root)
-        search_window.title("Rechercher un article")
-        search_window.geometry("400x200")
+        self.champ_recherche.focus_set()
+        self.champ_recherche.select_range(0, tk.END)
 
-        tk.Label(search_window, text="Nom de l'article :").pack(pady=10)
-        search_entry = tk.Entry(search_window, width=30)
-        search_entry.pack()
+    def planifier_recherche(self):
+        """
+        Relance la recherche après DELAI_RECHERCHE_MS sans nouvelle frappe.
+        """
+        if self.recherche_prevue is not None:
+            self.root.after_cancel(self.recherche_prevue)
+        self.recherche_prevue = self.root.after(self.DELAI_RECHERCHE_MS, self.effectuer_recherche)
 
-        def effectuer_recherche():
-            terme = search_entry.get()
-            if not terme:
-                messagebox.showwarning("Rechercher", "Veuillez entrer un nom.")
-                return
-            # Placeholder pour la recherche dans la base
-            messagebox.showinfo("Rechercher", f"Recherche pour : {terme}")
-            search_window.destroy()
+    def effectuer_recherche(self):
+        """
+        Affiche les articles correspondant à la saisie, les plus pertinents d'abord,
+        ou revient à la liste complète si le champ est vide.
+        """
+        self.recherche_prevue = None
+        terme = self.terme_recherche.get().strip()
+        if not terme:
+            self.afficher_articles()
+            return
 
-        tk.Button(search_window, text="Rechercher", command=effectuer_recherche).pack(pady=20)
+        inclure_supprimes = self.inclure_supprimes.get() == 1
+        self.executeur.soumettre(
+            lambda conn: list(rechercher_articles(conn, terme, limite=self.LIMITE_RECHERCHE,
+                                                  inclure_supprimes=inclure_supprimes)),
+            succes=self.afficher_recherche, cle="tableau",
+            erreur=lambda e: messagebox.showerror("Erreur", f"Impossible de rechercher les articles : {e}")
+        )
+
+    def afficher_recherche(self, resultats):
+        """
+        Remplace le contenu du tableau par les résultats de la recherche.
+        """
+        self.generation_recherche += 1
+        self.mode_recherche = True
+        self.fin_atteinte = True
+        self.debut_atteint = True
+        self.cles_tri = []
+        self.cles_par_id = {}
+        self.article_table.delete(*self.article_table.get_children())
+        self.afficher_lot_resultats(iter(resultats), self.generation_recherche)
+
+    def afficher_lot_resultats(self, resultats, generation):
+        """
+        Insère le lot suivant de résultats puis rend la main à l'interface,
+        sauf si une recherche plus récente a été lancée entre-temps.
+        """
+        if generation != self.generation_recherche:
+            return
+        lot = list(itertools.islice(resultats, self.TAILLE_LOT_RESULTATS))
+        for article in lot:
+            self.article_table.insert("", tk.END, iid=str(article.id), values=self.formater_article(article))
+        if len(lot) == self.TAILLE_LOT_RESULTATS:
+            self.root.after_idle(self.afficher_lot_resultats, resultats, generation)
 
     def afficher_resultats(self, articles):
         """
@@ -200,65 +259,249 @@ class GestionArticles:
     
     def afficher_articles(self):
         """
-        Charge et affiche tous les articles depuis la base de données dans le tableau.
+        Recharge le tableau depuis le début selon le tri courant.
+        Seule la première page est chargée ; les suivantes le sont au défilement.
         Inclut un filtre pour afficher ou exclure les articles marqués comme supprimés.
+        Si une recherche est saisie, c'est elle qui est relancée.
+        """
+        if self.terme_recherche.get().strip():
+            self.effectuer_recherche()
+            return
+        self.mode_recherche = False
+        self.generation_recherche += 1
+        self.article_table.delete(*self.article_table.get_children())
+        self.derniere_cle = None
+        self.fin_atteinte = False
+        self.debut_atteint = True
+        self.cles_tri = []
+        self.cles_par_id = {}
+        self.charger_page_suivante()
+
+    def charger_page_suivante(self):
+        """
+        Demande à l'exécuteur la page d'articles suivant la dernière ligne chargée.
+        Une demande de la même clé (nouveau tri, recherche) annule celle-ci.
         """
-        try:
-            # Connexion à la base de données
-            conn = sqlite3.connect("appli.db")
-            cursor = conn.cursor()
-
-            # Construire la requête SQL en fonction de la case à cocher "inclure_supprimes"
-            if self.inclure_supprimes.get() == 1:
-                query = f"""
-                    SELECT id, nom, categorie, sous_categorie, description, stock, stock_minimum, fournisseur, 
-                        ref_fournisseur, prix_achat_ht, prix_moyen_pondere, marge_brute, prix_vente_ht, 
-                        prix_vente_ttc, tva
-                    FROM articles
-                    ORDER BY {self.colonne_tri} {self.ordre_tri}
-                """
+        if self.fin_atteinte:
+            self.chargement_prevu = False
+            return
+        self.chargement_prevu = True
+        self.executeur.soumettre(
+            lister_articles_page, self.colonne_tri, self.ordre_tri, apres=self.derniere_cle,
+            limite=self.TAILLE_PAGE, inclure_supprimes=self.inclure_supprimes.get() == 1,
+            succes=self.afficher_page, erreur=self.sur_erreur_chargement, cle="tableau"
+        )
+
+    def charger_page_precedente(self):
+        """
+        Demande à l'exécuteur la page d'articles précédant la première ligne chargée,
+        retirée du tableau lors d'un défilement vers le bas.
+        """
+        if self.debut_atteint or not self.cles_tri:
+            self.chargement_prevu = False
+            return
+        self.chargement_prevu = True
+        self.executeur.soumettre(
+            lister_articles_page, self.colonne_tri, self.ordre_tri, avant=self.cles_tri[0],
+            limite=self.TAILLE_PAGE, inclure_supprimes=self.inclure_supprimes.get() == 1,
+            succes=self.afficher_page_precedente, erreur=self.sur_erreur_chargement, cle="tableau"
+        )
+
+    def sur_erreur_chargement(self, erreur):
+        self.chargement_prevu = False
+        messagebox.showerror("Erreur", f"Impossible de charger les articles : {erreur}")
+
+    def afficher_page(self, articles):
+        """
+        Ajoute au tableau une page d'articles reçue de l'exécuteur, puis retire
+        les lignes trop loin au-dessus de la zone visible.
+        """
+        self.chargement_prevu = False
+        if len(articles) < self.TAILLE_PAGE:
+            self.fin_atteinte = True
+        if articles:
+            self.derniere_cle = self.cle_tri(articles[-1])
+        premiere_visible, _ = self.lignes_visibles()
+
+        for article in articles:
+            cle = self.cle_tri(article)
+            self.cles_tri.append(cle)
+            self.cles_par_id[article.id] = cle
+            self.article_table.insert("", tk.END, iid=str(article.id), values=self.formater_article(article))
+
+        retirees = self.retirer_lignes(0, premiere_visible - self.MARGE_CONSERVEE)
+        if retirees:
+            self.debut_atteint = False
+            self.article_table.yview_moveto((premiere_visible - retirees) / len(self.cles_tri))
+
+    def afficher_page_precedente(self, articles):
+        """
+        Insère en tête du tableau une page d'articles reçue de l'exécuteur, puis retire
+        les lignes trop loin sous la zone visible, sans déplacer la zone visible.
+        """
+        self.chargement_prevu = False
+        if len(articles) < self.TAILLE_PAGE:
+            self.debut_atteint = True
+        premiere_visible, derniere_visible = self.lignes_visibles()
+
+        for position, article in enumerate(articles):
+            cle = self.cle_tri(article)
+            self.cles_par_id[article.id] = cle
+            self.article_table.insert("", position, iid=str(article.id), values=self.formater_article(article))
+        self.cles_tri[:0] = [self.cle_tri(article) for article in articles]
+
+        if self.retirer_lignes(derniere_visible + len(articles) + self.MARGE_CONSERVEE, len(self.cles_tri)):
+            self.fin_atteinte = False
+            self.derniere_cle = self.cles_tri[-1]
+        if self.cles_tri:
+            self.article_table.yview_moveto((premiere_visible + len(articles)) / len(self.cles_tri))
+
+    def lignes_visibles(self):
+        """
+        :return: Positions (première, dernière) des lignes affichées dans la zone visible du tableau.
+        """
+        premier, dernier = self.article_table.yview()
+        return round(premier * len(self.cles_tri)), round(dernier * len(self.cles_tri))
+
+    def retirer_lignes(self, debut, fin):
+        """
+        Retire du tableau les lignes chargées aux positions [debut, fin[.
+        :return: Nombre de lignes retirées.
+        """
+        debut, fin = max(debut, 0), max(fin, 0)
+        retirees = self.cles_tri[debut:fin]
+        if not retirees:
+            return 0
+        for _, article_id in retirees:
+            del self.cles_par_id[article_id]
+        self.article_table.delete(*(str(article_id) for _, article_id in retirees))
+        del self.cles_tri[debut:fin]
+        return len(retirees)
+
+    def cle_tri(self, article):
+        """
+        Retourne la clé (valeur de la colonne de tri, id) d'une ligne d'article.
+        """
+        return (getattr(article, self.colonne_tri), article.id)
+
+    def comparer_cles(self, cle_a, cle_b):
+        """
+        Compare deux clés de tri comme SQLite : NULL en tête en ASC, en fin en DESC.
+        """
+        (valeur_a, id_a), (valeur_b, id_b) = cle_a, cle_b
+        if valeur_a != valeur_b:
+            if valeur_a is None:
+                resultat = -1
+            elif valeur_b is None:
+                resultat = 1
             else:
-                query = f"""
-                    SELECT id, nom, categorie, sous_categorie, description, stock, stock_minimum, fournisseur, 
-                        ref_fournisseur, prix_achat_ht, prix_moyen_pondere, marge_brute, prix_vente_ht, 
-                        prix_vente_ttc, tva
-                    FROM articles
-                    WHERE etat = 0
-                    ORDER BY {self.colonne_tri} {self.ordre_tri}
-                """
-
-            # Exécuter la requête et récupérer les résultats
-            cursor.execute(query)
-            articles = cursor.fetchall()
-            conn.close()
-
-            # Effacer les lignes existantes dans le tableau
-            for row in self.article_table.get_children():
-                self.article_table.delete(row)
-
-            # Ajouter les articles dans le tableau avec les formats appropriés
-            for article in articles:
-                article_list = list(article)  # Convertir en liste pour modification
-                # Arrondi des champs numériques et ajout du signe '%' pour marge_brute
-                if article_list[9] is not None:  # prix_achat_ht
-                    article_list[9] = f"{article_list[9]:.3f}"
-                if article_list[10] is not None:  # prix_moyen_pondere
-                    article_list[10] = f"{article_list[10]:.3f}"
-                if article_list[11] is not None:  # marge_brute
-                    article_list[11] = f"{article_list[11]:.1f}%"
-                if article_list[12] is not None:  # prix_vente_ht
-                    article_list[12] = f"{article_list[12]:.3f}"
-                if article_list[13] is not None:  # prix_vente_ttc
-                    article_list[13] = f"{article_list[13]:.3f}"
-                
-                # Insérer les données dans le tableau
-                self.article_table.insert("", tk.END, values=article_list)
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Erreur", f"Impossible de charger les articles : {e}")
+                resultat = -1 if valeur_a < valeur_b else 1
+        else:
+            resultat = (id_a > id_b) - (id_a < id_b)
+        return resultat if self.ordre_tri == "ASC" else -resultat
+
+    def rafraichir_lignes(self, article_ids):
+        """
+        Demande la relecture des articles donnés. Peut être appelée depuis tout thread,
+        les modifications d'articles étant notifiées par le thread qui les a faites.
+        """
+        self.executeur.dans_interface(self.relire_lignes, list(article_ids))
+
+    def relire_lignes(self, article_ids):
+        self.executeur.soumettre(
+            lister_articles_par_ids, article_ids, inclure_supprimes=self.inclure_supprimes.get() == 1,
+            succes=lambda articles: self.appliquer_lignes(article_ids, articles),
+            erreur=lambda e: messagebox.showerror("Erreur", f"Impossible de charger les articles : {e}")
+        )
+
+    def appliquer_lignes(self, article_ids, articles):
+        """
+        Met à jour, insère ou retire uniquement les lignes des articles donnés,
+        sans recharger le reste du tableau.
+        """
+        cle_de = functools.cmp_to_key(self.comparer_cles)
+        for article_id in map(int, article_ids):
+            article = articles.get(article_id)
+            ancienne_cle = self.cles_par_id.get(article_id)
+            nouvelle_cle = self.cle_tri(article) if article else None
+
+            # Résultats de recherche : ordre de pertinence conservé, pas d'insertion
+            if self.mode_recherche:
+                if self.article_table.exists(str(article_id)):
+                    if article is None:
+                        self.article_table.delete(str(article_id))
+                    else:
+                        self.article_table.item(str(article_id), values=self.formater_article(article))
+                continue
+
+            # Ligne toujours à sa place : simple mise à jour des valeurs
+            if ancienne_cle is not None and ancienne_cle == nouvelle_cle:
+                self.article_table.item(str(article_id), values=self.formater_article(article))
+                continue
+
+            if ancienne_cle is not None:
+                position = bisect.bisect_left(self.cles_tri, cle_de(ancienne_cle), key=cle_de)
+                del self.cles_tri[position]
+                del self.cles_par_id[article_id]
+                self.article_table.delete(str(article_id))
+
+            if article is None:
+                continue
+            position = bisect.bisect(self.cles_tri, cle_de(nouvelle_cle), key=cle_de)
+            if (position == len(self.cles_tri) and not self.fin_atteinte) or (position == 0 and not self.debut_atteint):
+                continue  # Hors des pages chargées : la ligne viendra avec sa page
+            self.cles_tri.insert(position, nouvelle_cle)
+            self.cles_par_id[article_id] = nouvelle_cle
+            self.article_table.insert("", position, iid=str(article_id), values=self.formater_article(article))
+
+    def sur_fermeture(self, event):
+        """
+        Se désabonne des modifications d'articles et arrête l'exécuteur à la fermeture de la fenêtre.
+        """
+        if event.widget is self.root:
+            desabonner_modifications_articles(self.rafraichir_lignes)
+            self.executeur.arreter()
+
+    def sur_defilement(self, premier, dernier):
+        """
+        Suit le défilement du tableau et charge la page suivante (ou précédente) quand il reste
+        moins de MARGE_PRECHARGEMENT lignes sous (ou au-dessus de) la zone visible.
+        Le tableau ne garde qu'une fenêtre de lignes autour de la zone visible : les pages
+        chargées d'un côté retirent les lignes trop éloignées de l'autre.
+        """
+        self.scrollbar.set(premier, dernier)
+        if self.chargement_prevu:
+            return
+        nombre = len(self.cles_tri)
+        # Différer le chargement pour ne pas modifier le tableau pendant son rafraîchissement
+        if not self.fin_atteinte and (1.0 - float(dernier)) * nombre < self.MARGE_PRECHARGEMENT:
+            self.chargement_prevu = True
+            self.root.after_idle(self.charger_page_suivante)
+        elif not self.debut_atteint and float(premier) * nombre < self.MARGE_PRECHARGEMENT:
+            self.chargement_prevu = True
+            self.root.after_idle(self.charger_page_precedente)
+
+    def afficher_chargement(self, actif):
+        """
+        Affiche l'indicateur de chargement tant que des requêtes sont en cours.
+        """
+        self.etiquette_chargement.config(text="Chargement..." if actif else "")
+        self.root.config(cursor="watch" if actif else "")
+
+    def formater_article(self, article):
+        """
+        Formate une ligne d'article pour l'affichage : arrondi des champs numériques
+        et ajout du signe '%' pour la marge brute.
+        """
+        article = Article._make(article)
+        formats = {colonne: "{:.3f}" for colonne in self.COLONNES_MONETAIRES}
+        formats["marge_brute"] = "{:.1f}%"
+        return article._replace(**{colonne: format_.format(getattr(article, colonne))
+                                   for colonne, format_ in formats.items() if getattr(article, colonne) is not None})
 
 
 if __name__ == "__main__":
+    appliquer_migrations(obtenir_connexion())
     root = tk.Tk()
     app = GestionArticles(root)
     root.mainloop()
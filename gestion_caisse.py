@@ -1,5 +1,38 @@
+import os
 import sqlite3
+from collections import namedtuple
 from datetime import datetime
+from base_donnees import chemin_base, attacher_base, detacher_base
+from gestion_parametres import reserver_sequence, obtenir_parametre
+from cache_articles import cache_prix_articles
+from gestion_stock import enregistrer_mouvements
+from instrumentation import instrumenter
+from depots import fabrique_lignes, lire_par_ids
+
+
+# Définition de référence de la table DAT (entêtes des ventes)
+DEFINITION_DAT = """
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_type INTEGER NOT NULL, -- 1: Facture, 2: BL, 3: Devis
+    doc_num TEXT UNIQUE NOT NULL,
+    doc_date TEXT NOT NULL,
+    doc_heure TEXT NOT NULL,
+    client_id INTEGER DEFAULT NULL,
+    mode_paiement TEXT NOT NULL, -- ex: cash, carte, cheque
+    tot_htva REAL NOT NULL,
+    tot_tva REAL NOT NULL,
+    tot_ttc REAL NOT NULL,
+    timbre_fiscal REAL NOT NULL,
+    etat INTEGER DEFAULT 0, -- 0: Normal, 1: Validé, 2: Archivé, 9: Effacé
+    FOREIGN KEY (client_id) REFERENCES clients(id)
+"""
+
+# Colonnes de DAT, dans l'ordre de DEFINITION_DAT
+COLONNES_DAT = ("id", "doc_type", "doc_num", "doc_date", "doc_heure", "client_id", "mode_paiement",
+                "tot_htva", "tot_tva", "tot_ttc", "timbre_fiscal", "etat")
+
+# Entête de document (ligne de DAT), accessible par nom (document.doc_num)
+Document = namedtuple("Document", COLONNES_DAT)
 
 
 def initialiser_vente(conn):
@@ -7,23 +40,35 @@ def initialiser_vente(conn):
     Initialise la table DAT pour les entêtes des ventes.
     """
     cursor = conn.cursor()
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS DAT ({DEFINITION_DAT})")
+    conn.commit()
+    # Sur une DAT d'ancien schéma (sans etat), les résumés attendent la migration (voir migrations.py)
+    if "etat" in {ligne[1] for ligne in cursor.execute("PRAGMA table_info(DAT)")}:
+        initialiser_resume_ventes(conn)
+        initialiser_stats_clients(conn)
+        initialiser_journal_etats_ventes(conn)
+
+
+def initialiser_journal_etats_ventes(conn):
+    """
+    Initialise le journal des changements d'état des documents, tenu par un déclencheur sur DAT
+    quelle que soit la requête qui change l'état. Les analyses des ventes n'y relisent que
+    les documents modifiés depuis leur dernier passage.
+    """
+    cursor = conn.cursor()
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS DAT (
+        CREATE TABLE IF NOT EXISTS journal_etats_ventes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            doc_type INTEGER NOT NULL, -- 1: Facture, 2: BL, 3: Devis
-            doc_num TEXT UNIQUE NOT NULL,
-            doc_date TEXT NOT NULL,
-            doc_heure TEXT NOT NULL,
-            client_id INTEGER DEFAULT NULL,
-            mode_paiement TEXT NOT NULL, -- ex: cash, carte, cheque
-            tot_htva REAL NOT NULL,
-            tot_tva REAL NOT NULL,
-            tot_ttc REAL NOT NULL,
-            timbre_fiscal REAL NOT NULL,
-            etat INTEGER DEFAULT 0, -- 0: Normal, 1: Validé, 2: Archivé, 9: Effacé
-            FOREIGN KEY (client_id) REFERENCES clients(id)
+            doc_id INTEGER NOT NULL,
+            etat INTEGER
         )
     """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS dat_journal_etats AFTER UPDATE OF etat ON DAT
+        WHEN old.etat IS NOT new.etat BEGIN
+            INSERT INTO journal_etats_ventes (doc_id, etat) VALUES (new.id, new.etat);
+        END
+    """)
     conn.commit()
 
 
@@ -49,52 +94,53 @@ def initialiser_detail_vente(conn):
     conn.commit()
 
 
-def creer_vente(conn, doc_type, articles, mode_paiement, client_id=None):
-    """
-    Crée une nouvelle vente avec calculs automatiques et mise à jour des stocks.
+# Mapper le doc_type aux clés de séquences dans parametres
+CLES_SEQUENCES = {1: "sequence_facture", 2: "sequence_bl", 3: "sequence_devis"}
 
-    :param conn: Connexion à la base SQLite.
-    :param doc_type: Type de document (1 = facture, 2 = BL, 3 = devis).
-    :param articles: Liste de dictionnaires représentant les articles (article_id, quantite, remise).
-    :param mode_paiement: Mode de paiement (ex. : cash, carte).
-    :param client_id: Identifiant du client (facultatif).
-    :return: Numéro de document généré.
-    """
-    cursor = conn.cursor()
+# États des documents comptés dans les totaux de ventes (0: Normal, 1: Validé)
+ETATS_COMPTABILISES = (0, 1)
 
-    # Mapper le doc_type aux clés de séquences dans parametres
-    key_mapping = {1: "sequence_facture", 2: "sequence_bl", 3: "sequence_devis"}
-    key = key_mapping.get(doc_type, None)
+# Timbre fiscal (dinars) si le paramètre timbre_fiscal est absent
+TIMBRE_FISCAL_DEFAUT = 1
 
+
+def _reserver_numeros(conn, doc_type, nombre):
+    """
+    Réserve `nombre` numéros consécutifs pour un type de document dans la transaction en cours
+    et retourne le premier.
+    """
+    key = CLES_SEQUENCES.get(doc_type, None)
     if not key:
         raise ValueError(f"Type de document inconnu : {doc_type}")
 
-    # Récupérer la séquence actuelle
-    cursor.execute("SELECT valeur FROM parametres WHERE cle = ?", (key,))
-    result = cursor.fetchone()
-    if not result:
+    try:
+        return reserver_sequence(conn, key, nombre)
+    except KeyError:
         raise ValueError(f"La clé '{key}' est introuvable dans la table parametres.")
 
-    sequence = int(result[0])
-    doc_num = f"{doc_type}-{sequence + 1}"
-
-    # Mettre à jour la séquence
-    cursor.execute("UPDATE parametres SET valeur = ? WHERE cle = ?", (sequence + 1, key))
 
-    # Calcul des totaux
+def chiffrer_articles(articles, prix, tva_defaut):
+    """
+    Calcule les lignes DES et les totaux d'une vente à partir des prix des articles.
+    :param articles: Liste de dictionnaires (article_id, quantite, remise facultative en %).
+    :param prix: Dictionnaire {article_id: (prix_vente_ht, tva, prix_vente_min, stock)} (voir cache_articles).
+    :param tva_defaut: Taux de TVA des articles qui n'en ont pas.
+    :return: (lignes, totaux), où chaque ligne est (article_id, quantite, prix_unitaire_ht, remise,
+             prix_total_ht, prix_total_ttc) et totaux est (tot_htva, tot_tva, tot_ttc).
+    """
+    lignes = []
     tot_htva, tot_tva, tot_ttc = 0, 0, 0
     for article in articles:
         article_id = article["article_id"]
         quantite = article["quantite"]
         remise = article.get("remise", 0)
 
-        # Récupérer les informations de l'article
-        cursor.execute("SELECT prix_vente_ht, tva FROM articles WHERE id = ?", (article_id,))
-        result = cursor.fetchone()
-        if not result:
+        if article_id not in prix:
             raise ValueError(f"L'article ID {article_id} est introuvable.")
 
-        prix_unitaire_ht, tva = result
+        prix_unitaire_ht, tva, _, _ = prix[article_id]
+        if tva is None:
+            tva = tva_defaut
         prix_total_ht = quantite * prix_unitaire_ht * (1 - remise / 100)
         prix_total_ttc = prix_total_ht * (1 + tva / 100)
 
@@ -102,59 +148,628 @@ def creer_vente(conn, doc_type, articles, mode_paiement, client_id=None):
         tot_tva += prix_total_ht * tva / 100
         tot_ttc += prix_total_ttc
 
-        # Mise à jour du stock
-        cursor.execute("UPDATE articles SET stock = stock - ? WHERE id = ?", (quantite, article_id))
+        lignes.append((article_id, quantite, prix_unitaire_ht, remise, prix_total_ht, prix_total_ttc))
+    return lignes, (tot_htva, tot_tva, tot_ttc)
 
-        # Ajouter dans DES (détails)
-        cursor.execute("""
-            INSERT INTO DES (doc_id, article_id, quantite, prix_unitaire_ht, remise, prix_total_ht, prix_total_ttc)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (None, article_id, quantite, prix_unitaire_ht, remise, prix_total_ht, prix_total_ttc))
 
-    # Ajouter dans DAT (entête)
+def _enregistrer_vente(cursor, vente, doc_num, prix, timbre_fiscal, tva_defaut):
+    """
+    Insère l'entête DAT puis les lignes DES et les mouvements de stock d'une vente.
+    :param timbre_fiscal: Montant du timbre fiscal du document, sauf si la vente porte le sien.
+    :param tva_defaut: Taux de TVA des articles qui n'en ont pas.
+    :return: Dictionnaire de l'entête créé (id, doc_type, doc_date, client_id, mode_paiement, totaux).
+    """
+    # Calcul des lignes et des totaux, sauf pour une vente déjà chiffrée (voir panier.Panier.vers_vente)
+    if vente.get("lignes") is not None:
+        lignes, (tot_htva, tot_tva, tot_ttc) = vente["lignes"], vente["totaux"]
+        for article_id, *_ in lignes:
+            if article_id not in prix:
+                raise ValueError(f"L'article ID {article_id} est introuvable.")
+    else:
+        lignes, (tot_htva, tot_tva, tot_ttc) = chiffrer_articles(vente["articles"], prix, tva_defaut)
+    timbre_fiscal = vente.get("timbre_fiscal", timbre_fiscal)
+
+    sorties_stock = {}
+    for article_id, quantite, *_ in lignes:
+        sorties_stock[article_id] = sorties_stock.get(article_id, 0) + quantite
+
+    # Ajouter dans DAT (entête) en premier pour obtenir l'ID du document
+    maintenant = vente.get("date_vente") or datetime.now()
+    entete = {
+        "doc_type": vente["doc_type"], "doc_date": maintenant.strftime("%Y-%m-%d"),
+        "client_id": vente.get("client_id"), "mode_paiement": vente["mode_paiement"],
+        "tot_htva": tot_htva, "tot_tva": tot_tva, "tot_ttc": tot_ttc, "timbre_fiscal": timbre_fiscal,
+    }
     cursor.execute("""
         INSERT INTO DAT (doc_type, doc_num, doc_date, doc_heure, client_id, mode_paiement, 
                          tot_htva, tot_tva, tot_ttc, timbre_fiscal, etat)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
-    """, (doc_type, doc_num, datetime.now().strftime("%Y-%m-%d"), datetime.now().strftime("%H:%M:%S"),
-          client_id, mode_paiement, tot_htva, tot_tva, tot_ttc, 1))  # Timbre fiscal = 1 dinar
+    """, (entete["doc_type"], doc_num, entete["doc_date"], maintenant.strftime("%H:%M:%S"), entete["client_id"],
+          entete["mode_paiement"], tot_htva, tot_tva, tot_ttc, entete["timbre_fiscal"]))
+    vente_id = entete["id"] = cursor.lastrowid
 
-    # Obtenir l'ID de la vente pour relier les détails
-    vente_id = cursor.lastrowid
+    # Ajouter dans DES (détails), directement reliés à l'entête
+    cursor.executemany("""
+        INSERT INTO DES (doc_id, article_id, quantite, prix_unitaire_ht, remise, prix_total_ht, prix_total_ttc)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(vente_id, *ligne) for ligne in lignes])
 
-    # Mise à jour du doc_id dans DES
-    cursor.execute("UPDATE DES SET doc_id = ? WHERE doc_id IS NULL", (vente_id,))
+    # Mise à jour du stock et consignation des sorties dans le registre
+    cursor.executemany("UPDATE articles SET stock = stock - ? WHERE id = ?",
+                       [(quantite, article_id) for article_id, quantite in sorties_stock.items()])
+    enregistrer_mouvements(cursor, [(article_id, "vente", -quantite, vente_id)
+                                    for article_id, quantite in sorties_stock.items()], maintenant)
 
-    conn.commit()
+    return entete
 
-    return doc_num
 
+@instrumenter
+def creer_ventes_batch(conn, ventes, allocateurs=None):
+    """
+    Crée plusieurs ventes dans une seule transaction d'écriture immédiate.
+
+    :param conn: Connexion à la base SQLite.
+    :param ventes: Liste de dictionnaires (doc_type, articles, mode_paiement, client_id facultatif),
+                   où articles a le même format que pour creer_vente. Une vente peut porter un
+                   doc_num déjà réservé et sa date_vente (datetime), par exemple depuis file_ventes,
+                   ou ses lignes, totaux et timbre_fiscal déjà calculés (voir chiffrer_articles
+                   et panier.Panier.vers_vente).
+    :param allocateurs: Dictionnaire facultatif {doc_type: AllocateurSequence} de la caisse.
+                        Les types sans allocateur, ou dont l'allocateur est sans_trou, sont
+                        numérotés sans trou dans la transaction de la vente.
+    :return: Liste des numéros de documents générés, dans l'ordre des ventes.
+    """
+    allocateurs = allocateurs or {}
+    for vente in ventes:
+        if vente["doc_type"] not in CLES_SEQUENCES:
+            raise ValueError(f"Type de document inconnu : {vente['doc_type']}")
+
+    # Numéros pris dans les blocs réservés par la caisse, avant d'ouvrir la transaction
+    doc_nums = []
+    for vente in ventes:
+        allocateur = allocateurs.get(vente["doc_type"])
+        if vente.get("doc_num"):
+            doc_nums.append(vente["doc_num"])
+        elif allocateur is not None and not allocateur.sans_trou:
+            doc_nums.append(f"{vente['doc_type']}-{allocateur.suivant()}")
+        else:
+            doc_nums.append(None)
+
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+        # Réserver les numéros sans trou de chaque type de document en une seule mise à jour
+        compteurs = {}
+        for vente, doc_num in zip(ventes, doc_nums):
+            if doc_num is None:
+                compteurs[vente["doc_type"]] = compteurs.get(vente["doc_type"], 0) + 1
+        prochains = {doc_type: _reserver_numeros(conn, doc_type, nombre)
+                     for doc_type, nombre in compteurs.items()}
+
+        # Récupérer les prix de tous les articles concernés depuis le cache, les absents en une passe
+        cache = cache_prix_articles(conn)
+        prix = cache.obtenir(conn, [article["article_id"] for vente in ventes for article in vente["articles"]])
+        # Réglages gardés en mémoire (voir obtenir_parametre) : pas de requête à chaque vente
+        timbre_fiscal = obtenir_parametre(conn, "timbre_fiscal", TIMBRE_FISCAL_DEFAUT)
+        tva_defaut = obtenir_parametre(conn, "tva_default", 0)
+
+        entetes = []
+        for i, vente in enumerate(ventes):
+            doc_type = vente["doc_type"]
+            if doc_nums[i] is None:
+                doc_nums[i] = f"{doc_type}-{prochains[doc_type]}"
+                prochains[doc_type] += 1
+            entetes.append(_enregistrer_vente(cursor, vente, doc_nums[i], prix, timbre_fiscal, tva_defaut))
+
+        # Les nouveaux documents (état 0) entrent dans le résumé des ventes
+        _maj_resume_ventes(cursor, entetes, 1)
+        _maj_stats_clients(cursor, [(entete, None, 0) for entete in entetes])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    sorties = {}
+    for vente in ventes:
+        for article in vente["articles"]:
+            sorties[article["article_id"]] = sorties.get(article["article_id"], 0) + article["quantite"]
+    cache.ajuster_stocks(sorties)
+
+    return doc_nums
+
+
+@instrumenter
+def creer_vente(conn, doc_type, articles, mode_paiement, client_id=None, allocateurs=None):
+    """
+    Crée une nouvelle vente avec calculs automatiques et mise à jour des stocks.
+
+    :param conn: Connexion à la base SQLite.
+    :param doc_type: Type de document (1 = facture, 2 = BL, 3 = devis).
+    :param articles: Liste de dictionnaires représentant les articles (article_id, quantite, remise).
+    :param mode_paiement: Mode de paiement (ex. : cash, carte).
+    :param client_id: Identifiant du client (facultatif).
+    :param allocateurs: Allocateurs de numéros de la caisse (voir creer_ventes_batch).
+    :return: Numéro de document généré.
+    """
+    vente = {"doc_type": doc_type, "articles": articles, "mode_paiement": mode_paiement, "client_id": client_id}
+    return creer_ventes_batch(conn, [vente], allocateurs)[0]
+
+@instrumenter
 def modifier_etat_vente(conn, doc_id, nouvel_etat):
     """
-    Modifie l'état d'une vente.
+    Modifie l'état d'une vente et répercute l'entrée ou la sortie des états comptabilisés
+    (0, 1) sur le résumé des ventes et les statistiques du client, dans la même transaction.
     """
     cursor = conn.cursor()
-    cursor.execute("UPDATE DAT SET etat = ? WHERE id = ?", (nouvel_etat, doc_id))
-    conn.commit()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            SELECT id, doc_type, doc_date, client_id, mode_paiement, tot_htva, tot_tva, tot_ttc, timbre_fiscal, etat
+            FROM DAT WHERE id = ?
+        """, (doc_id,))
+        document = cursor.fetchone()
+        cursor.execute("UPDATE DAT SET etat = ? WHERE id = ?", (nouvel_etat, doc_id))
+
+        if document is not None:
+            entete = dict(zip(("id", "doc_type", "doc_date", "client_id", "mode_paiement",
+                               "tot_htva", "tot_tva", "tot_ttc", "timbre_fiscal"), document))
+            avant, apres = document[-1] in ETATS_COMPTABILISES, nouvel_etat in ETATS_COMPTABILISES
+            if avant != apres:
+                _maj_resume_ventes(cursor, [entete], 1 if apres else -1)
+            _maj_stats_clients(cursor, [(entete, document[-1], nouvel_etat)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
-def rechercher_vente(conn, critere, valeur):
+def lister_archives_ventes(conn, date_debut=None, date_fin=None):
+    """
+    Retourne les bases d'archive des ventes (une par année, voir archivage.py) dont l'année
+    recoupe la période, sous forme de liste [(annee, chemin)].
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archives_ventes'")
+    if cursor.fetchone() is None:
+        return []
+    cursor.execute("""
+        SELECT annee, fichier FROM archives_ventes WHERE annee BETWEEN ? AND ? ORDER BY annee
+    """, (int(date_debut[:4]) if date_debut else 0, int(date_fin[:4]) if date_fin else 9999))
+    dossier = os.path.dirname(chemin_base(conn))
+    return [(annee, os.path.join(dossier, fichier)) for annee, fichier in cursor.fetchall()]
+
+
+def interroger_archives(conn, archives, requete, valeurs=()):
+    """
+    Exécute une requête sur chaque base d'archive, attachée à tour de rôle sous le nom 'archive'
+    (ex. "SELECT ... FROM archive.DAT"). À appeler hors transaction.
+    :return: Lignes obtenues sur l'ensemble des archives.
+    """
+    lignes = []
+    for _, chemin in archives:
+        attacher_base(conn, chemin, "archive")
+        try:
+            lignes.extend(conn.execute(requete, valeurs).fetchall())
+        finally:
+            detacher_base(conn, "archive")
+    return lignes
+
+
+@instrumenter
+def rechercher_vente(conn, critere, valeur, date_debut=None, date_fin=None):
     """
     Recherche une vente selon un critère.
+    Avec une période (dates AAAA-MM-JJ incluses, l'une ou l'autre facultative), la recherche est
+    limitée à ces dates et porte aussi sur les archives des années concernées ; les lignes sont alors
+    triées par date.
+    :return: Liste de Document.
     """
     cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM DAT WHERE {critere} = ? AND etat != 9", (valeur,))
+    cursor.row_factory = fabrique_lignes(Document)
+    if date_debut is None and date_fin is None:
+        cursor.execute(f"SELECT {', '.join(COLONNES_DAT)} FROM DAT WHERE {critere} = ? AND etat != 9", (valeur,))
+        return cursor.fetchall()
+
+    valeurs = (valeur, date_debut or "", date_fin or "9999-12-31")
+    requete = f"""
+        SELECT {", ".join(COLONNES_DAT)} FROM {{}}.DAT
+        WHERE {critere} = ? AND etat != 9 AND doc_date BETWEEN ? AND ?
+    """
+    cursor.execute(requete.format("main"), valeurs)
+    ventes = cursor.fetchall()
+    ventes += map(Document._make, interroger_archives(conn, lister_archives_ventes(conn, date_debut, date_fin),
+                                                      requete.format("archive"), valeurs))
+    return sorted(ventes, key=lambda vente: (vente[3], vente[0]))
+
+
+def lister_documents_par_ids(conn, doc_ids):
+    """
+    Retourne {id: Document} pour les documents demandés de la base courante ;
+    les documents inexistants (ou archivés dans une autre base) sont absents du résultat.
+    """
+    return lire_par_ids(conn, "DAT", Document, doc_ids)
+
+
+def initialiser_resume_ventes(conn):
+    """
+    Initialise la table resume_ventes (totaux par date, type de document et mode de paiement
+    des documents comptabilisés). À sa création, elle est calculée depuis l'historique de DAT.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resume_ventes'")
+    if cursor.fetchone():
+        return
+    # Archives lues avant la transaction : une base ne peut pas être attachée pendant celle-ci
+    resumes_archives = _lire_resumes_archives(conn)
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        cursor.execute("""
+            CREATE TABLE resume_ventes (
+                doc_date TEXT NOT NULL,
+                doc_type INTEGER NOT NULL,
+                mode_paiement TEXT NOT NULL,
+                nb_documents INTEGER NOT NULL DEFAULT 0,
+                tot_htva REAL NOT NULL DEFAULT 0,
+                tot_tva REAL NOT NULL DEFAULT 0,
+                tot_ttc REAL NOT NULL DEFAULT 0,
+                tot_timbre REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (doc_date, doc_type, mode_paiement)
+            ) WITHOUT ROWID
+        """)
+        reconstruire_resume_ventes(conn, resumes_archives)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Totaux de resume_ventes calculés depuis la table DAT d'une base ('main' ou 'archive')
+REQUETE_RESUME_VENTES = f"""
+    SELECT doc_date, CAST(doc_type AS INTEGER), mode_paiement, COUNT(*),
+           SUM(tot_htva), SUM(tot_tva), SUM(tot_ttc), SUM(timbre_fiscal)
+    FROM {{}}.DAT WHERE etat IN ({", ".join(map(str, ETATS_COMPTABILISES))})
+    GROUP BY doc_date, CAST(doc_type AS INTEGER), mode_paiement
+"""
+
+
+def _lire_resumes_archives(conn):
+    """
+    Totaux des archives des ventes pour resume_ventes. À appeler hors transaction.
+    """
+    archives = lister_archives_ventes(conn)
+    return interroger_archives(conn, archives, REQUETE_RESUME_VENTES.format("archive")) if archives else []
+
+
+def reconstruire_resume_ventes(conn, resumes_archives=None):
+    """
+    Recalcule entièrement resume_ventes depuis DAT et les archives des ventes.
+    :param resumes_archives: Totaux des archives déjà lus (voir _lire_resumes_archives), obligatoires
+                             si une transaction est en cours : les archives ne peuvent pas y être attachées.
+    """
+    if resumes_archives is None:
+        resumes_archives = _lire_resumes_archives(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM resume_ventes")
+        cursor.execute(f"""
+            INSERT INTO resume_ventes (doc_date, doc_type, mode_paiement, nb_documents,
+                                       tot_htva, tot_tva, tot_ttc, tot_timbre)
+            {REQUETE_RESUME_VENTES.format("main")}
+        """)
+        cursor.executemany("""
+            INSERT INTO resume_ventes (doc_date, doc_type, mode_paiement, nb_documents,
+                                       tot_htva, tot_tva, tot_ttc, tot_timbre)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (doc_date, doc_type, mode_paiement) DO UPDATE SET
+                nb_documents = nb_documents + excluded.nb_documents,
+                tot_htva = tot_htva + excluded.tot_htva,
+                tot_tva = tot_tva + excluded.tot_tva,
+                tot_ttc = tot_ttc + excluded.tot_ttc,
+                tot_timbre = tot_timbre + excluded.tot_timbre
+        """, resumes_archives)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _maj_resume_ventes(cursor, entetes, signe):
+    """
+    Ajoute (signe = 1) ou retire (signe = -1) des documents du résumé des ventes.
+    """
+    deltas = {}
+    for entete in entetes:
+        cle = (entete["doc_date"], int(entete["doc_type"]), entete["mode_paiement"])
+        nb, htva, tva, ttc, timbre = deltas.get(cle, (0, 0, 0, 0, 0))
+        deltas[cle] = (nb + signe, htva + signe * entete["tot_htva"], tva + signe * entete["tot_tva"],
+                       ttc + signe * entete["tot_ttc"], timbre + signe * entete["timbre_fiscal"])
+    cursor.executemany("""
+        INSERT INTO resume_ventes (doc_date, doc_type, mode_paiement, nb_documents,
+                                   tot_htva, tot_tva, tot_ttc, tot_timbre)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (doc_date, doc_type, mode_paiement) DO UPDATE SET
+            nb_documents = nb_documents + excluded.nb_documents,
+            tot_htva = tot_htva + excluded.tot_htva,
+            tot_tva = tot_tva + excluded.tot_tva,
+            tot_ttc = tot_ttc + excluded.tot_ttc,
+            tot_timbre = tot_timbre + excluded.tot_timbre
+    """, [cle + valeurs for cle, valeurs in deltas.items()])
+
+
+# Types de documents comptés comme achats d'un client (1: facture, 2: BL) ; un BL à l'état 0 reste à régler
+TYPES_ACHATS = (1, 2)
+TYPE_BL = 2
+ETAT_BL_IMPAYE = 0
+
+
+def initialiser_stats_clients(conn):
+    """
+    Initialise les statistiques d'achat des clients : totaux depuis le premier achat (stats_clients)
+    et par mois (stats_clients_mois, pour les périodes glissantes). Elles sont tenues à jour par
+    creer_ventes_batch et modifier_etat_vente ; à leur création, elles sont calculées depuis l'historique.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_clients'")
+    if cursor.fetchone():
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_clients (
+            client_id INTEGER PRIMARY KEY,
+            nb_documents INTEGER NOT NULL DEFAULT 0,
+            tot_ttc REAL NOT NULL DEFAULT 0,
+            derniere_date TEXT, -- date du dernier achat comptabilisé
+            nb_impayes INTEGER NOT NULL DEFAULT 0, -- BL à l'état 0
+            tot_impayes REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_clients_mois (
+            client_id INTEGER NOT NULL,
+            mois TEXT NOT NULL, -- AAAA-MM
+            nb_documents INTEGER NOT NULL DEFAULT 0,
+            tot_ttc REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (client_id, mois)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+    reconstruire_stats_clients(conn)
+
+
+def reconstruire_stats_clients(conn, taille_lot=5000):
+    """
+    Recalcule entièrement les statistiques des clients depuis DAT et les archives des ventes,
+    en une passe sur les totaux mensuels de chaque client, lus dans l'ordre des clients.
+    """
+    requete = f"""
+        SELECT client_id, substr(doc_date, 1, 7) AS mois, COUNT(*), SUM(tot_ttc), MAX(doc_date),
+               SUM(CAST(doc_type AS INTEGER) = {TYPE_BL} AND etat = {ETAT_BL_IMPAYE}),
+               SUM(CASE WHEN CAST(doc_type AS INTEGER) = {TYPE_BL} AND etat = {ETAT_BL_IMPAYE}
+                        THEN tot_ttc ELSE 0 END)
+        FROM {{}}.DAT
+        WHERE client_id IS NOT NULL AND CAST(doc_type AS INTEGER) IN ({", ".join(map(str, TYPES_ACHATS))})
+          AND etat IN ({", ".join(map(str, ETATS_COMPTABILISES))})
+        GROUP BY client_id, mois
+        ORDER BY client_id, mois
+    """
+    # Archives lues avant la transaction : une base ne peut pas être attachée pendant celle-ci
+    archives = lister_archives_ventes(conn)
+    mois_archives = {}
+    for client_id, *totaux in (interroger_archives(conn, archives, requete.format("archive")) if archives else []):
+        mois_archives.setdefault(client_id, []).append(totaux)
+
+    stats, stats_mois = [], []
+
+    def cumuler(client_id, lignes):
+        nb, ttc, derniere, nb_impayes, impayes, par_mois = 0, 0, None, 0, 0, {}
+        for mois, nb_mois, ttc_mois, derniere_mois, nb_impayes_mois, impayes_mois in lignes:
+            nb += nb_mois
+            ttc += ttc_mois
+            derniere = max(derniere or derniere_mois, derniere_mois)
+            nb_impayes += nb_impayes_mois
+            impayes += impayes_mois
+            nb_precedent, ttc_precedent = par_mois.get(mois, (0, 0))
+            par_mois[mois] = (nb_precedent + nb_mois, ttc_precedent + ttc_mois)
+        stats.append((client_id, nb, ttc, derniere, nb_impayes, impayes))
+        stats_mois.extend((client_id, mois, nb_mois, ttc_mois) for mois, (nb_mois, ttc_mois) in par_mois.items())
+
+    def ecrire():
+        cursor.executemany("""
+            INSERT INTO stats_clients (client_id, nb_documents, tot_ttc, derniere_date, nb_impayes, tot_impayes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, stats)
+        cursor.executemany("INSERT INTO stats_clients_mois (client_id, mois, nb_documents, tot_ttc) VALUES (?, ?, ?, ?)",
+                           stats_mois)
+        stats.clear()
+        stats_mois.clear()
+
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM stats_clients")
+        cursor.execute("DELETE FROM stats_clients_mois")
+        lecture = conn.cursor()
+        lecture.execute(requete.format("main"))
+        client_courant, lignes = None, []
+        while True:
+            lot = lecture.fetchmany(taille_lot)
+            for client_id, *totaux in lot:
+                if client_id != client_courant:
+                    if client_courant is not None:
+                        cumuler(client_courant, mois_archives.pop(client_courant, []) + lignes)
+                    client_courant, lignes = client_id, []
+                lignes.append(totaux)
+            if not lot:
+                break
+            if len(stats) >= taille_lot:
+                ecrire()
+        if client_courant is not None:
+            cumuler(client_courant, mois_archives.pop(client_courant, []) + lignes)
+        # Clients dont tous les achats sont archivés
+        for client_id, lignes in mois_archives.items():
+            cumuler(client_id, lignes)
+        ecrire()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _contribution_client(entete, etat):
+    """
+    Part d'un document dans les statistiques de son client selon son état (None : document absent).
+    :return: (nb_documents, tot_ttc, nb_impayes, tot_impayes).
+    """
+    if etat not in ETATS_COMPTABILISES:
+        return 0, 0, 0, 0
+    impaye = int(entete["doc_type"]) == TYPE_BL and etat == ETAT_BL_IMPAYE
+    return 1, entete["tot_ttc"], int(impaye), entete["tot_ttc"] if impaye else 0
+
+
+def _maj_stats_clients(cursor, changements):
+    """
+    Répercute des créations ou changements d'état de documents sur les statistiques des clients.
+    :param changements: Liste de (entête, état avant, état après), l'état avant étant None pour une création.
+    """
+    deltas, deltas_mois, retraits = {}, {}, set()
+    for entete, avant, apres in changements:
+        if entete["client_id"] is None or int(entete["doc_type"]) not in TYPES_ACHATS:
+            continue
+        contribution_avant = _contribution_client(entete, avant)
+        contribution_apres = _contribution_client(entete, apres)
+        if contribution_avant == contribution_apres:
+            continue
+        client_id, date_doc = entete["client_id"], entete["doc_date"]
+        delta = tuple(b - a for a, b in zip(contribution_avant, contribution_apres))
+        nb, ttc, nb_impayes, impayes, derniere = deltas.get(client_id, (0, 0, 0, 0, None))
+        if delta[0] > 0:
+            derniere = max(derniere or date_doc, date_doc)
+        elif delta[0] < 0:
+            retraits.add(client_id)
+        deltas[client_id] = (nb + delta[0], ttc + delta[1], nb_impayes + delta[2], impayes + delta[3], derniere)
+        if delta[0]:
+            cle = (client_id, date_doc[:7])
+            nb_mois, ttc_mois = deltas_mois.get(cle, (0, 0))
+            deltas_mois[cle] = (nb_mois + delta[0], ttc_mois + delta[1])
+
+    cursor.executemany("""
+        INSERT INTO stats_clients (client_id, nb_documents, tot_ttc, nb_impayes, tot_impayes, derniere_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (client_id) DO UPDATE SET
+            nb_documents = nb_documents + excluded.nb_documents,
+            tot_ttc = tot_ttc + excluded.tot_ttc,
+            nb_impayes = nb_impayes + excluded.nb_impayes,
+            tot_impayes = tot_impayes + excluded.tot_impayes,
+            derniere_date = MAX(COALESCE(derniere_date, excluded.derniere_date),
+                                COALESCE(excluded.derniere_date, derniere_date))
+    """, [(client_id,) + valeurs for client_id, valeurs in deltas.items()])
+    cursor.executemany("""
+        INSERT INTO stats_clients_mois (client_id, mois, nb_documents, tot_ttc) VALUES (?, ?, ?, ?)
+        ON CONFLICT (client_id, mois) DO UPDATE SET
+            nb_documents = nb_documents + excluded.nb_documents,
+            tot_ttc = tot_ttc + excluded.tot_ttc
+    """, [cle + valeurs for cle, valeurs in deltas_mois.items()])
+
+    # Un achat retiré peut être le dernier : la date est reprise des documents de la base courante,
+    # à défaut du dernier mois d'achat connu (documents archivés)
+    cursor.executemany(f"""
+        UPDATE stats_clients SET derniere_date = COALESCE(
+            (SELECT MAX(doc_date) FROM DAT WHERE client_id = ?1
+             AND CAST(doc_type AS INTEGER) IN ({", ".join(map(str, TYPES_ACHATS))})
+             AND etat IN ({", ".join(map(str, ETATS_COMPTABILISES))})),
+            (SELECT MAX(mois) || '-01' FROM stats_clients_mois WHERE client_id = ?1 AND nb_documents > 0))
+        WHERE client_id = ?1
+    """, [(client_id,) for client_id in retraits])
+
+
+@instrumenter
+def statistiques_client(conn, client_id, nb_mois=12, date_reference=None):
+    """
+    Retourne les statistiques d'achat d'un client, sans parcourir ses documents.
+
+    :param nb_mois: Longueur de la période glissante, mois de date_reference compris.
+    :param date_reference: Date (AAAA-MM-JJ) de fin de la période glissante, aujourd'hui par défaut.
+    :return: Dictionnaire (nb_documents, tot_ttc, panier_moyen, derniere_date, nb_impayes, tot_impayes,
+             nb_documents_periode, tot_ttc_periode).
+    """
+    date_reference = date_reference or datetime.now().strftime("%Y-%m-%d")
+    annee, mois = int(date_reference[:4]), int(date_reference[5:7])
+    rang_debut = annee * 12 + mois - nb_mois
+    mois_debut = f"{rang_debut // 12:04d}-{rang_debut % 12 + 1:02d}"
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT nb_documents, tot_ttc, derniere_date, nb_impayes, tot_impayes FROM stats_clients WHERE client_id = ?
+    """, (client_id,))
+    nb, ttc, derniere, nb_impayes, impayes = cursor.fetchone() or (0, 0, None, 0, 0)
+    cursor.execute("""
+        SELECT COALESCE(SUM(nb_documents), 0), COALESCE(SUM(tot_ttc), 0) FROM stats_clients_mois
+        WHERE client_id = ? AND mois BETWEEN ? AND ?
+    """, (client_id, mois_debut, date_reference[:7]))
+    nb_periode, ttc_periode = cursor.fetchone()
+    return {
+        "nb_documents": nb, "tot_ttc": ttc, "panier_moyen": ttc / nb if nb else 0, "derniere_date": derniere,
+        "nb_impayes": nb_impayes, "tot_impayes": impayes,
+        "nb_documents_periode": nb_periode, "tot_ttc_periode": ttc_periode,
+    }
+
+
+def bl_impayes_client(conn, client_id):
+    """
+    Liste les BL non réglés (état 0) d'un client, du plus ancien au plus récent, pour son relevé.
+    :return: Lignes dans l'ordre de COLONNES_DAT.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {", ".join(COLONNES_DAT)} FROM DAT
+        WHERE client_id = ? AND CAST(doc_type AS INTEGER) = {TYPE_BL} AND etat = {ETAT_BL_IMPAYE}
+        ORDER BY doc_date, id
+    """, (client_id,))
     return cursor.fetchall()
 
 
+@instrumenter
 def rapport_journalier(conn, date):
     """
-    Génère un rapport des ventes pour une date donnée.
+    Génère un rapport des ventes pour une date donnée, à partir du résumé des ventes.
     """
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT doc_type, SUM(tot_ttc) AS total_ttc, SUM(tot_tva) AS total_tva, SUM(timbre_fiscal) AS total_timbre
-        FROM DAT WHERE doc_date = ? AND etat IN (0, 1) GROUP BY doc_type
+        SELECT doc_type, SUM(tot_ttc) AS total_ttc, SUM(tot_tva) AS total_tva, SUM(tot_timbre) AS total_timbre
+        FROM resume_ventes WHERE doc_date = ? GROUP BY doc_type HAVING SUM(nb_documents) > 0
     """, (date,))
     return cursor.fetchall()
 
+
+# Expressions de regroupement des dates (AAAA-MM-JJ) pour rapport_periode
+REGROUPEMENTS = {"jour": "doc_date", "mois": "substr(doc_date, 1, 7)", "annee": "substr(doc_date, 1, 4)"}
+
+
+@instrumenter
+def rapport_periode(conn, date_debut, date_fin, regroupement="jour", par_mode_paiement=False):
+    """
+    Génère un rapport des ventes sur une plage de dates, à partir du résumé des ventes.
+
+    :param date_debut: Première date incluse (AAAA-MM-JJ).
+    :param date_fin: Dernière date incluse (AAAA-MM-JJ).
+    :param regroupement: "jour", "mois" ou "annee".
+    :param par_mode_paiement: Si vrai, détaille aussi par mode de paiement.
+    :return: Lignes (periode, doc_type, [mode_paiement,] nb_documents, total_htva, total_tva,
+             total_ttc, total_timbre), triées par période.
+    """
+    if regroupement not in REGROUPEMENTS:
+        raise ValueError(f"Regroupement inconnu : {regroupement}")
+    colonnes = "periode, doc_type, mode_paiement" if par_mode_paiement else "periode, doc_type"
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {REGROUPEMENTS[regroupement]} AS periode, doc_type,{" mode_paiement," if par_mode_paiement else ""}
+               SUM(nb_documents), SUM(tot_htva), SUM(tot_tva), SUM(tot_ttc), SUM(tot_timbre)
+        FROM resume_ventes WHERE doc_date BETWEEN ? AND ?
+        GROUP BY {colonnes} HAVING SUM(nb_documents) > 0
+        ORDER BY {colonnes}
+    """, (date_debut, date_fin))
+    return cursor.fetchall()
@@ -1,11 +1,30 @@
 import sqlite3
 import re
+from collections import namedtuple
 from datetime import datetime
+from instrumentation import instrumenter
+from recherche_clients import initialiser_cles_clients, maj_cles_client, invalider_recherche_clients
+from depots import fabrique_lignes, lire_par_ids
 
 
-def initialiser_clients(conn):
+# Colonnes de la table clients, seuls critères acceptés par rechercher_client
+COLONNES_CLIENTS = ("id", "nom", "adresse", "email", "telephone", "matricule_fiscale", "remarque", "date_inscription")
+
+# Ligne de la table clients, accessible par nom (client.telephone)
+Client = namedtuple("Client", COLONNES_CLIENTS)
+
+# Champs modifiables par modifier_client ; un champ à None garde sa valeur
+CHAMPS_MODIFIABLES_CLIENT = ("nom", "adresse", "email", "telephone", "matricule_fiscale", "remarque")
+REQUETE_MODIFIER_CLIENT = f"""
+    UPDATE clients SET {", ".join(f"{champ} = COALESCE(?, {champ})" for champ in CHAMPS_MODIFIABLES_CLIENT)}
+    WHERE id = ?
+"""
+
+
+def initialiser_clients(conn, lever=False):
     """
     Initialise la table clients si elle n'existe pas.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
     """
     try:
         cursor = conn.cursor()
@@ -23,7 +42,10 @@ def initialiser_clients(conn):
         """)
         conn.commit()
     except sqlite3.Error as e:
+        if lever:
+            raise
         print(f"Erreur lors de l'initialisation de la table clients : {e}")
+    initialiser_cles_clients(conn, lever=lever)
 
 
 def valider_email(email):
@@ -42,6 +64,7 @@ def valider_telephone(telephone):
         raise ValueError("Le numéro de téléphone doit contenir uniquement des chiffres.")
 
 
+@instrumenter
 def ajouter_client(conn, nom, adresse=None, email=None, telephone=None, matricule_fiscale=None, remarque=None):
     """
     Ajoute un nouveau client à la base.
@@ -55,13 +78,18 @@ def ajouter_client(conn, nom, adresse=None, email=None, telephone=None, matricul
             INSERT INTO clients (nom, adresse, email, telephone, matricule_fiscale, remarque)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (nom, adresse, email, telephone, matricule_fiscale, remarque))
+        maj_cles_client(cursor, cursor.lastrowid, nom, email, telephone, matricule_fiscale)
         conn.commit()
+        invalider_recherche_clients(conn)
     except sqlite3.IntegrityError as e:
+        conn.rollback()
         print(f"Erreur d'intégrité (email, téléphone ou matricule_fiscale déjà utilisé) : {e}")
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"Erreur lors de l'ajout du client : {e}")
 
 
+@instrumenter
 def modifier_client(conn, id, nom=None, adresse=None, email=None, telephone=None, matricule_fiscale=None, remarque=None):
     """
     Modifie les informations d'un client existant.
@@ -72,26 +100,19 @@ def modifier_client(conn, id, nom=None, adresse=None, email=None, telephone=None
         if telephone:
             valider_telephone(telephone)
 
-        fields = {
-            "nom": nom,
-            "adresse": adresse,
-            "email": email,
-            "telephone": telephone,
-            "matricule_fiscale": matricule_fiscale,
-            "remarque": remarque,
-        }
-        updates = ", ".join(f"{key} = ?" for key, value in fields.items() if value is not None)
-        values = [value for value in fields.values() if value is not None]
-        values.append(id)
-
         cursor = conn.cursor()
-        cursor.execute(f"UPDATE clients SET {updates} WHERE id = ?", values)
+        cursor.execute(REQUETE_MODIFIER_CLIENT, (nom, adresse, email, telephone, matricule_fiscale, remarque, id))
         if cursor.rowcount == 0:
             raise KeyError(f"Client avec ID {id} introuvable.")
+        cursor.execute("SELECT nom, email, telephone, matricule_fiscale FROM clients WHERE id = ?", (id,))
+        maj_cles_client(cursor, id, *cursor.fetchone())
         conn.commit()
+        invalider_recherche_clients(conn)
     except KeyError as e:
+        conn.rollback()
         print(e)
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"Erreur lors de la modification du client : {e}")
 
 
@@ -104,21 +125,38 @@ def supprimer_client(conn, id):
         cursor.execute("DELETE FROM clients WHERE id = ?", (id,))
         if cursor.rowcount == 0:
             raise KeyError(f"Client avec ID {id} introuvable.")
+        maj_cles_client(cursor, id, None, None, None, None)
         conn.commit()
+        invalider_recherche_clients(conn)
     except KeyError as e:
+        conn.rollback()
         print(e)
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"Erreur lors de la suppression du client : {e}")
 
 
+@instrumenter
 def rechercher_client(conn, critere, valeur):
     """
-    Recherche un client selon un critère donné.
+    Recherche un client dont la colonne `critere` vaut exactement `valeur`.
+    Pour une saisie partielle (début de nom, fin de téléphone...), voir recherche_clients.chercher_clients.
+    :return: Client, ou None.
     """
+    if critere not in COLONNES_CLIENTS:
+        raise ValueError(f"Critère de recherche inconnu : {critere}")
     try:
         cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM clients WHERE {critere} = ?", (valeur,))
+        cursor.row_factory = fabrique_lignes(Client)
+        cursor.execute(f"SELECT {', '.join(COLONNES_CLIENTS)} FROM clients WHERE {critere} = ?", (valeur,))
         return cursor.fetchone()
     except sqlite3.Error as e:
         print(f"Erreur lors de la recherche du client : {e}")
         return None
+
+
+def lister_clients_par_ids(conn, client_ids):
+    """
+    Retourne {id: Client} pour les clients demandés ; les clients inexistants sont absents du résultat.
+    """
+    return lire_par_ids(conn, "clients", Client, client_ids)
@@ -1,8 +1,22 @@
 import sqlite3
+import threading
+from base_donnees import SuiviModifications, registre_caches
 
-def initialiser_parametres(conn):
+
+# Type des paramètres connus ; les autres sont lus comme du texte
+TYPES_PARAMETRES = {
+    'sequence_facture': int,
+    'sequence_bl': int,
+    'sequence_devis': int,
+    'tva_default': float,
+    'timbre_fiscal': float,
+    'theme_sombre': bool,
+}
+
+def initialiser_parametres(conn, lever=False):
     """
     Initialise la table des paramètres si elle n'existe pas et ajoute les valeurs par défaut.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
     """
     try:
         cursor = conn.cursor()
@@ -24,12 +38,16 @@ def initialiser_parametres(conn):
         for cle, valeur in defauts.items():
             cursor.execute("INSERT OR IGNORE INTO parametres (cle, valeur) VALUES (?, ?)", (cle, valeur))
         conn.commit()
+        invalider_parametres(conn)
     except sqlite3.Error as e:
+        if lever:
+            raise
         print(f"Erreur lors de l'initialisation des paramètres : {e}")
 
 def lire_parametre(conn, cle):
     """
-    Lit la valeur d'un paramètre donné.
+    Lit la valeur d'un paramètre donné directement dans la base (voir obtenir_parametre pour
+    une lecture en mémoire, typée).
     :param conn: Connexion SQLite
     :param cle: Clé du paramètre
     :return: Valeur du paramètre ou None si la clé n'existe pas
@@ -43,6 +61,62 @@ def lire_parametre(conn, cle):
         print(f"Erreur lors de la lecture du paramètre '{cle}' : {e}")
         return None
 
+def convertir_parametre(cle, valeur):
+    """
+    Convertit la valeur texte d'un paramètre selon TYPES_PARAMETRES, ex. 'true' -> True, '19' -> 19.0.
+    Une valeur non convertible est gardée telle quelle.
+    """
+    type_ = TYPES_PARAMETRES.get(cle)
+    if valeur is None or type_ is None:
+        return valeur
+    if type_ is bool:
+        return str(valeur).strip().lower() in ("1", "true", "vrai", "oui")
+    try:
+        return type_(valeur)
+    except (TypeError, ValueError):
+        return valeur
+
+class CacheParametres:
+    """
+    Paramètres chargés en une requête et gardés en mémoire, typés (voir convertir_parametre),
+    partagés par les connexions d'un même fichier. Les modifications faites dans le processus
+    sont prises en compte aussitôt (invalider) ; celles des autres processus au plus
+    DELAI_VERIFICATION secondes après (voir SuiviModifications).
+    """
+
+    def __init__(self):
+        self.valeurs = None
+        self.modifications = SuiviModifications()
+
+    def obtenir(self, conn):
+        if self.modifications.modifiee(conn) or self.valeurs is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT cle, valeur FROM parametres")
+            self.valeurs = {cle: convertir_parametre(cle, valeur) for cle, valeur in cursor.fetchall()}
+        return self.valeurs
+
+    def invalider(self):
+        self.valeurs = None
+
+def cache_parametres(conn):
+    registre = registre_caches(conn)
+    cache = registre.get("parametres")
+    if cache is None:
+        cache = registre["parametres"] = CacheParametres()
+    return cache
+
+def invalider_parametres(conn):
+    cache_parametres(conn).invalider()
+
+def obtenir_parametre(conn, cle, defaut=None):
+    """
+    Retourne la valeur typée d'un paramètre depuis la mémoire, sans requête tant que les paramètres
+    ne changent pas. Pour les séquences, dont la valeur change à chaque document, utiliser
+    lire_parametre ou reserver_sequence.
+    :param defaut: Valeur retournée si la clé n'existe pas.
+    """
+    return cache_parametres(conn).obtenir(conn).get(cle, defaut)
+
 def modifier_parametre(conn, cle, valeur):
     """
     Modifie la valeur d'un paramètre existant.
@@ -56,6 +130,7 @@ def modifier_parametre(conn, cle, valeur):
         if cursor.rowcount == 0:
             raise KeyError(f"La clé '{cle}' n'existe pas.")
         conn.commit()
+        invalider_parametres(conn)
     except KeyError as e:
         print(e)
     except sqlite3.Error as e:
@@ -69,16 +144,38 @@ def ajouter_parametre(conn, cle, valeur):
     :param valeur: Valeur du paramètre
     """
     try:
-        if lire_parametre(conn, cle) is not None:
-            raise KeyError(f"Le paramètre '{cle}' existe déjà.")
         cursor = conn.cursor()
-        cursor.execute("INSERT INTO parametres (cle, valeur) VALUES (?, ?)", (cle, valeur))
+        cursor.execute("INSERT OR IGNORE INTO parametres (cle, valeur) VALUES (?, ?)", (cle, valeur))
+        if cursor.rowcount == 0:
+            raise KeyError(f"Le paramètre '{cle}' existe déjà.")
         conn.commit()
+        invalider_parametres(conn)
     except KeyError as e:
         print(e)
     except sqlite3.Error as e:
         print(f"Erreur lors de l'ajout du paramètre '{cle}' : {e}")
 
+def reserver_sequence(conn, cle, nombre=1):
+    """
+    Réserve atomiquement des valeurs consécutives d'une séquence.
+    Ouvre une transaction d'écriture immédiate si aucune n'est en cours et ne la valide pas :
+    les valeurs sont rendues si l'appelant annule sa transaction.
+    :param conn: Connexion SQLite
+    :param cle: Clé de la séquence
+    :param nombre: Nombre de valeurs à réserver
+    :return: Première valeur réservée
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE parametres SET valeur = CAST(valeur AS INTEGER) + ? WHERE cle = ? RETURNING valeur
+    """, (nombre, cle))
+    result = cursor.fetchone()
+    if result is None:
+        raise KeyError(f"La clé '{cle}' n'existe pas.")
+    return int(result[0]) - nombre + 1
+
 def incremente_sequence(conn, cle, prefixe=""):
     """
     Incrémente la valeur d'une séquence et retourne le numéro complet avec préfixe.
@@ -88,13 +185,63 @@ def incremente_sequence(conn, cle, prefixe=""):
     :return: Numéro incrémenté avec préfixe
     """
     try:
-        valeur = lire_parametre(conn, cle)
-        if valeur is None:
-            valeur = 0
-            ajouter_parametre(conn, cle, str(valeur))
-        nouvelle_valeur = int(valeur) + 1
-        modifier_parametre(conn, cle, str(nouvelle_valeur))
+        try:
+            nouvelle_valeur = reserver_sequence(conn, cle)
+        except KeyError:
+            conn.execute("INSERT INTO parametres (cle, valeur) VALUES (?, '1')", (cle,))
+            nouvelle_valeur = 1
+        conn.commit()
         return f"{prefixe}{nouvelle_valeur}"
     except sqlite3.Error as e:
+        conn.rollback()
         print(f"Erreur lors de l'incrémentation de la séquence '{cle}' : {e}")
         return None
+
+class AllocateurSequence:
+    """
+    Distribue les numéros d'une séquence pour une caisse en réservant des blocs,
+    de sorte que les caisses ne se disputent la table parametres qu'une fois par bloc.
+    Les numéros non utilisés d'un bloc sont perdus à l'arrêt : pour une numérotation
+    sans trou (factures), utiliser sans_trou=True.
+    """
+
+    def __init__(self, conn, cle, taille_bloc=50, sans_trou=False):
+        """
+        :param conn: Connexion utilisée pour les réservations. En mode bloc, chaque réservation
+                     est validée aussitôt : la connexion ne doit pas avoir de transaction en cours.
+        :param cle: Clé de la séquence dans parametres
+        :param taille_bloc: Nombre de numéros réservés à la fois
+        :param sans_trou: Si vrai, chaque numéro est pris dans la transaction en cours de conn
+                          et rendu si celle-ci est annulée.
+        """
+        self.conn = conn
+        self.cle = cle
+        self.taille_bloc = 1 if sans_trou else taille_bloc
+        self.sans_trou = sans_trou
+        self._prochain = 1
+        self._fin = 0
+        self._verrou = threading.Lock()
+
+    def suivant(self):
+        """
+        Retourne le prochain numéro de la séquence.
+        """
+        if self.sans_trou:
+            return reserver_sequence(self.conn, self.cle)
+        with self._verrou:
+            if self._prochain > self._fin:
+                self._reserver_bloc()
+            numero = self._prochain
+            self._prochain += 1
+            return numero
+
+    def _reserver_bloc(self):
+        if self.conn.in_transaction:
+            raise RuntimeError("Impossible de réserver un bloc pendant une transaction en cours.")
+        try:
+            premier = reserver_sequence(self.conn, self.cle, self.taille_bloc)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._prochain, self._fin = premier, premier + self.taille_bloc - 1
@@ -0,0 +1,177 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+from cache_articles import invalider_articles
+
+
+# Types de mouvements du registre ; la quantité est positive pour une entrée, négative pour une sortie
+TYPES_MOUVEMENTS = ("ouverture", "vente", "reception", "ajustement", "retour")
+
+
+def initialiser_mouvements_stock(conn, lever=False):
+    """
+    Initialise le registre des mouvements de stock et la table des photos de stock par article.
+    À la création du registre, un mouvement 'ouverture' reprend le stock actuel de chaque article,
+    de sorte que la somme des mouvements soit égale à articles.stock.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mouvements_stock'")
+        existe = cursor.fetchone() is not None
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS mouvements_stock (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                article_id INTEGER NOT NULL,
+                date_mouvement TEXT NOT NULL, -- AAAA-MM-JJ HH:MM:SS
+                type_mouvement TEXT NOT NULL, -- voir TYPES_MOUVEMENTS
+                quantite INTEGER NOT NULL,
+                reference_id INTEGER DEFAULT NULL, -- DAT.id pour une vente ou un retour, receptions.id
+                FOREIGN KEY (article_id) REFERENCES articles(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_mouvements_stock_article_date
+            ON mouvements_stock (article_id, date_mouvement)
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mouvements_stock_date ON mouvements_stock (date_mouvement)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots_stock (
+                article_id INTEGER NOT NULL,
+                date_snapshot TEXT NOT NULL, -- stock en fin de journée
+                stock INTEGER NOT NULL,
+                PRIMARY KEY (article_id, date_snapshot)
+            ) WITHOUT ROWID
+        """)
+        if not existe:
+            cursor.execute("""
+                INSERT INTO mouvements_stock (article_id, date_mouvement, type_mouvement, quantite)
+                SELECT id, ?, 'ouverture', stock FROM articles WHERE COALESCE(stock, 0) != 0
+            """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation des mouvements de stock : {e}")
+
+
+def enregistrer_mouvements(cursor, mouvements, date_mouvement=None):
+    """
+    Ajoute des mouvements au registre dans la transaction en cours.
+    Le compteur articles.stock est mis à jour par l'appelant, dans la même transaction.
+    :param mouvements: Itérable de (article_id, type_mouvement, quantite, reference_id).
+    :param date_mouvement: datetime du mouvement (maintenant par défaut).
+    """
+    horodatage = (date_mouvement or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    cursor.executemany("""
+        INSERT INTO mouvements_stock (article_id, date_mouvement, type_mouvement, quantite, reference_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(article_id, horodatage, type_mouvement, quantite, reference_id)
+          for article_id, type_mouvement, quantite, reference_id in mouvements if quantite])
+
+
+def _lendemain(jour):
+    return (date.fromisoformat(jour) + timedelta(days=1)).isoformat()
+
+
+def _stocks_registre(cursor, jour=None):
+    """
+    Calcule le stock de chaque article d'après le registre, en fin de journée `jour`
+    (ou à l'instant présent) : dernière photo antérieure, plus les mouvements qui la suivent.
+    :return: Dictionnaire {article_id: stock}.
+    """
+    if jour is None:
+        cursor.execute("SELECT MAX(date_snapshot) FROM snapshots_stock")
+    else:
+        cursor.execute("SELECT MAX(date_snapshot) FROM snapshots_stock WHERE date_snapshot <= ?", (jour,))
+    photo = cursor.fetchone()[0]
+
+    stocks = {}
+    conditions, valeurs = [], []
+    if photo is not None:
+        cursor.execute("SELECT article_id, stock FROM snapshots_stock WHERE date_snapshot = ?", (photo,))
+        stocks = dict(cursor.fetchall())
+        conditions.append("date_mouvement >= ?")
+        valeurs.append(_lendemain(photo))
+    if jour is not None:
+        conditions.append("date_mouvement < ?")
+        valeurs.append(_lendemain(jour))
+    filtre = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f"SELECT article_id, SUM(quantite) FROM mouvements_stock {filtre} GROUP BY article_id", valeurs)
+    for article_id, quantite in cursor.fetchall():
+        stocks[article_id] = stocks.get(article_id, 0) + quantite
+    return stocks
+
+
+def creer_snapshots_stock(conn, jour=None):
+    """
+    Enregistre la photo du stock de tous les articles en fin de journée, à partir de la photo
+    précédente et des seuls mouvements qui la suivent. À lancer périodiquement sur des journées closes.
+    :param jour: Date 'AAAA-MM-JJ' (la veille par défaut).
+    :return: Nombre d'articles photographiés.
+    """
+    jour = jour or (date.today() - timedelta(days=1)).isoformat()
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        stocks = _stocks_registre(cursor, jour)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO snapshots_stock (article_id, date_snapshot, stock) VALUES (?, ?, ?)
+        """, [(article_id, jour, stock) for article_id, stock in stocks.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(stocks)
+
+
+def stock_a_date(conn, article_id, jour):
+    """
+    Retourne le stock d'un article en fin de journée : une lecture de photo,
+    puis la somme des mouvements de l'article survenus depuis.
+    :param jour: Date 'AAAA-MM-JJ'.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT date_snapshot, stock FROM snapshots_stock
+        WHERE article_id = ? AND date_snapshot <= ? ORDER BY date_snapshot DESC LIMIT 1
+    """, (article_id, jour))
+    photo = cursor.fetchone()
+    debut, stock = (_lendemain(photo[0]), photo[1]) if photo else ("", 0)
+    cursor.execute("""
+        SELECT COALESCE(SUM(quantite), 0) FROM mouvements_stock
+        WHERE article_id = ? AND date_mouvement >= ? AND date_mouvement < ?
+    """, (article_id, debut, _lendemain(jour)))
+    return stock + cursor.fetchone()[0]
+
+
+def verifier_stocks(conn, corriger=False):
+    """
+    Compare le compteur articles.stock au stock calculé depuis le registre.
+    :param corriger: Si vrai, le compteur des articles en écart est remplacé par la valeur du registre.
+    :return: Liste des écarts (article_id, stock_article, stock_registre).
+    """
+    cursor = conn.cursor()
+    try:
+        # Lecture cohérente du registre et des compteurs, verrou d'écriture pris d'emblée pour corriger
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE" if corriger else "BEGIN")
+        stocks = _stocks_registre(cursor)
+        cursor.execute("SELECT id, COALESCE(stock, 0) FROM articles")
+        ecarts = [(article_id, stock, stocks.get(article_id, 0)) for article_id, stock in cursor.fetchall()
+                  if stock != stocks.get(article_id, 0)]
+        if corriger:
+            cursor.executemany("UPDATE articles SET stock = ? WHERE id = ?",
+                               [(stock_registre, article_id) for article_id, _, stock_registre in ecarts])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if corriger and ecarts:
+        invalider_articles(conn, [article_id for article_id, _, _ in ecarts])
+    return ecarts
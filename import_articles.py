@@ -0,0 +1,243 @@
+import csv
+import itertools
+import re
+import sqlite3
+from gestion_articles import calculer_prix_vente_ttc, calculer_marge_brute, notifier_modifications_articles
+from cache_articles import invalider_articles, maj_index_codes_barres
+from gestion_stock import enregistrer_mouvements
+
+
+# Colonnes reconnues dans les catalogues et conversion des valeurs numériques
+CHAMPS_ARTICLE = (
+    "nom", "categorie", "sous_categorie", "description", "stock", "stock_minimum", "fournisseur",
+    "ref_fournisseur", "tva", "prix_achat_ht", "prix_vente_min", "prix_vente_ht"
+)
+CONVERSIONS = {
+    "stock": int, "stock_minimum": int, "tva": float,
+    "prix_achat_ht": float, "prix_vente_min": float, "prix_vente_ht": float,
+}
+COLONNE_CODES_BARRES = "codes_barres"
+CLES_IMPORT = ("nom", "ref_fournisseur")
+
+
+def lire_catalogue_csv(chemin, delimiteur=";", encodage="utf-8-sig"):
+    """
+    Lit un catalogue CSV ligne par ligne, sans le charger en mémoire.
+    La première ligne donne les noms de colonnes (voir CHAMPS_ARTICLE et COLONNE_CODES_BARRES).
+    :return: Générateur de (numero_ligne, dictionnaire des valeurs).
+    """
+    with open(chemin, newline="", encoding=encodage) as fichier:
+        for numero, ligne in enumerate(csv.DictReader(fichier, delimiter=delimiteur), start=2):
+            yield numero, ligne
+
+
+def _convertir_ligne(ligne):
+    """
+    Nettoie une ligne brute : valeurs vides à None, nombres au format 1,5 ou 1.5, codes-barres en liste.
+    """
+    article = {}
+    for champ in CHAMPS_ARTICLE:
+        valeur = ligne.get(champ)
+        if isinstance(valeur, str):
+            valeur = valeur.strip() or None
+        if valeur is not None and champ in CONVERSIONS:
+            try:
+                valeur = CONVERSIONS[champ](str(valeur).replace(",", "."))
+            except ValueError:
+                raise ValueError(f"Valeur invalide pour '{champ}' : {valeur}")
+        article[champ] = valeur
+    codes = ligne.get(COLONNE_CODES_BARRES) or ""
+    article[COLONNE_CODES_BARRES] = [code for code in re.split(r"[\s,|]+", str(codes)) if code]
+    return article
+
+
+def _calculer_champs_derives(articles, existants):
+    """
+    Complète chaque article du lot avec les valeurs en base pour les champs absents,
+    puis calcule prix_vente_ttc, marge_brute et prix_moyen_pondere selon les règles d'ajouter_article.
+    """
+    for article in articles:
+        actuel = existants.get(article["cle"], {})
+        for champ in ("tva", "prix_achat_ht", "prix_vente_ht"):
+            if article[champ] is None:
+                article[champ] = actuel.get(champ) or 0
+            article[champ] = round(article[champ], 3)
+        if article["prix_vente_min"] is not None:
+            article["prix_vente_min"] = round(article["prix_vente_min"], 3)
+        # Le PMP d'un article existant n'est pas écrasé par le prix du catalogue
+        article["prix_moyen_pondere"] = actuel.get("prix_moyen_pondere") or article["prix_achat_ht"]
+        article["prix_vente_ttc"] = calculer_prix_vente_ttc(article["prix_vente_ht"], article["tva"])
+        article["marge_brute"] = calculer_marge_brute(article["prix_vente_ht"], article["prix_moyen_pondere"])
+
+
+def _selectionner(cursor, requete, valeurs):
+    """
+    Exécute une requête `... IN ({})` sur une liste de valeurs, par paquets de 500.
+    """
+    resultats = []
+    for i in range(0, len(valeurs), 500):
+        lot = valeurs[i:i + 500]
+        cursor.execute(requete.format(", ".join("?" * len(lot))), lot)
+        resultats.extend(cursor.fetchall())
+    return resultats
+
+
+def _importer_lot(conn, lot, cle, rapport):
+    """
+    Importe un lot de lignes dans une transaction et retourne les identifiants des articles touchés.
+    """
+    # Conversion et contrôle des lignes ; en cas de doublon dans le lot, la dernière ligne l'emporte
+    articles = {}
+    for numero, ligne in lot:
+        try:
+            article = _convertir_ligne(ligne)
+        except ValueError as e:
+            rapport["rejets"].append((numero, str(e)))
+            continue
+        if not article["nom"]:
+            rapport["rejets"].append((numero, "Le champ 'nom' est obligatoire."))
+            continue
+        if not article[cle]:
+            rapport["rejets"].append((numero, f"Le champ '{cle}' est obligatoire pour l'import."))
+            continue
+        article["numero"], article["cle"] = numero, article[cle]
+        if article["cle"] in articles:
+            rapport["rejets"].append((articles[article["cle"]]["numero"], "Ligne remplacée par un doublon."))
+        articles[article["cle"]] = article
+    articles = list(articles.values())
+    if not articles:
+        return []
+
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+        # Articles existants repérés par la clé d'import, en une requête par paquet
+        lignes_existantes = _selectionner(cursor, f"""
+            SELECT id, {cle}, nom, tva, prix_achat_ht, prix_vente_ht, prix_moyen_pondere, stock
+            FROM articles WHERE {cle} IN ({{}})
+        """, [article["cle"] for article in articles])
+        existants = {
+            valeur_cle: {"id": article_id, "nom": nom, "tva": tva, "prix_achat_ht": prix_achat_ht,
+                         "prix_vente_ht": prix_vente_ht, "prix_moyen_pondere": prix_moyen_pondere,
+                         "stock": stock}
+            for article_id, valeur_cle, nom, tva, prix_achat_ht, prix_vente_ht, prix_moyen_pondere, stock
+            in lignes_existantes
+        }
+
+        # Un nom déjà porté par un autre article viole l'unicité de articles.nom
+        noms_pris = dict(_selectionner(cursor, "SELECT nom, id FROM articles WHERE nom IN ({})",
+                                       [article["nom"] for article in articles]))
+        acceptes = []
+        for article in articles:
+            article_id = existants.get(article["cle"], {}).get("id")
+            if article["nom"] in noms_pris and noms_pris[article["nom"]] != article_id:
+                rapport["rejets"].append((article["numero"], f"Nom déjà utilisé : {article['nom']}"))
+            else:
+                # Le nom est réservé pour les lignes suivantes du lot, y compris pour un nouvel article
+                noms_pris[article["nom"]] = article_id if article_id is not None else ("ligne", article["numero"])
+                acceptes.append(article)
+        articles = acceptes
+
+        _calculer_champs_derives(articles, existants)
+        nouveaux = [article for article in articles if article["cle"] not in existants]
+        modifies = [article for article in articles if article["cle"] in existants]
+
+        cursor.executemany("""
+            INSERT INTO articles (
+                nom, categorie, sous_categorie, description, stock, stock_minimum, fournisseur,
+                ref_fournisseur, tva, prix_achat_ht, prix_moyen_pondere, marge_brute,
+                prix_vente_min, prix_vente_ht, prix_vente_ttc
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(a["nom"], a["categorie"], a["sous_categorie"], a["description"], a["stock"] or 0,
+               a["stock_minimum"] or 0, a["fournisseur"], a["ref_fournisseur"], a["tva"], a["prix_achat_ht"],
+               a["prix_moyen_pondere"], a["marge_brute"], a["prix_vente_min"] or 0, a["prix_vente_ht"],
+               a["prix_vente_ttc"]) for a in nouveaux])
+
+        cursor.executemany("""
+            UPDATE articles SET
+                nom = ?, categorie = COALESCE(?, categorie), sous_categorie = COALESCE(?, sous_categorie),
+                description = COALESCE(?, description), stock = COALESCE(?, stock),
+                stock_minimum = COALESCE(?, stock_minimum), fournisseur = COALESCE(?, fournisseur),
+                ref_fournisseur = COALESCE(?, ref_fournisseur), tva = ?, prix_achat_ht = ?,
+                prix_moyen_pondere = ?, marge_brute = ?, prix_vente_min = COALESCE(?, prix_vente_min),
+                prix_vente_ht = ?, prix_vente_ttc = ?
+            WHERE id = ?
+        """, [(a["nom"], a["categorie"], a["sous_categorie"], a["description"], a["stock"], a["stock_minimum"],
+               a["fournisseur"], a["ref_fournisseur"], a["tva"], a["prix_achat_ht"], a["prix_moyen_pondere"],
+               a["marge_brute"], a["prix_vente_min"], a["prix_vente_ht"], a["prix_vente_ttc"],
+               existants[a["cle"]]["id"]) for a in modifies])
+
+        # Identifiants des articles insérés, puis rattachement des codes-barres
+        ids = dict(_selectionner(cursor, "SELECT nom, id FROM articles WHERE nom IN ({})",
+                                 [article["nom"] for article in articles]))
+
+        # Stock initial des nouveaux articles et écarts de stock des articles existants
+        enregistrer_mouvements(cursor, [(ids[a["nom"]], "ouverture", a["stock"] or 0, None) for a in nouveaux] + [
+            (ids[a["nom"]], "ajustement", a["stock"] - (existants[a["cle"]]["stock"] or 0), None)
+            for a in modifies if a["stock"] is not None
+        ])
+        # Un code-barre présent sur plusieurs lignes du lot reste à la première
+        codes = {}
+        for article in articles:
+            for code in article[COLONNE_CODES_BARRES]:
+                if code in codes and codes[code][0] != ids[article["nom"]]:
+                    rapport["rejets"].append((article["numero"], f"Code-barre {code} en double dans l'import "
+                                                                 f"(ligne {codes[code][1]})."))
+                else:
+                    codes.setdefault(code, (ids[article["nom"]], article["numero"]))
+        attribues = dict(_selectionner(
+            cursor, "SELECT code_barre, article_id FROM code_barres WHERE code_barre IN ({})", list(codes)
+        ))
+        ajoutes = []
+        for code, (article_id, numero) in codes.items():
+            if code not in attribues:
+                ajoutes.append((code, article_id))
+            elif attribues[code] != article_id:
+                motif = f"Code-barre {code} déjà attribué à l'article {attribues[code]}."
+                rapport["rejets"].append((numero, motif))
+        cursor.executemany("INSERT INTO code_barres (code_barre, article_id) VALUES (?, ?)", ajoutes)
+
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        rapport["rejets"].extend((article["numero"], f"Lot annulé : {e}") for article in articles)
+        return []
+
+    rapport["inserees"] += len(nouveaux)
+    rapport["mises_a_jour"] += len(modifies)
+    rapport["codes_barres"] += len(ajoutes)
+    maj_index_codes_barres(conn, ajoutes=ajoutes)
+    return [ids[article["nom"]] for article in articles]
+
+
+def importer_articles(conn, lignes, cle="nom", taille_lot=1000, progression=None):
+    """
+    Importe ou met à jour des articles en masse, un lot par transaction.
+
+    :param conn: Connexion à la base SQLite.
+    :param lignes: Itérable de (numero_ligne, dictionnaire), par exemple lire_catalogue_csv(chemin).
+                   Les champs absents ou vides d'un article existant conservent leur valeur.
+    :param cle: Colonne identifiant un article existant : "nom" ou "ref_fournisseur".
+    :param taille_lot: Nombre de lignes par transaction.
+    :param progression: Fonction facultative appelée avec le rapport après chaque lot.
+    :return: Rapport {"lues", "inserees", "mises_a_jour", "codes_barres", "rejets": [(numero, motif)]}.
+    """
+    if cle not in CLES_IMPORT:
+        raise ValueError(f"Clé d'import inconnue : {cle}")
+
+    rapport = {"lues": 0, "inserees": 0, "mises_a_jour": 0, "codes_barres": 0, "rejets": []}
+    lignes = iter(lignes)
+    while True:
+        lot = list(itertools.islice(lignes, taille_lot))
+        if not lot:
+            break
+        rapport["lues"] += len(lot)
+        article_ids = _importer_lot(conn, lot, cle, rapport)
+        if article_ids:
+            invalider_articles(conn, article_ids)
+            notifier_modifications_articles(article_ids)
+        if progression:
+            progression(rapport)
+    return rapport
@@ -0,0 +1,281 @@
+import bisect
+import collections
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from base_donnees import Connexion, definir_fabrique_connexion
+
+
+# Bornes supérieures (ms) des classes des histogrammes de latence ; la dernière classe est ouverte
+BORNES_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Une prise de verrou d'écriture plus longue que ce seuil compte comme une attente de verrou
+SEUIL_ATTENTE_VERROU_MS = 5
+
+TAILLE_JOURNAL_LENTES = 200
+
+_verrou = threading.Lock()
+_actif = False
+_seuil_lent_ms = 50.0
+_requetes = {}
+_fonctions = {}
+_lentes = collections.deque(maxlen=TAILLE_JOURNAL_LENTES)
+_compteurs = {"attentes_verrou": 0, "duree_attentes_verrou_ms": 0.0, "base_occupee": 0, "erreurs": 0}
+
+
+class Histogramme:
+    """
+    Histogramme de latences à classes fixes (BORNES_MS), avec nombre, total et maximum.
+    """
+
+    def __init__(self):
+        self.classes = [0] * (len(BORNES_MS) + 1)
+        self.nombre = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.erreurs = 0
+
+    def ajouter(self, duree_ms):
+        self.classes[bisect.bisect_left(BORNES_MS, duree_ms)] += 1
+        self.nombre += 1
+        self.total_ms += duree_ms
+        self.max_ms = max(self.max_ms, duree_ms)
+
+    def quantile(self, q):
+        """
+        Retourne la borne supérieure de la classe contenant le quantile q (le maximum pour la classe ouverte).
+        """
+        if not self.nombre:
+            return 0.0
+        rang = q * self.nombre
+        cumul = 0
+        for i, effectif in enumerate(self.classes):
+            cumul += effectif
+            if cumul >= rang:
+                return BORNES_MS[i] if i < len(BORNES_MS) else self.max_ms
+        return self.max_ms
+
+    def resume(self):
+        return {
+            "nombre": self.nombre,
+            "erreurs": self.erreurs,
+            "total_ms": round(self.total_ms, 3),
+            "moyenne_ms": round(self.total_ms / self.nombre, 3) if self.nombre else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "classes": dict(zip([f"<={borne}" for borne in BORNES_MS] + [f">{BORNES_MS[-1]}"], self.classes)),
+        }
+
+
+def normaliser_requete(sql):
+    """
+    Réduit une requête à une forme canonique (espaces compactés) servant de clé aux statistiques.
+    """
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def _forme_valeur(valeur):
+    return "None" if valeur is None else type(valeur).__name__
+
+
+def forme_parametres(parametres, plusieurs=False):
+    """
+    Décrit les types des paramètres liés, sans leurs valeurs, ex. "(int, str, None)".
+    :param plusieurs: Vrai pour les paramètres d'un executemany (décrit le nombre de jeux et le premier).
+    """
+    if plusieurs:
+        if not isinstance(parametres, (list, tuple)):
+            return "itérable"
+        if not parametres:
+            return "0 × ()"
+        return f"{len(parametres)} × {forme_parametres(parametres[0])}"
+    if isinstance(parametres, dict):
+        return "{" + ", ".join(f"{nom}: {_forme_valeur(valeur)}" for nom, valeur in parametres.items()) + "}"
+    return "(" + ", ".join(_forme_valeur(valeur) for valeur in parametres) + ")"
+
+
+def _enregistrer_requete(sql, duree_ms, parametres, plusieurs, erreur):
+    cle = normaliser_requete(sql)
+    with _verrou:
+        histogramme = _requetes.get(cle)
+        if histogramme is None:
+            histogramme = _requetes[cle] = Histogramme()
+        histogramme.ajouter(duree_ms)
+
+        if erreur is not None:
+            histogramme.erreurs += 1
+            _compteurs["erreurs"] += 1
+            if isinstance(erreur, sqlite3.OperationalError) and ("locked" in str(erreur) or "busy" in str(erreur)):
+                _compteurs["base_occupee"] += 1
+        if cle.upper().startswith(("BEGIN IMMEDIATE", "BEGIN EXCLUSIVE")) and duree_ms > SEUIL_ATTENTE_VERROU_MS:
+            _compteurs["attentes_verrou"] += 1
+            _compteurs["duree_attentes_verrou_ms"] += duree_ms
+        if duree_ms >= _seuil_lent_ms:
+            _lentes.append({
+                "horodatage": datetime.now().isoformat(timespec="milliseconds"),
+                "duree_ms": round(duree_ms, 3),
+                "requete": cle,
+                "parametres": forme_parametres(parametres, plusieurs),
+                "thread": threading.current_thread().name,
+                "erreur": str(erreur) if erreur is not None else None,
+            })
+
+
+def _mesurer_requete(executer, sql, parametres, plusieurs=False):
+    """
+    Exécute une requête en mesurant sa durée (jusqu'à la première ligne pour un SELECT).
+    """
+    if not _actif:
+        return executer()
+    erreur = None
+    debut = time.perf_counter()
+    try:
+        return executer()
+    except sqlite3.Error as e:
+        erreur = e
+        raise
+    finally:
+        _enregistrer_requete(sql, (time.perf_counter() - debut) * 1000, parametres, plusieurs, erreur)
+
+
+class CurseurInstrumente(sqlite3.Cursor):
+    """
+    Curseur dont chaque requête est chronométrée.
+    """
+
+    def execute(self, sql, parametres=()):
+        return _mesurer_requete(lambda: super(CurseurInstrumente, self).execute(sql, parametres), sql, parametres)
+
+    def executemany(self, sql, parametres):
+        if not isinstance(parametres, (list, tuple)) and _actif:
+            parametres = list(parametres)  # Pour décrire la forme sans consommer l'itérable
+        return _mesurer_requete(lambda: super(CurseurInstrumente, self).executemany(sql, parametres),
+                                sql, parametres, plusieurs=True)
+
+    def executescript(self, script):
+        return _mesurer_requete(lambda: super(CurseurInstrumente, self).executescript(script), script, ())
+
+
+class ConnexionInstrumentee(Connexion):
+    """
+    Connexion dont les requêtes, les validations et les annulations sont chronométrées.
+    """
+
+    def cursor(self, factory=CurseurInstrumente):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametres=()):
+        return self.cursor().execute(sql, parametres)
+
+    def executemany(self, sql, parametres):
+        return self.cursor().executemany(sql, parametres)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        return _mesurer_requete(super().commit, "COMMIT", ())
+
+    def rollback(self):
+        return _mesurer_requete(super().rollback, "ROLLBACK", ())
+
+
+def instrumenter(fonction):
+    """
+    Décorateur : mesure la durée d'une fonction métier (creer_vente, ajouter_article...)
+    quand l'instrumentation est active. Sans effet mesurable sinon.
+    """
+    nom = f"{fonction.__module__}.{fonction.__name__}"
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        if not _actif:
+            return fonction(*args, **kwargs)
+        erreur = False
+        debut = time.perf_counter()
+        try:
+            return fonction(*args, **kwargs)
+        except Exception:
+            erreur = True
+            raise
+        finally:
+            duree_ms = (time.perf_counter() - debut) * 1000
+            with _verrou:
+                histogramme = _fonctions.get(nom)
+                if histogramme is None:
+                    histogramme = _fonctions[nom] = Histogramme()
+                histogramme.ajouter(duree_ms)
+                histogramme.erreurs += erreur
+
+    return enveloppe
+
+
+def activer_instrumentation(seuil_lent_ms=50.0):
+    """
+    Active les mesures. Les connexions ouvertes ensuite par base_donnees sont instrumentées ;
+    celles déjà ouvertes ne le sont pas, d'où un appel au démarrage de l'application.
+    :param seuil_lent_ms: Durée à partir de laquelle une requête entre dans le journal des requêtes lentes.
+    """
+    global _actif, _seuil_lent_ms
+    _seuil_lent_ms = seuil_lent_ms
+    definir_fabrique_connexion(ConnexionInstrumentee)
+    _actif = True
+
+
+def desactiver_instrumentation():
+    """
+    Arrête les mesures (les statistiques déjà collectées sont conservées).
+    """
+    global _actif
+    _actif = False
+    definir_fabrique_connexion(Connexion)
+
+
+def instrumentation_active():
+    return _actif
+
+
+def reinitialiser_mesures():
+    """
+    Efface les statistiques, le journal des requêtes lentes et les compteurs.
+    """
+    with _verrou:
+        _requetes.clear()
+        _fonctions.clear()
+        _lentes.clear()
+        for cle in _compteurs:
+            _compteurs[cle] = 0
+
+
+def obtenir_mesures():
+    """
+    Retourne une copie des mesures : requetes et fonctions {nom: résumé d'histogramme},
+    lentes (journal des requêtes lentes, de la plus ancienne à la plus récente) et compteurs.
+    """
+    with _verrou:
+        return {
+            "actif": _actif,
+            "seuil_lent_ms": _seuil_lent_ms,
+            "requetes": {cle: histogramme.resume() for cle, histogramme in _requetes.items()},
+            "fonctions": {nom: histogramme.resume() for nom, histogramme in _fonctions.items()},
+            "lentes": list(_lentes),
+            "compteurs": dict(_compteurs, duree_attentes_verrou_ms=round(_compteurs["duree_attentes_verrou_ms"], 3)),
+        }
+
+
+def exporter_mesures(chemin):
+    """
+    Écrit les mesures dans un fichier JSON.
+    :return: Mesures exportées.
+    """
+    mesures = dict(obtenir_mesures(), horodatage=datetime.now().isoformat(timespec="seconds"),
+                   sqlite=sqlite3.sqlite_version)
+    with open(chemin, "w", encoding="utf-8") as fichier:
+        json.dump(mesures, fichier, indent=2, ensure_ascii=False)
+    return mesures
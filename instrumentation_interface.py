@@ -0,0 +1,100 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from instrumentation import (
+    instrumentation_active,
+    obtenir_mesures,
+    reinitialiser_mesures,
+    exporter_mesures,
+)
+
+
+class VueInstrumentation:
+    """
+    Fenêtre de consultation des mesures : latences par requête et par fonction métier,
+    journal des requêtes lentes et compteurs de verrous.
+    """
+
+    COLONNES_STATS = ("nom", "nombre", "erreurs", "total_ms", "moyenne_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    COLONNES_LENTES = ("horodatage", "duree_ms", "thread", "parametres", "requete")
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Mesures SQL")
+        self.root.geometry("1200x600")
+
+        self.etiquette_etat = tk.Label(self.root, anchor=tk.W, padx=10, pady=5)
+        self.etiquette_etat.pack(side=tk.TOP, fill=tk.X)
+
+        onglets = ttk.Notebook(self.root)
+        onglets.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.table_requetes = self.creer_table(onglets, "Requêtes", self.COLONNES_STATS)
+        self.table_fonctions = self.creer_table(onglets, "Fonctions", self.COLONNES_STATS)
+        self.table_lentes = self.creer_table(onglets, "Requêtes lentes", self.COLONNES_LENTES)
+        for table in (self.table_requetes, self.table_fonctions):
+            table.column("nom", width=500)
+        self.table_lentes.column("requete", width=600)
+
+        boutons = tk.Frame(self.root, pady=5)
+        boutons.pack(side=tk.BOTTOM, fill=tk.X)
+        tk.Button(boutons, text="Actualiser", command=self.actualiser).pack(side=tk.LEFT, padx=5)
+        tk.Button(boutons, text="Réinitialiser", command=self.reinitialiser).pack(side=tk.LEFT, padx=5)
+        tk.Button(boutons, text="Exporter...", command=self.exporter).pack(side=tk.LEFT, padx=5)
+
+        self.actualiser()
+
+    def creer_table(self, onglets, titre, colonnes):
+        cadre = tk.Frame(onglets)
+        onglets.add(cadre, text=titre)
+        table = ttk.Treeview(cadre, columns=colonnes, show="headings")
+        barre = ttk.Scrollbar(cadre, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=barre.set)
+        barre.pack(side=tk.RIGHT, fill=tk.Y)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        for col in colonnes:
+            table.heading(col, text=col.replace("_", " ").capitalize())
+            table.column(col, width=90)
+        return table
+
+    def actualiser(self):
+        """
+        Recharge les mesures, triées par temps total décroissant (requêtes lentes : plus récentes d'abord).
+        """
+        mesures = obtenir_mesures()
+        compteurs = mesures["compteurs"]
+        if instrumentation_active():
+            etat = f"Instrumentation active (requêtes lentes : >= {mesures['seuil_lent_ms']} ms)"
+        else:
+            etat = "Instrumentation inactive : lancer l'application avec CAISSE_INSTRUMENTATION=1"
+        self.etiquette_etat.config(text=(
+            f"{etat}   |   Attentes de verrou : {compteurs['attentes_verrou']} "
+            f"({compteurs['duree_attentes_verrou_ms']} ms)   |   Base occupée : {compteurs['base_occupee']}   |   "
+            f"Erreurs SQL : {compteurs['erreurs']}"
+        ))
+
+        for table, statistiques in ((self.table_requetes, mesures["requetes"]),
+                                    (self.table_fonctions, mesures["fonctions"])):
+            table.delete(*table.get_children())
+            for nom, resume in sorted(statistiques.items(), key=lambda element: -element[1]["total_ms"]):
+                table.insert("", tk.END, values=(nom,) + tuple(resume[col] for col in self.COLONNES_STATS[1:]))
+
+        self.table_lentes.delete(*self.table_lentes.get_children())
+        for entree in reversed(mesures["lentes"]):
+            self.table_lentes.insert("", tk.END, values=tuple(entree[col] for col in self.COLONNES_LENTES))
+
+    def reinitialiser(self):
+        if messagebox.askyesno("Réinitialiser", "Effacer toutes les mesures collectées ?"):
+            reinitialiser_mesures()
+            self.actualiser()
+
+    def exporter(self):
+        chemin = filedialog.asksaveasfilename(
+            parent=self.root, defaultextension=".json", filetypes=[("Fichiers JSON", "*.json")],
+            initialfile="mesures_sql.json",
+        )
+        if not chemin:
+            return
+        try:
+            exporter_mesures(chemin)
+            messagebox.showinfo("Exporter", f"Mesures exportées dans {chemin}.")
+        except OSError as e:
+            messagebox.showerror("Erreur", f"Impossible d'exporter les mesures : {e}")
@@ -1,6 +1,13 @@
+import os
 import tkinter as tk
 from tkinter import ttk
 from gestion_articles_interface import GestionArticles
+from base_donnees import obtenir_connexion, fermer_connexions
+from cache_articles import charger_index_codes_barres
+from migrations import appliquer_migrations
+from gestion_stock import creer_snapshots_stock
+from instrumentation import activer_instrumentation
+from instrumentation_interface import VueInstrumentation
 
 
 class MenuInterface:
@@ -9,6 +16,12 @@ class MenuInterface:
         self.root.title("Gestion de la Caisse")
         self.root.geometry("800x600")
 
+        # Mise à niveau du schéma, puis index des codes-barres chargé en bloc pour des scans sans accès disque
+        appliquer_migrations(obtenir_connexion())
+        charger_index_codes_barres(obtenir_connexion())
+        # Photo du stock de la veille, à partir de la précédente et des mouvements qui la suivent
+        creer_snapshots_stock(obtenir_connexion())
+
         # Barre de statut en bas
         self.status_bar = tk.Label(self.root, text="Prêt", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
@@ -23,6 +36,7 @@ class MenuInterface:
         self.add_button(main_frame, "Créer une vente", self.creer_vente)
         self.add_button(main_frame, "Rapport journalier", self.rapport_journalier)
         self.add_button(main_frame, "Paramètres", self.parametres)
+        self.add_button(main_frame, "Mesures SQL", self.mesures_sql)
 
     def add_button(self, parent, text, command):
         """
@@ -52,6 +66,13 @@ class MenuInterface:
     def parametres(self):
         self.update_status("Paramètres ouverts.")
 
+    def mesures_sql(self):
+        """
+        Ouvre la fenêtre des mesures de l'instrumentation.
+        """
+        VueInstrumentation(tk.Toplevel(self.root))
+        self.update_status("Mesures SQL ouvertes.")
+
     def update_status(self, message):
         """
         Met à jour le texte de la barre de statut.
@@ -60,6 +81,10 @@ class MenuInterface:
 
 
 if __name__ == "__main__":
+    # Mesures SQL à la demande, avant l'ouverture de toute connexion
+    if os.environ.get("CAISSE_INSTRUMENTATION"):
+        activer_instrumentation(float(os.environ.get("CAISSE_SEUIL_LENT_MS", 50)))
     root = tk.Tk()
     app = MenuInterface(root)
     root.mainloop()
+    fermer_connexions()
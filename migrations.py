@@ -0,0 +1,149 @@
+import functools
+import sqlite3
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients
+from gestion_articles import initialiser_articles, initialiser_codes_barres
+from gestion_caisse import (DEFINITION_DAT, initialiser_vente, initialiser_detail_vente, initialiser_stats_clients,
+                            initialiser_journal_etats_ventes)
+from recherche_articles import initialiser_recherche_articles
+from gestion_achats import initialiser_receptions
+from gestion_stock import initialiser_mouvements_stock
+from archivage import initialiser_archives_ventes
+from recherche_clients import initialiser_cles_clients
+
+
+CLE_VERSION_SCHEMA = "schema_version"
+
+
+def _mettre_a_niveau_dat(conn):
+    """
+    Reconstruit une table DAT créée avec un ancien schéma (doc_type TEXT, doc_num INTEGER,
+    colonne etat absente) selon DEFINITION_DAT, en conservant les colonnes supplémentaires.
+    Les clés étrangères sont désactivées le temps de la reconstruction, comme le préconise SQLite.
+    """
+    colonnes = {nom: (type_, notnull, defaut) for _, nom, type_, notnull, defaut, _ in
+                conn.execute("PRAGMA table_info(DAT)")}
+    if not colonnes or (colonnes["doc_type"][0] == "INTEGER" and colonnes["doc_num"][0] == "TEXT"
+                        and "etat" in colonnes):
+        return
+
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"CREATE TABLE DAT_nouveau ({DEFINITION_DAT})")
+        colonnes_nouvelles = [ligne[1] for ligne in conn.execute("PRAGMA table_info(DAT_nouveau)")]
+        supplementaires = [nom for nom in colonnes if nom not in colonnes_nouvelles]
+        for nom in supplementaires:
+            type_, notnull, defaut = colonnes[nom]
+            definition = f"{nom} {type_}"
+            if defaut is not None:
+                definition += f" {'NOT NULL ' if notnull else ''}DEFAULT {defaut}"
+            conn.execute(f"ALTER TABLE DAT_nouveau ADD COLUMN {definition}")
+
+        # Les anciens types de documents étaient parfois enregistrés en toutes lettres
+        conversions = {
+            "doc_type": """CASE lower(doc_type) WHEN 'facture' THEN 1 WHEN 'bl' THEN 2 WHEN 'devis' THEN 3
+                           ELSE CAST(doc_type AS INTEGER) END""",
+            "doc_num": "CAST(doc_num AS TEXT)",
+        }
+        cibles = [nom for nom in colonnes_nouvelles if nom in colonnes] + supplementaires
+        conn.execute(f"""
+            INSERT INTO DAT_nouveau ({", ".join(cibles)})
+            SELECT {", ".join(conversions.get(nom, nom) for nom in cibles)} FROM DAT
+        """)
+        conn.execute("DROP TABLE DAT")
+        conn.execute("ALTER TABLE DAT_nouveau RENAME TO DAT")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+
+def _levant(initialiser):
+    """
+    Étape de migration appelant un initialiser_* qui lève ses erreurs au lieu de les afficher :
+    une étape en échec n'est pas enregistrée comme appliquée et sera rejouée.
+    """
+    return functools.partial(initialiser, lever=True)
+
+
+def _creer_schema(conn):
+    initialiser_parametres(conn, lever=True)
+    initialiser_clients(conn, lever=True)
+    initialiser_articles(conn, lever=True)
+    initialiser_codes_barres(conn, lever=True)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    initialiser_recherche_articles(conn, lever=True)
+
+
+def _creer_index_chemins_critiques(conn):
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_dat_date_etat ON DAT (doc_date, etat);
+        CREATE INDEX IF NOT EXISTS idx_dat_client ON DAT (client_id);
+        CREATE INDEX IF NOT EXISTS idx_des_doc ON DES (doc_id);
+        CREATE INDEX IF NOT EXISTS idx_des_article ON DES (article_id);
+        CREATE INDEX IF NOT EXISTS idx_code_barres_article ON code_barres (article_id);
+    """)
+
+
+# Migrations ordonnées (version, description, fonction). Chaque fonction est idempotente :
+# une migration interrompue peut être rejouée sans risque.
+MIGRATIONS = [
+    (1, "Mise à niveau de l'ancien schéma de DAT", _mettre_a_niveau_dat),
+    (2, "Création des tables, du résumé des ventes et de l'index de recherche", _creer_schema),
+    (3, "Index des entêtes, détails de ventes et codes-barres", _creer_index_chemins_critiques),
+    (4, "Tables des réceptions fournisseurs", _levant(initialiser_receptions)),
+    (5, "Registre des mouvements de stock et photos de stock", _levant(initialiser_mouvements_stock)),
+    (6, "Registre des bases d'archive des ventes", _levant(initialiser_archives_ventes)),
+    (7, "Clés de recherche normalisées des clients", _levant(initialiser_cles_clients)),
+    (8, "Statistiques d'achat des clients", initialiser_stats_clients),
+    (9, "Index trigramme des clients pour la recherche par sous-chaîne", _levant(initialiser_cles_clients)),
+    (10, "Journal des changements d'état des documents", initialiser_journal_etats_ventes),
+]
+
+
+def version_schema(conn):
+    """
+    Retourne la version du schéma enregistrée dans parametres (0 pour une base non migrée).
+    """
+    try:
+        cursor = conn.execute("SELECT valeur FROM parametres WHERE cle = ?", (CLE_VERSION_SCHEMA,))
+    except sqlite3.OperationalError:
+        return 0
+    result = cursor.fetchone()
+    return int(result[0]) if result else 0
+
+
+def appliquer_migrations(conn):
+    """
+    Applique dans l'ordre les migrations plus récentes que la version du schéma,
+    puis met à jour les statistiques de l'optimiseur. À appeler une fois au démarrage.
+    :return: Liste des versions appliquées.
+    """
+    version = version_schema(conn)
+    if version == 0:
+        initialiser_parametres(conn, lever=True)  # Table où est enregistrée la version
+    appliquees = []
+    for numero, description, migration in MIGRATIONS:
+        if numero <= version:
+            continue
+        try:
+            migration(conn)
+            conn.execute("""
+                INSERT INTO parametres (cle, valeur) VALUES (?, ?)
+                ON CONFLICT (cle) DO UPDATE SET valeur = excluded.valeur
+            """, (CLE_VERSION_SCHEMA, str(numero)))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise sqlite3.Error(f"Échec de la migration {numero} ({description}) : {e}")
+        appliquees.append(numero)
+
+    if appliquees:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return appliquees
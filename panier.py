@@ -0,0 +1,205 @@
+from decimal import Decimal, ROUND_HALF_UP
+from cache_articles import prix_articles
+from gestion_caisse import creer_ventes_batch, TIMBRE_FISCAL_DEFAUT
+from gestion_parametres import obtenir_parametre
+
+
+# Les montants sont tenus en millimes (1 dinar = 1000 millimes), les taux (remise, TVA) en centièmes de %
+MILLIMES_PAR_DINAR = 1000
+CENTIEMES_PAR_CENT = 10000
+
+
+def en_millimes(montant):
+    """
+    Convertit un montant en dinars (float, str ou Decimal) en millimes, arrondi au plus proche.
+    """
+    return int((Decimal(str(montant or 0)) * MILLIMES_PAR_DINAR).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def en_dinars(millimes):
+    return millimes / MILLIMES_PAR_DINAR
+
+
+def en_centiemes(taux):
+    """
+    Convertit un taux en % (ex. 7.5) en centièmes de % (750).
+    """
+    return int((Decimal(str(taux or 0)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def appliquer_taux(montant, taux):
+    """
+    Applique un taux en centièmes de % à un montant en millimes, arrondi au plus proche (moitié vers le haut).
+    """
+    produit = montant * taux
+    return (produit + CENTIEMES_PAR_CENT // 2) // CENTIEMES_PAR_CENT if produit >= 0 else \
+        -((-produit + CENTIEMES_PAR_CENT // 2) // CENTIEMES_PAR_CENT)
+
+
+class LignePanier:
+    """
+    Ligne du panier : un article, sa quantité et sa remise, avec ses montants en millimes.
+    """
+
+    __slots__ = ("article_id", "quantite", "remise", "prix_unitaire", "prix_minimum", "tva", "total_ht", "total_tva")
+
+    def __init__(self, article_id, prix_unitaire, prix_minimum, tva):
+        self.article_id = article_id
+        self.quantite = 0
+        self.remise = 0
+        self.prix_unitaire = prix_unitaire
+        self.prix_minimum = prix_minimum
+        self.tva = tva
+        self.total_ht = 0
+        self.total_tva = 0
+
+    @property
+    def total_ttc(self):
+        return self.total_ht + self.total_tva
+
+    def calculer(self):
+        self.total_ht = appliquer_taux(self.quantite * self.prix_unitaire, CENTIEMES_PAR_CENT - self.remise)
+        self.total_tva = appliquer_taux(self.total_ht, self.tva)
+
+
+class Panier:
+    """
+    Ticket en cours de la caisse. Chaque ajout, retrait ou changement de quantité ou de remise
+    met à jour les totaux (HT, TVA par taux, TTC) en temps constant, quelle que soit la taille
+    du panier ; les prix viennent du cache des prix d'articles, sans requête une fois chargés.
+    Le panier terminé est enregistré tel quel (voir vers_vente), sans nouveau calcul des prix.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lignes = {}  # article_id -> LignePanier, dans l'ordre de saisie
+        self.total_ht = 0
+        self.total_tva = 0
+        self.par_taux = {}  # taux de TVA (centièmes de %) -> [total_ht, total_tva]
+        self.tva_defaut = en_centiemes(obtenir_parametre(conn, "tva_default", 0))
+        self.timbre_fiscal = en_millimes(obtenir_parametre(conn, "timbre_fiscal", TIMBRE_FISCAL_DEFAUT))
+
+    @property
+    def total_ttc(self):
+        return self.total_ht + self.total_tva
+
+    @property
+    def net_a_payer(self):
+        """
+        Total TTC augmenté du timbre fiscal, en millimes.
+        """
+        return self.total_ttc + self.timbre_fiscal if self.lignes else 0
+
+    def _nouvelle_ligne(self, article_id):
+        prix = prix_articles(self.conn, [article_id]).get(article_id)
+        if prix is None:
+            raise ValueError(f"L'article ID {article_id} est introuvable.")
+        prix_vente_ht, tva, prix_vente_min, _ = prix
+        return LignePanier(article_id, en_millimes(prix_vente_ht), en_millimes(prix_vente_min),
+                           self.tva_defaut if tva is None else en_centiemes(tva))
+
+    def _verifier_prix_minimum(self, ligne, remise):
+        """
+        Refuse une remise qui ferait passer le prix unitaire net sous le prix de vente minimum de l'article.
+        """
+        if remise and ligne.prix_unitaire * (CENTIEMES_PAR_CENT - remise) < ligne.prix_minimum * CENTIEMES_PAR_CENT:
+            raise ValueError(f"La remise de {remise / 100} % fait passer l'article ID {ligne.article_id} "
+                             f"sous son prix de vente minimum ({en_dinars(ligne.prix_minimum):.3f}).")
+
+    def _mettre_a_jour(self, ligne, quantite, remise):
+        """
+        Remplace la contribution d'une ligne aux totaux par celle de sa nouvelle quantité et remise.
+        """
+        totaux_taux = self.par_taux.setdefault(ligne.tva, [0, 0])
+        self.total_ht -= ligne.total_ht
+        self.total_tva -= ligne.total_tva
+        totaux_taux[0] -= ligne.total_ht
+        totaux_taux[1] -= ligne.total_tva
+
+        ligne.quantite, ligne.remise = quantite, remise
+        ligne.calculer()
+
+        self.total_ht += ligne.total_ht
+        self.total_tva += ligne.total_tva
+        totaux_taux[0] += ligne.total_ht
+        totaux_taux[1] += ligne.total_tva
+        if quantite == 0:
+            del self.lignes[ligne.article_id]
+
+    def ajouter(self, article_id, quantite=1):
+        """
+        Ajoute un article (un passage au scanner), ou augmente la quantité s'il est déjà dans le panier.
+        """
+        if quantite <= 0:
+            raise ValueError("La quantité doit être positive.")
+        ligne = self.lignes.get(article_id)
+        if ligne is None:
+            ligne = self.lignes[article_id] = self._nouvelle_ligne(article_id)
+        self._mettre_a_jour(ligne, ligne.quantite + quantite, ligne.remise)
+        return ligne
+
+    def modifier_quantite(self, article_id, quantite):
+        """
+        Fixe la quantité d'un article du panier ; 0 le retire.
+        """
+        if quantite < 0:
+            raise ValueError("La quantité ne peut pas être négative.")
+        ligne = self._ligne(article_id)
+        self._mettre_a_jour(ligne, quantite, ligne.remise)
+
+    def retirer(self, article_id):
+        self.modifier_quantite(article_id, 0)
+
+    def appliquer_remise(self, article_id, remise):
+        """
+        Applique une remise (en %) à un article du panier, dans la limite de son prix de vente minimum.
+        """
+        remise = en_centiemes(remise)
+        if not 0 <= remise <= CENTIEMES_PAR_CENT:
+            raise ValueError("La remise doit être comprise entre 0 et 100 %.")
+        ligne = self._ligne(article_id)
+        self._verifier_prix_minimum(ligne, remise)
+        self._mettre_a_jour(ligne, ligne.quantite, remise)
+
+    def _ligne(self, article_id):
+        ligne = self.lignes.get(article_id)
+        if ligne is None:
+            raise KeyError(f"L'article ID {article_id} n'est pas dans le panier.")
+        return ligne
+
+    def totaux_par_taux(self):
+        """
+        :return: Dictionnaire {taux de TVA en %: (total HT, total TVA)} en millimes, sans les taux vides.
+        """
+        return {taux / 100: tuple(totaux) for taux, totaux in sorted(self.par_taux.items()) if totaux != [0, 0]}
+
+    def vider(self):
+        self.lignes.clear()
+        self.par_taux.clear()
+        self.total_ht = self.total_tva = 0
+
+    def vers_vente(self, doc_type, mode_paiement, client_id=None):
+        """
+        Retourne la vente du panier au format de creer_ventes_batch, lignes et totaux compris,
+        convertis en dinars exacts au millime.
+        """
+        if not self.lignes:
+            raise ValueError("Le panier est vide.")
+        lignes = self.lignes.values()
+        return {
+            "doc_type": doc_type, "mode_paiement": mode_paiement, "client_id": client_id,
+            "articles": [{"article_id": ligne.article_id, "quantite": ligne.quantite, "remise": ligne.remise / 100}
+                         for ligne in lignes],
+            "lignes": [(ligne.article_id, ligne.quantite, en_dinars(ligne.prix_unitaire), ligne.remise / 100,
+                        en_dinars(ligne.total_ht), en_dinars(ligne.total_ttc)) for ligne in lignes],
+            "totaux": (en_dinars(self.total_ht), en_dinars(self.total_tva), en_dinars(self.total_ttc)),
+        }
+
+    def enregistrer(self, doc_type, mode_paiement, client_id=None, allocateurs=None):
+        """
+        Enregistre le panier comme une vente puis le vide.
+        :return: Numéro du document créé.
+        """
+        doc_num = creer_ventes_batch(self.conn, [self.vers_vente(doc_type, mode_paiement, client_id)], allocateurs)[0]
+        self.vider()
+        return doc_num
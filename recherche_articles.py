@@ -0,0 +1,110 @@
+import re
+import sqlite3
+from gestion_articles import COLONNES_ARTICLES, Article, initialiser_codes_barres
+from instrumentation import instrumenter
+from depots import fabrique_lignes
+
+
+# Poids bm25 des colonnes de l'index, dans l'ordre de déclaration
+POIDS_COLONNES = (10.0, 2.0, 5.0, 1.0, 10.0)
+
+_CODES_BARRES_ARTICLE = "(SELECT group_concat(code_barre, ' ') FROM code_barres WHERE article_id = {})"
+
+
+def initialiser_recherche_articles(conn, lever=False):
+    """
+    Initialise l'index plein texte FTS5 des articles et les déclencheurs qui le tiennent à jour.
+    L'index couvre nom, categorie, ref_fournisseur, description et les codes-barres ;
+    il est rempli depuis les articles existants lors de sa création.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        initialiser_codes_barres(conn, lever=lever)
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'")
+        existe = cursor.fetchone() is not None
+
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                nom, categorie, ref_fournisseur, description, codes_barres,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3 4'
+            )
+        """)
+        cursor.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS articles_fts_ai AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, nom, categorie, ref_fournisseur, description, codes_barres)
+                VALUES (new.id, new.nom, new.categorie, new.ref_fournisseur, new.description,
+                        {_CODES_BARRES_ARTICLE.format("new.id")});
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_fts_au
+            AFTER UPDATE OF nom, categorie, ref_fournisseur, description ON articles BEGIN
+                UPDATE articles_fts SET nom = new.nom, categorie = new.categorie,
+                    ref_fournisseur = new.ref_fournisseur, description = new.description
+                WHERE rowid = new.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_fts_ad AFTER DELETE ON articles BEGIN
+                DELETE FROM articles_fts WHERE rowid = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS code_barres_fts_ai AFTER INSERT ON code_barres BEGIN
+                UPDATE articles_fts SET codes_barres = {_CODES_BARRES_ARTICLE.format("new.article_id")}
+                WHERE rowid = new.article_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS code_barres_fts_ad AFTER DELETE ON code_barres BEGIN
+                UPDATE articles_fts SET codes_barres = {_CODES_BARRES_ARTICLE.format("old.article_id")}
+                WHERE rowid = old.article_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS code_barres_fts_au AFTER UPDATE ON code_barres BEGIN
+                UPDATE articles_fts SET codes_barres = {_CODES_BARRES_ARTICLE.format("old.article_id")}
+                WHERE rowid = old.article_id;
+                UPDATE articles_fts SET codes_barres = {_CODES_BARRES_ARTICLE.format("new.article_id")}
+                WHERE rowid = new.article_id;
+            END;
+        """)
+
+        if not existe:
+            cursor.execute(f"""
+                INSERT INTO articles_fts (rowid, nom, categorie, ref_fournisseur, description, codes_barres)
+                SELECT id, nom, categorie, ref_fournisseur, description, {_CODES_BARRES_ARTICLE.format("articles.id")}
+                FROM articles
+            """)
+        conn.commit()
+    except sqlite3.Error as e:
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation de la recherche des articles : {e}")
+
+
+def construire_requete_fts(terme):
+    """
+    Transforme une saisie libre en requête FTS5 : chaque mot devient un préfixe, tous requis.
+    :return: Requête FTS5, ou None si la saisie ne contient aucun mot.
+    """
+    mots = re.findall(r"\w+", terme)
+    if not mots:
+        return None
+    return " ".join(f'"{mot}"*' for mot in mots)
+
+
+@instrumenter
+def rechercher_articles(conn, terme, limite=50, inclure_supprimes=False):
+    """
+    Recherche des articles par préfixe de mots, sans tenir compte des accents ni de la casse.
+    :param terme: Saisie de l'utilisateur (nom, catégorie, référence, description ou code-barre).
+    :param limite: Nombre maximal de résultats.
+    :return: Itérateur sur des Article, les plus pertinents d'abord.
+    """
+    requete = construire_requete_fts(terme)
+    if requete is None:
+        return iter(())
+    filtre = "" if inclure_supprimes else "AND a.etat = 0"
+    cursor = conn.cursor()
+    cursor.row_factory = fabrique_lignes(Article)
+    cursor.execute(f"""
+        SELECT {", ".join("a." + colonne for colonne in COLONNES_ARTICLES)}
+        FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+        WHERE articles_fts MATCH ? {filtre}
+        ORDER BY bm25(articles_fts, {", ".join(map(str, POIDS_COLONNES))})
+        LIMIT ?
+    """, (requete, limite))
+    return cursor
@@ -0,0 +1,314 @@
+import collections
+import re
+import sqlite3
+import unicodedata
+from base_donnees import SuiviModifications, registre_caches
+from instrumentation import instrumenter
+
+
+# Types de clés de recherche : chiffres du téléphone, mêmes chiffres inversés (recherche par la fin),
+# email en minuscules, mots du nom sans accents, matricule fiscal sans séparateurs
+TYPES_CLES = ("tel", "tel_inv", "email", "nom", "mf")
+
+# Rang des correspondances : une clé égale à la saisie passe avant un début, puis une fin de numéro,
+# puis une saisie trouvée ailleurs dans la clé
+RANG_EXACT, RANG_PREFIXE, RANG_SUFFIXE, RANG_SOUS_CHAINE = 0, 1, 2, 3
+
+# Le tokenizer trigram de FTS5 ne trouve rien pour une sous-chaîne de moins de trois caractères
+LONGUEUR_MIN_SOUS_CHAINE = 3
+
+TAILLE_CACHE = 256
+
+# Borne haute d'une recherche par préfixe : cle >= prefixe AND cle < prefixe || FIN_PREFIXE
+FIN_PREFIXE = "\U0010ffff"
+
+
+def replier_texte(texte):
+    """
+    Met un texte en minuscules sans accents, ex. "Hélène" -> "helene".
+    """
+    decompose = unicodedata.normalize("NFKD", texte)
+    return "".join(caractere for caractere in decompose if not unicodedata.combining(caractere)).casefold()
+
+
+def normaliser_telephone(telephone):
+    return re.sub(r"\D", "", telephone or "")
+
+
+def normaliser_matricule(matricule_fiscale):
+    return re.sub(r"[\W_]", "", matricule_fiscale or "").upper()
+
+
+def mots_nom(nom):
+    """
+    Mots distincts du nom, repliés (voir replier_texte).
+    """
+    return set(re.findall(r"\w+", replier_texte(nom or "")))
+
+
+def cles_client(nom, email, telephone, matricule_fiscale):
+    """
+    Calcule les clés de recherche d'un client.
+    :return: Liste de (type_cle, cle).
+    """
+    cles = [("nom", mot) for mot in sorted(mots_nom(nom))]
+    chiffres = normaliser_telephone(telephone)
+    if chiffres:
+        cles += [("tel", chiffres), ("tel_inv", chiffres[::-1])]
+    if email:
+        cles.append(("email", email.strip().lower()))
+    matricule = normaliser_matricule(matricule_fiscale)
+    if matricule:
+        cles.append(("mf", matricule))
+    return cles
+
+
+def textes_client(nom, email, telephone, matricule_fiscale):
+    """
+    Textes du client indexés par trigrammes pour la recherche par sous-chaîne :
+    (nom replié, chiffres du téléphone, email en minuscules, matricule sans séparateurs).
+    """
+    return (replier_texte(nom or ""), normaliser_telephone(telephone), (email or "").strip().lower(),
+            normaliser_matricule(matricule_fiscale))
+
+
+def initialiser_cles_clients(conn, lever=False):
+    """
+    Initialise la table des clés de recherche des clients et leur index trigramme (FTS5),
+    remplis depuis les clients existants lors de leur création. Les clés sont tenues à jour
+    par ajouter_client, modifier_client et supprimer_client ; reconstruire_cles_clients
+    les recalcule après un chargement en masse.
+    :param lever: Si vrai, une erreur SQLite est levée au lieu d'être affichée (voir migrations).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('cles_clients', 'clients_trigrammes')
+        """)
+        existe = cursor.fetchone()[0] == 2
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cles_clients (
+                type_cle TEXT NOT NULL, -- voir TYPES_CLES
+                cle TEXT NOT NULL,
+                client_id INTEGER NOT NULL,
+                PRIMARY KEY (type_cle, cle, client_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cles_clients_client ON cles_clients (client_id, type_cle, cle)")
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS clients_trigrammes USING fts5(
+                nom, tel, email, mf, tokenize = 'trigram'
+            )
+        """)
+        conn.commit()
+        if not existe:
+            reconstruire_cles_clients(conn)
+    except sqlite3.Error as e:
+        if lever:
+            raise
+        print(f"Erreur lors de l'initialisation des clés de recherche des clients : {e}")
+
+
+def maj_cles_client(cursor, client_id, nom, email, telephone, matricule_fiscale):
+    """
+    Remplace les clés d'un client dans la transaction en cours (nom None : client supprimé).
+    """
+    cursor.execute("DELETE FROM cles_clients WHERE client_id = ?", (client_id,))
+    cursor.execute("DELETE FROM clients_trigrammes WHERE rowid = ?", (client_id,))
+    if nom is not None:
+        cursor.executemany("INSERT OR IGNORE INTO cles_clients (type_cle, cle, client_id) VALUES (?, ?, ?)",
+                           [(type_cle, cle, client_id)
+                            for type_cle, cle in cles_client(nom, email, telephone, matricule_fiscale)])
+        cursor.execute("INSERT INTO clients_trigrammes (rowid, nom, tel, email, mf) VALUES (?, ?, ?, ?, ?)",
+                       (client_id, *textes_client(nom, email, telephone, matricule_fiscale)))
+
+
+def reconstruire_cles_clients(conn):
+    """
+    Recalcule les clés de recherche de tous les clients.
+    """
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM cles_clients")
+        cursor.execute("DELETE FROM clients_trigrammes")
+        lecture = conn.cursor()
+        lecture.execute("SELECT id, nom, email, telephone, matricule_fiscale FROM clients")
+        while True:
+            clients = lecture.fetchmany(5000)
+            if not clients:
+                break
+            cursor.executemany("INSERT OR IGNORE INTO cles_clients (type_cle, cle, client_id) VALUES (?, ?, ?)",
+                               [(type_cle, cle, client_id) for client_id, *champs in clients
+                                for type_cle, cle in cles_client(*champs)])
+            cursor.executemany("INSERT INTO clients_trigrammes (rowid, nom, tel, email, mf) VALUES (?, ?, ?, ?, ?)",
+                               [(client_id, *textes_client(*champs)) for client_id, *champs in clients])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalider_recherche_clients(conn)
+
+
+class CacheRechercheClients:
+    """
+    Résultats des dernières recherches de clients (LRU), vidés à chaque modification d'un client,
+    et au plus DELAI_VERIFICATION secondes après celles des autres connexions (voir SuiviModifications).
+    """
+
+    def __init__(self, taille=TAILLE_CACHE):
+        self.taille = taille
+        self.version = 0
+        self.resultats = collections.OrderedDict()
+        self.modifications = SuiviModifications()
+
+    def obtenir(self, conn, cle):
+        if self.modifications.modifiee(conn):
+            self.invalider()
+        resultat = self.resultats.get(cle)
+        if resultat is not None:
+            self.resultats.move_to_end(cle)
+        return resultat
+
+    def ajouter(self, cle, resultat, version):
+        if version != self.version:
+            return  # Un client a été modifié pendant la recherche
+        self.resultats[cle] = resultat
+        self.resultats.move_to_end(cle)
+        if len(self.resultats) > self.taille:
+            self.resultats.popitem(last=False)
+
+    def invalider(self):
+        self.version += 1
+        self.resultats.clear()
+
+
+def cache_recherche_clients(conn):
+    registre = registre_caches(conn)
+    cache = registre.get("recherche_clients")
+    if cache is None:
+        cache = registre["recherche_clients"] = CacheRechercheClients()
+    return cache
+
+
+def invalider_recherche_clients(conn):
+    cache_recherche_clients(conn).invalider()
+
+
+def _candidats(type_cle, saisie, limite, rang_prefixe=RANG_PREFIXE, filtre="", valeurs_filtre=()):
+    """
+    Sous-requêtes des clients dont une clé du type donné est égale à la saisie, puis commence par elle.
+    Chacune parcourt l'index dans l'ordre des clés et s'arrête à `limite` clients.
+    :param filtre: Condition supplémentaire sur la ligne de cles_clients (alias k).
+    :return: Liste de (requête donnant client_id, rang, cle ; valeurs).
+    """
+    requete = f"""
+        SELECT * FROM (
+            SELECT k.client_id, ? AS rang, k.cle FROM cles_clients k
+            WHERE k.type_cle = ? AND {{}} {filtre}
+            ORDER BY k.cle, k.client_id LIMIT ?
+        )
+    """
+    return [
+        (requete.format("k.cle = ?"), [RANG_EXACT, type_cle, saisie, *valeurs_filtre, limite]),
+        (requete.format("k.cle > ? AND k.cle < ?"),
+         [rang_prefixe, type_cle, saisie, saisie + FIN_PREFIXE, *valeurs_filtre, limite]),
+    ]
+
+
+def _candidats_sous_chaine(colonnes, termes, limite):
+    """
+    Sous-requête des clients dont les colonnes données de l'index trigramme contiennent
+    chacun des termes, n'importe où. Aucune si un terme est trop court pour l'index.
+    :return: Liste de (requête donnant client_id, rang, cle ; valeurs).
+    """
+    if not termes or any(len(terme) < LONGUEUR_MIN_SOUS_CHAINE for terme in termes):
+        return []
+    filtre = "{" + " ".join(colonnes) + "}"
+    expression = " AND ".join(f'{filtre} : "{terme.replace(chr(34), chr(34) * 2)}"' for terme in termes)
+    # La clé, sans objet ici, est la plus grande possible pour ne pas devancer celle d'un autre rang
+    return [("""
+        SELECT * FROM (
+            SELECT rowid AS client_id, ? AS rang, ? AS cle FROM clients_trigrammes
+            WHERE clients_trigrammes MATCH ? LIMIT ?
+        )
+    """, [RANG_SOUS_CHAINE, FIN_PREFIXE, expression, limite])]
+
+
+def _candidats_nom(mots, limite):
+    """
+    Sous-requêtes des clients dont le nom contient un mot commençant par chacun des mots saisis.
+    Le mot le plus long, le plus sélectif, sert de point d'entrée dans l'index.
+    """
+    mots = sorted(mots, key=len, reverse=True)
+    filtre, valeurs = "", []
+    for mot in mots[1:]:
+        filtre += """
+            AND EXISTS (SELECT 1 FROM cles_clients autre WHERE autre.client_id = k.client_id
+                        AND autre.type_cle = 'nom' AND autre.cle >= ? AND autre.cle < ?)
+        """
+        valeurs += [mot, mot + FIN_PREFIXE]
+    return _candidats("nom", mots[0], limite, filtre=filtre, valeurs_filtre=valeurs)
+
+
+@instrumenter
+def chercher_clients(conn, saisie, limite=20):
+    """
+    Recherche des clients à partir d'une saisie partielle :
+    - chiffres : début ou fin du numéro de téléphone, ou début du matricule fiscal ;
+    - avec un @ : début de l'email, sans tenir compte de la casse ;
+    - sinon : début de chaque mot du nom (tous requis), sans tenir compte des accents ni de la casse,
+      ou début du matricule fiscal.
+    Une saisie d'au moins LONGUEUR_MIN_SOUS_CHAINE caractères (par mot pour le nom) est aussi
+    cherchée n'importe où dans ces mêmes champs, par l'index trigramme.
+    Les correspondances exactes viennent en premier, puis les débuts, puis les fins de numéro,
+    puis les sous-chaînes ; à rang égal, dans l'ordre des clés puis des noms. Chaque recherche
+    ne lit que `limite` entrées d'index par type de clé, quel que soit le nombre de clients.
+
+    :return: Liste de lignes de clients (comme SELECT * FROM clients), au plus `limite`.
+    """
+    saisie = saisie.strip()
+    if not saisie:
+        return []
+    cache = cache_recherche_clients(conn)
+    cle_cache = (replier_texte(saisie), limite)
+    resultat = cache.obtenir(conn, cle_cache)
+    if resultat is not None:
+        return list(resultat)
+    version = cache.version
+
+    sous_requetes = []
+    chiffres = normaliser_telephone(saisie)
+    if "@" in saisie:
+        sous_requetes += _candidats("email", saisie.lower(), limite)
+        sous_requetes += _candidats_sous_chaine(["email"], [saisie.lower()], limite)
+    elif chiffres and not re.search(r"[^\d\s+().-]", saisie):
+        sous_requetes += _candidats("tel", chiffres, limite)
+        sous_requetes += _candidats("tel_inv", chiffres[::-1], limite, RANG_SUFFIXE)
+        sous_requetes += _candidats("mf", chiffres, limite)
+        sous_requetes += _candidats_sous_chaine(["tel", "mf"], [chiffres], limite)
+    else:
+        mots = mots_nom(saisie)
+        if mots:
+            sous_requetes += _candidats_nom(mots, limite)
+            sous_requetes += _candidats_sous_chaine(["nom"], sorted(mots), limite)
+        matricule = normaliser_matricule(saisie)
+        if matricule:
+            sous_requetes += _candidats("mf", matricule, limite)
+            sous_requetes += _candidats_sous_chaine(["mf"], [matricule], limite)
+
+    clients = []
+    if sous_requetes:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT c.* FROM ({" UNION ALL ".join(requete for requete, _ in sous_requetes)}) candidats
+            JOIN clients c ON c.id = candidats.client_id
+            GROUP BY c.id
+            ORDER BY MIN(candidats.rang), MIN(candidats.cle), c.nom COLLATE NOCASE, c.id
+            LIMIT ?
+        """, [valeur for _, valeurs in sous_requetes for valeur in valeurs] + [limite])
+        clients = cursor.fetchall()
+
+    cache.ajouter(cle_cache, tuple(clients), version)
+    return clients
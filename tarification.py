@@ -0,0 +1,184 @@
+import math
+from gestion_articles import calculer_prix_vente_ttc, calculer_marge_brute, notifier_modifications_articles
+from cache_articles import invalider_articles
+from instrumentation import instrumenter
+
+try:
+    import numpy as np
+except ImportError:  # Dépendance facultative : sans NumPy, les tarifs sont calculés ligne par ligne
+    np = None
+
+
+FILTRES = ("categorie", "sous_categorie", "fournisseur", "tva")
+REGLES = ("nouvelle_tva", "conserver_ttc", "hausse_pct", "marge_cible", "arrondi")
+
+
+def _verifier(valeurs, autorisees, nature):
+    inconnues = set(valeurs) - set(autorisees)
+    if inconnues:
+        raise ValueError(f"{nature} inconnu(s) : {', '.join(sorted(inconnues))}")
+
+
+def selectionner_articles(conn, filtre):
+    """
+    Charge en une requête les articles actifs correspondant au filtre.
+    :param filtre: Dictionnaire parmi FILTRES (égalité stricte sur chaque colonne).
+    :return: Colonnes (ids, noms, tva, prix_vente_ht, prix_vente_ttc, marge_brute, prix_moyen_pondere,
+             prix_vente_min) sous forme de listes parallèles.
+    """
+    _verifier(filtre, FILTRES, "Filtre")
+    conditions = ["etat = 0"] + [f"{colonne} = ?" for colonne in filtre]
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, nom, COALESCE(tva, 0), COALESCE(prix_vente_ht, 0), COALESCE(prix_vente_ttc, 0),
+               COALESCE(marge_brute, 0), COALESCE(prix_moyen_pondere, 0), COALESCE(prix_vente_min, 0)
+        FROM articles WHERE {" AND ".join(conditions)} ORDER BY id
+    """, list(filtre.values()))
+    lignes = cursor.fetchall()
+    return [list(colonne) for colonne in zip(*lignes)] if lignes else [[] for _ in range(8)]
+
+
+def calculer_tarifs(colonnes, nouvelle_tva=None, conserver_ttc=False, hausse_pct=None, marge_cible=None,
+                    arrondi=None):
+    """
+    Calcule les nouveaux tarifs de toutes les lignes en une passe sur les colonnes, par des opérations
+    NumPy sur des colonnes entières si NumPy est installé, ligne par ligne sinon.
+    Les règles s'appliquent dans l'ordre : TVA, hausse, marge cible, arrondi.
+    Les deux calculs donnent les mêmes valeurs que calculer_prix_vente_ttc et calculer_marge_brute.
+
+    :param nouvelle_tva: Nouveau taux de TVA ; conserver_ttc garde alors le prix TTC en recalculant le HT.
+    :param hausse_pct: Hausse (ou baisse si négative) du prix HT en pourcentage.
+    :param marge_cible: Marge brute visée sur le prix moyen pondéré, en pourcentage.
+    :param arrondi: Pas du prix TTC (ex. 0.1) ; le TTC est arrondi au pas supérieur.
+    :return: Colonnes (tva, prix_vente_ht, prix_vente_ttc, marge_brute) recalculées, en listes.
+    """
+    regle = (nouvelle_tva, conserver_ttc, hausse_pct, marge_cible, arrondi)
+    if np is None:
+        return _calculer_tarifs_lignes(colonnes, *regle)
+    return [colonne.tolist() for colonne in _calculer_tarifs_colonnes(colonnes, *regle)]
+
+
+def _arrondir(valeurs, decimales=3):
+    """
+    Arrondit un tableau comme round() de Python. np.round multiplie avant d'arrondir, ce qui peut
+    faire basculer une valeur proche d'une demie : celles-là, peu nombreuses, sont arrondies par round().
+    """
+    resultat = np.round(valeurs, decimales)
+    echelle = valeurs * 10 ** decimales
+    douteuses = np.abs(echelle - np.floor(echelle) - 0.5) < 1e-6
+    if douteuses.any():
+        resultat[douteuses] = [round(valeur, decimales) for valeur in valeurs[douteuses].tolist()]
+    return resultat
+
+
+def _calculer_tarifs_colonnes(colonnes, nouvelle_tva, conserver_ttc, hausse_pct, marge_cible, arrondi):
+    """
+    Calcul de calculer_tarifs sur des tableaux NumPy.
+    """
+    tvas, prix_ht, prix_ttc, pmps = (np.asarray(colonnes[i], dtype="float64") for i in (2, 3, 4, 6))
+    if nouvelle_tva is not None:
+        if conserver_ttc:
+            prix_ht = prix_ttc / (1 + nouvelle_tva / 100)
+        tvas = np.full(len(tvas), nouvelle_tva, dtype="float64")
+    if hausse_pct is not None:
+        prix_ht = prix_ht * (1 + hausse_pct / 100)
+    if marge_cible is not None:
+        prix_ht = np.where(pmps != 0, pmps * (1 + marge_cible / 100), prix_ht)
+
+    prix_ht = _arrondir(prix_ht)
+    prix_ttc = _arrondir(prix_ht * (1 + tvas / 100))
+    if arrondi:
+        prix_ttc = _arrondir(np.ceil(_arrondir(prix_ttc / arrondi, 6)) * arrondi)
+        prix_ht = _arrondir(prix_ttc / (1 + tvas / 100))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        marges = np.where(pmps != 0, _arrondir((prix_ht - pmps) / np.where(pmps != 0, pmps, 1) * 100), 0.0)
+    return tvas, prix_ht, prix_ttc, marges
+
+
+def _calculer_tarifs_lignes(colonnes, nouvelle_tva, conserver_ttc, hausse_pct, marge_cible, arrondi):
+    """
+    Calcul de calculer_tarifs ligne par ligne, sans NumPy.
+    """
+    _, _, tvas, prix_ht, prix_ttc, _, pmps, _ = colonnes
+    if nouvelle_tva is not None:
+        if conserver_ttc:
+            prix_ht = [ttc / (1 + nouvelle_tva / 100) for ttc in prix_ttc]
+        tvas = [nouvelle_tva] * len(tvas)
+    if hausse_pct is not None:
+        prix_ht = [ht * (1 + hausse_pct / 100) for ht in prix_ht]
+    if marge_cible is not None:
+        prix_ht = [pmp * (1 + marge_cible / 100) if pmp else ht for ht, pmp in zip(prix_ht, pmps)]
+
+    prix_ht = [round(ht, 3) for ht in prix_ht]
+    if arrondi:
+        prix_ttc = [round(math.ceil(round(calculer_prix_vente_ttc(ht, tva) / arrondi, 6)) * arrondi, 3)
+                    for ht, tva in zip(prix_ht, tvas)]
+        prix_ht = [round(ttc / (1 + tva / 100), 3) for ttc, tva in zip(prix_ttc, tvas)]
+    else:
+        prix_ttc = [calculer_prix_vente_ttc(ht, tva) for ht, tva in zip(prix_ht, tvas)]
+    marges = [calculer_marge_brute(ht, pmp) for ht, pmp in zip(prix_ht, pmps)]
+    return tvas, prix_ht, prix_ttc, marges
+
+
+def _lignes_modifiees(anciens, nouveaux):
+    """
+    Positions des lignes dont au moins une des colonnes change.
+    """
+    if np is None:
+        return [i for i, valeurs in enumerate(zip(*nouveaux)) if valeurs != tuple(colonne[i] for colonne in anciens)]
+    modifiees = np.zeros(len(anciens[0]), dtype=bool)
+    for ancien, nouveau in zip(anciens, nouveaux):
+        modifiees |= np.asarray(ancien, dtype="float64") != np.asarray(nouveau, dtype="float64")
+    return np.nonzero(modifiees)[0].tolist()
+
+
+def simuler_tarification(conn, filtre, regle):
+    """
+    Calcule sans rien écrire l'effet d'une règle de tarification sur les articles filtrés.
+    :param filtre: Dictionnaire parmi FILTRES, ex. {"categorie": "Papeterie"}.
+    :param regle: Dictionnaire parmi REGLES, ex. {"hausse_pct": 5, "arrondi": 0.1}.
+    :return: Liste des articles dont le tarif change, chacun sous la forme
+             {"id", "nom", "tva", "prix_vente_ht", "prix_vente_ttc", "marge_brute": (ancien, nouveau),
+             "sous_prix_min": bool}.
+    """
+    _verifier(regle, REGLES, "Règle")
+    colonnes = selectionner_articles(conn, filtre)
+    ids, noms, tvas, prix_ht, prix_ttc, marges, _, prix_min = colonnes
+    nouveaux = calculer_tarifs(colonnes, **regle)
+
+    differences = []
+    for i in _lignes_modifiees((tvas, prix_ht, prix_ttc, marges), nouveaux):
+        anciens = (tvas[i], prix_ht[i], prix_ttc[i], marges[i])
+        valeurs = tuple(colonne[i] for colonne in nouveaux)
+        difference = {"id": ids[i], "nom": noms[i], "sous_prix_min": valeurs[1] < prix_min[i]}
+        for champ, ancien, nouveau in zip(("tva", "prix_vente_ht", "prix_vente_ttc", "marge_brute"),
+                                          anciens, valeurs):
+            difference[champ] = (ancien, nouveau)
+        differences.append(difference)
+    return differences
+
+
+@instrumenter
+def appliquer_tarification(conn, filtre, regle):
+    """
+    Applique une règle de tarification aux articles filtrés dans une seule transaction.
+    :return: Liste des différences appliquées (voir simuler_tarification).
+    """
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        differences = simuler_tarification(conn, filtre, regle)
+        conn.executemany("""
+            UPDATE articles SET tva = ?, prix_vente_ht = ?, prix_vente_ttc = ?, marge_brute = ? WHERE id = ?
+        """, [(d["tva"][1], d["prix_vente_ht"][1], d["prix_vente_ttc"][1], d["marge_brute"][1], d["id"])
+              for d in differences])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    article_ids = [difference["id"] for difference in differences]
+    if article_ids:
+        invalider_articles(conn, article_ids)
+        notifier_modifications_articles(article_ids)
+    return differences
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+from datetime import date
+import pytest
+from base_donnees import ouvrir_connexion
+from gestion_caisse import creer_vente, modifier_etat_vente
+from generateur_donnees import generer_base
+from archivage import archiver_ventes
+
+np = pytest.importorskip("numpy")
+from analyses_ventes import AnalysesVentes  # noqa: E402
+
+
+def _base(dossier):
+    chemin = os.path.join(dossier, "analyses.db")
+    generer_base(chemin, 40, 10, 400, annees=2, date_fin=date(2024, 12, 31))
+    return chemin
+
+
+def test_chargement_incremental(tmp_path):
+    chemin = _base(tmp_path)
+    conn = ouvrir_connexion(chemin)
+    analyses = AnalysesVentes(chemin)
+    nb_lignes = conn.execute("SELECT COUNT(*) FROM DES").fetchone()[0]
+    assert analyses.rafraichir(conn) == nb_lignes
+    assert analyses.rafraichir(conn) == 0
+
+    # Nouvelle vente : seule sa ligne est lue et ajoutée en fin de fichier, sans le réécrire ;
+    # les colonnes sont rouvertes en mmap par une autre instance
+    fichier = os.path.join(analyses.dossier, "quantite.col")
+    avant = os.stat(fichier)
+    creer_vente(conn, 1, [{"article_id": 1, "quantite": 2}], "cash")
+    assert analyses.rafraichir(conn) == 1
+    apres = os.stat(fichier)
+    assert apres.st_ino == avant.st_ino and apres.st_size == avant.st_size + 8
+    relues = AnalysesVentes(chemin)
+    assert len(relues) == nb_lignes + 1
+    assert isinstance(relues.colonnes["quantite"], np.memmap)
+    assert relues.rafraichir(conn) == 0
+    assert relues.top_articles(5) == analyses.top_articles(5)
+
+    # Ajout interrompu avant meta.json : les valeurs en trop sont ignorées puis tronquées
+    with open(fichier, "ab") as colonne:
+        colonne.write(b"\0" * 8)
+    assert len(AnalysesVentes(chemin)) == nb_lignes + 1
+    assert os.path.getsize(fichier) == apres.st_size
+    conn.close()
+
+
+def test_agregations(tmp_path):
+    chemin = _base(tmp_path)
+    conn = ouvrir_connexion(chemin)
+    analyses = AnalysesVentes(chemin)
+    analyses.rafraichir(conn)
+
+    # Comparaison avec les mêmes calculs en SQL
+    attendu = conn.execute("""
+        SELECT s.article_id, SUM(s.quantite) FROM DES s JOIN DAT d ON d.id = s.doc_id
+        WHERE d.etat IN (0, 1) AND d.doc_type IN (1, 2) AND d.doc_date BETWEEN '2024-01-01' AND '2024-06-30'
+        GROUP BY s.article_id ORDER BY 2 DESC, 1 LIMIT 5
+    """).fetchall()
+    top = analyses.top_articles(5, debut="2024-01-01", fin="2024-06-30")
+    assert [(article_id, int(quantite)) for article_id, quantite in top] == attendu
+
+    total = conn.execute("""
+        SELECT SUM(s.prix_total_ht) FROM DES s JOIN DAT d ON d.id = s.doc_id
+        WHERE d.etat IN (0, 1) AND d.doc_type IN (1, 2)
+    """).fetchone()[0]
+    categories = analyses.marge_par_categorie(conn)
+    assert abs(sum(total_ht for total_ht, _ in categories.values()) - total) < 0.01
+
+    classes = analyses.classification_abc()
+    assert set(classes.values()) <= {"A", "B", "C"} and classes[top[0][0]] == "A"
+    assert all(vitesse > 0 for vitesse in analyses.vitesse_ventes(30, fin="2024-12-31").values())
+
+    # Un document annulé sort des agrégations au rafraîchissement suivant
+    doc_id, article_id = conn.execute("""
+        SELECT d.id, s.article_id FROM DAT d JOIN DES s ON s.doc_id = d.id
+        WHERE d.etat IN (0, 1) AND d.doc_type = 1 LIMIT 1
+    """).fetchone()
+    avant = dict(analyses.top_articles(100))[article_id]
+    modifier_etat_vente(conn, doc_id, 9)
+    analyses.rafraichir(conn)
+    assert dict(analyses.top_articles(100)).get(article_id, 0) < avant
+    assert analyses.dernier_journal_id == conn.execute("SELECT MAX(id) FROM journal_etats_ventes").fetchone()[0]
+
+    # Changement fait par un autre programme : lu dans le journal, vu aussi après réouverture
+    autre = sqlite3.connect(chemin)
+    autre.execute("UPDATE DAT SET etat = 0 WHERE id = ?", (doc_id,))
+    autre.commit()
+    autre.close()
+    analyses.rafraichir(conn)
+    assert dict(analyses.top_articles(100))[article_id] == avant
+    relues = AnalysesVentes(chemin)
+    assert relues.rafraichir(conn) == 0
+    assert dict(relues.top_articles(100))[article_id] == avant
+    conn.close()
+
+
+def test_archives(tmp_path):
+    chemin = _base(tmp_path)
+    conn = ouvrir_connexion(chemin)
+    analyses = AnalysesVentes(chemin)
+    analyses.rafraichir(conn)
+    top = analyses.top_articles(10)
+    archiver_ventes(conn, "2024-06-30")
+
+    # Les lignes déjà chargées gardent leur état ; une analyse neuve relit les archives
+    analyses.rafraichir(conn)
+    assert analyses.top_articles(10) == top
+    neuve = AnalysesVentes(chemin, dossier=os.path.join(os.path.dirname(chemin), "neuve"))
+    assert neuve.rafraichir(conn) == len(analyses)
+    assert neuve.top_articles(10) == top
+    conn.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    for test in (test_chargement_incremental, test_agregations, test_archives):
+        with tempfile.TemporaryDirectory() as dossier:
+            test(dossier)
+    print("Tous les tests ont réussi.")
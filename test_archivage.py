@@ -0,0 +1,74 @@
+import os
+import tempfile
+from datetime import date
+from base_donnees import ouvrir_connexion
+from gestion_caisse import (
+    rechercher_vente,
+    rapport_periode,
+    reconstruire_resume_ventes,
+    reconstruire_stats_clients,
+    modifier_etat_vente,
+)
+from generateur_donnees import generer_base
+from archivage import archiver_ventes, fichier_archive
+
+
+def arrondir(lignes):
+    return [tuple(round(v, 3) if isinstance(v, float) else v for v in ligne) for ligne in lignes]
+
+
+def test_archivage(tmp_path):
+    dossier = str(tmp_path)
+    chemin = os.path.join(dossier, "caisse.db")
+    generer_base(chemin, 30, 10, 600, annees=3, date_fin=date(2024, 12, 31))
+    conn = ouvrir_connexion(chemin)
+    nb_documents = conn.execute("SELECT COUNT(*) FROM DAT").fetchone()[0]
+    nb_lignes = conn.execute("SELECT COUNT(*) FROM DES").fetchone()[0]
+    ancien = conn.execute("SELECT * FROM DAT WHERE doc_date < '2023-01-01' AND etat != 9 LIMIT 1").fetchone()
+    # Un document récent marqué archivé part aussi en archive
+    recent = conn.execute("SELECT id, doc_num, doc_date FROM DAT WHERE doc_date >= '2024-06-01' LIMIT 1").fetchone()
+    modifier_etat_vente(conn, recent[0], 2)
+    rapport_avant = rapport_periode(conn, "2022-01-01", "2024-12-31", "annee")
+    stats_avant = arrondir(conn.execute("SELECT * FROM stats_clients ORDER BY client_id").fetchall())
+
+    deplaces = archiver_ventes(conn, "2023-12-31")
+    assert set(deplaces) == {2022, 2023, 2024} and deplaces[2024] == 1
+    assert os.path.exists(os.path.join(dossier, fichier_archive(conn, 2022)))
+    assert conn.execute("SELECT MIN(doc_date) FROM DAT").fetchone()[0] >= "2024-01-01"
+    assert conn.execute("SELECT COUNT(*) FROM DAT").fetchone()[0] == nb_documents - sum(deplaces.values())
+    assert conn.execute("SELECT COUNT(*) FROM DES WHERE doc_id NOT IN (SELECT id FROM DAT)").fetchone()[0] == 0
+    nb_archives = 0
+    for annee in deplaces:
+        archive = ouvrir_connexion(os.path.join(dossier, fichier_archive(conn, annee)))
+        nb_archives += archive.execute("SELECT COUNT(*) FROM DES").fetchone()[0]
+        archive.close()
+    assert nb_archives + conn.execute("SELECT COUNT(*) FROM DES").fetchone()[0] == nb_lignes
+
+    # Recherche : base courante seule sans période, archives comprises avec une période
+    assert rechercher_vente(conn, "doc_num", ancien[2]) == []
+    assert rechercher_vente(conn, "doc_num", ancien[2], "2022-01-01", "2022-12-31") == [ancien]
+    assert rechercher_vente(conn, "doc_num", recent[1], date_debut=recent[2])[0][-1] == 2
+    assert rechercher_vente(conn, "doc_num", ancien[2], "2024-01-01") == []
+
+    # Les rapports, y compris après reconstruction du résumé, couvrent toujours l'historique
+    assert rapport_periode(conn, "2022-01-01", "2024-12-31", "annee") == rapport_avant
+    reconstruire_resume_ventes(conn)
+    rapport_apres = rapport_periode(conn, "2022-01-01", "2024-12-31", "annee")
+    assert [ligne[:3] + tuple(round(total, 3) for total in ligne[3:]) for ligne in rapport_apres] == \
+        [ligne[:3] + tuple(round(total, 3) for total in ligne[3:]) for ligne in rapport_avant]
+
+    # De même pour les statistiques des clients, recalculées depuis les archives
+    reconstruire_stats_clients(conn)
+    assert arrondir(conn.execute("SELECT * FROM stats_clients ORDER BY client_id").fetchall()) == stats_avant
+
+    # Relancer l'archivage ne déplace plus rien ; les documents d'une nouvelle clôture s'ajoutent
+    assert archiver_ventes(conn, "2023-12-31") == {}
+    assert archiver_ventes(conn, "2024-03-31", compacter=True)[2024] > 0
+    assert conn.execute("SELECT nb_documents FROM archives_ventes WHERE annee = 2024").fetchone()[0] > 1
+    conn.close()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as dossier:
+        test_archivage(dossier)
+    print("Tous les tests ont réussi.")
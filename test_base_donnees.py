@@ -0,0 +1,35 @@
+import os
+import tempfile
+import threading
+from base_donnees import ouvrir_connexion, obtenir_connexion, fermer_connexions
+
+
+def test_base_donnees():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+
+        # Pragmas appliqués à l'ouverture
+        conn = ouvrir_connexion(chemin)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+        conn.close()
+
+        # Connexion réutilisée d'une action à l'autre dans un même thread
+        assert obtenir_connexion(chemin) is obtenir_connexion(chemin)
+
+        # Une connexion distincte par thread
+        autres = []
+        thread = threading.Thread(target=lambda: autres.append(obtenir_connexion(chemin)))
+        thread.start()
+        thread.join()
+        assert autres[0] is not obtenir_connexion(chemin)
+
+        fermer_connexions()
+
+    print("Tous les tests ont réussi.")
+
+
+if __name__ == "__main__":
+    test_base_donnees()
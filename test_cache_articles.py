@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+from base_donnees import ouvrir_connexion
+from gestion_articles import (
+    initialiser_articles,
+    initialiser_codes_barres,
+    ajouter_article,
+    modifier_article,
+    ajouter_code_barre,
+    supprimer_code_barre,
+)
+from cache_articles import (
+    article_par_code_barre,
+    charger_index_codes_barres,
+    index_codes_barres,
+    cache_prix_articles,
+    prix_articles,
+)
+
+
+def test_index_codes_barres():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    initialiser_codes_barres(conn)
+    ajouter_article(conn, "Stylo", prix_vente_ht=2)
+    ajouter_article(conn, "Cahier", prix_vente_ht=5)
+    conn.executemany("INSERT INTO code_barres (article_id, code_barre) VALUES (?, ?)",
+                     [(1, "6191234567890"), (2, "6199876543210")])
+    conn.commit()
+
+    # Chargement en bloc au démarrage
+    charger_index_codes_barres(conn)
+    assert article_par_code_barre(conn, "6191234567890") == 1
+    assert article_par_code_barre(conn, "inconnu") is None
+
+    # Ajout et suppression répercutés sur l'index
+    ajouter_code_barre(conn, 2, "3001")
+    assert index_codes_barres(conn).articles["3001"] == 2
+    code_id = conn.execute("SELECT id FROM code_barres WHERE code_barre = '3001'").fetchone()[0]
+    supprimer_code_barre(conn, code_id)
+    assert article_par_code_barre(conn, "3001") is None
+
+    # Un code ajouté hors du module est trouvé en base puis mis en index
+    conn.execute("INSERT INTO code_barres (article_id, code_barre) VALUES (1, '4002')")
+    conn.commit()
+    assert article_par_code_barre(conn, "4002") == 1
+    assert "4002" in index_codes_barres(conn).articles
+
+    print("Tous les tests ont réussi.")
+    conn.close()
+
+
+def test_cache_prix_articles():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    ajouter_article(conn, "Stylo", stock=10, tva=19, prix_vente_min=1.5, prix_vente_ht=2)
+
+    assert prix_articles(conn, [1, 99]) == {1: (2.0, 19.0, 1.5, 10)}
+    cache = cache_prix_articles(conn)
+    assert 1 in cache.articles
+
+    # Une modification invalide l'entrée et incrémente la version
+    version = cache.version
+    modifier_article(conn, 1, prix_vente_ht=2.5)
+    assert cache.version > version and 1 not in cache.articles
+    assert prix_articles(conn, [1])[1][0] == 2.5
+
+    print("Tous les tests ont réussi.")
+    conn.close()
+
+
+def test_index_autre_connexion():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+        conn = ouvrir_connexion(chemin)
+        initialiser_articles(conn)
+        initialiser_codes_barres(conn)
+        ajouter_article(conn, "Stylo")
+        ajouter_article(conn, "Cahier")
+        ajouter_code_barre(conn, 1, "123")
+        ajouter_code_barre(conn, 1, "456")
+        charger_index_codes_barres(conn)
+        assert article_par_code_barre(conn, "123") == 1
+
+        # Codes déplacé et supprimé par une autre caisse : jamais résolus vers l'ancien article
+        autre = sqlite3.connect(chemin)
+        autre.execute("UPDATE code_barres SET article_id = 2 WHERE code_barre = '123'")
+        autre.execute("DELETE FROM code_barres WHERE code_barre = '456'")
+        autre.commit()
+        autre.close()
+        assert article_par_code_barre(conn, "123") == 2
+        assert article_par_code_barre(conn, "456") is None
+        assert index_codes_barres(conn).articles == {"123": 2}
+        conn.close()
+
+
+def test_cache_prix_autre_connexion():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+        conn = ouvrir_connexion(chemin)
+        initialiser_articles(conn)
+        ajouter_article(conn, "Stylo", stock=10, tva=19, prix_vente_ht=2)
+        assert prix_articles(conn, [1])[1][0] == 2.0
+
+        # Prix modifié par une autre caisse : jamais servi périmé, même aussitôt après
+        autre = sqlite3.connect(chemin)
+        autre.execute("UPDATE articles SET prix_vente_ht = 3 WHERE id = 1")
+        autre.commit()
+        autre.close()
+        assert prix_articles(conn, [1])[1][0] == 3.0
+        assert prix_articles(conn, [1])[1][0] == 3.0 and 1 in cache_prix_articles(conn).articles
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_index_codes_barres()
+    test_cache_prix_articles()
+    test_index_autre_connexion()
+    test_cache_prix_autre_connexion()
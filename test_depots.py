@@ -0,0 +1,54 @@
+from base_donnees import ouvrir_connexion
+from depots import TAILLES_LOTS, lots_par_ids, requete_par_ids
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients, ajouter_client, modifier_client, lister_clients_par_ids
+from gestion_articles import initialiser_articles, ajouter_article, modifier_article, lister_articles_par_ids
+from gestion_caisse import initialiser_vente, initialiser_detail_vente, creer_vente, lister_documents_par_ids
+from cache_articles import prix_articles
+
+
+def test_lots_par_ids():
+    lots = list(lots_par_ids(range(1, 1001)))
+    assert [len(lot) for lot in lots] == [512, 512]
+    assert lots[1][-1] == lots[1][-25] == 1000
+    assert list(lots_par_ids([3, 3, 5])) == [[3, 5] + [5] * 6]
+    assert list(lots_par_ids([])) == []
+
+
+def test_lecture_par_ids():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    for i in range(40):
+        ajouter_article(conn, f"Article {i}", stock=10, tva=19, prix_vente_ht=i + 1)
+    ajouter_client(conn, "Ali", email="ali@exemple.tn", telephone="22123456")
+
+    # Lignes nommées ; seules quelques requêtes distinctes quel que soit le nombre d'identifiants
+    requete_par_ids.cache_clear()
+    for nombre in range(1, 41):
+        articles = lister_articles_par_ids(conn, range(1, nombre + 1))
+        assert len(articles) == nombre
+    assert articles[40].prix_vente_ht == 40 and articles[40].nom == "Article 39"
+    assert requete_par_ids.cache_info().currsize <= len(TAILLES_LOTS)
+    assert prix_articles(conn, [2, 99]) == {2: (2, 19, 0, 10)}
+
+    # Modification partielle par une requête fixe : les champs à None gardent leur valeur
+    modifier_article(conn, 1, prix_vente_ht=5)
+    assert lister_articles_par_ids(conn, [1])[1][1:3] == ("Article 0", None)
+    assert lister_articles_par_ids(conn, [1])[1].prix_vente_ht == 5
+    modifier_client(conn, 1, adresse="Sfax")
+    client = lister_clients_par_ids(conn, [1, 2])[1]
+    assert (client.nom, client.adresse, client.telephone) == ("Ali", "Sfax", "22123456")
+
+    doc_num = creer_vente(conn, 1, [{"article_id": 1, "quantite": 1}], "cash", client_id=1)
+    assert lister_documents_par_ids(conn, [1])[1].doc_num == doc_num
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_lots_par_ids()
+    test_lecture_par_ids()
+    print("Tous les tests ont réussi.")
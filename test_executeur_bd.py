@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import time
+from base_donnees import ouvrir_connexion
+from executeur_bd import ExecuteurBD
+
+
+class FausseRacine:
+    """
+    Remplace la fenêtre Tk : les rappels planifiés par after sont exécutés par pomper().
+    """
+
+    def __init__(self):
+        self.rappels = {}
+        self.numero = 0
+
+    def after(self, delai, fonction, *args):
+        self.numero += 1
+        self.rappels[self.numero] = (fonction, args)
+        return self.numero
+
+    def after_cancel(self, numero):
+        self.rappels.pop(numero, None)
+
+    def pomper(self, condition, delai=5.0):
+        limite = time.monotonic() + delai
+        while not condition() and time.monotonic() < limite:
+            rappels, self.rappels = self.rappels, {}
+            for fonction, args in rappels.values():
+                fonction(*args)
+            time.sleep(0.005)
+        assert condition(), "Délai dépassé"
+
+
+def test_executeur_bd():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "caisse.db")
+        conn = ouvrir_connexion(chemin)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t (x) VALUES (?)", [(i,) for i in range(10)])
+        conn.commit()
+
+        racine = FausseRacine()
+        activite, resultats, erreurs, threads = [], [], [], []
+        executeur = ExecuteurBD(racine, chemin, sur_activite=activite.append)
+
+        # Résultat rendu dans le thread qui relève, requête exécutée sur le thread de l'exécuteur
+        def compter(c, minimum):
+            threads.append(threading.current_thread().name)
+            return c.execute("SELECT COUNT(*) FROM t WHERE x >= ?", (minimum,)).fetchone()[0]
+
+        executeur.soumettre(compter, 4, succes=resultats.append)
+        racine.pomper(lambda: resultats)
+        assert resultats == [6] and threads == ["executeur-bd"]
+
+        # Les demandes successives d'une même clé : seule la dernière est rendue
+        bloque = threading.Event()
+        executeur.soumettre(lambda c: bloque.wait(5), cle="tableau", succes=resultats.append)
+        for minimum in (1, 2, 3):
+            executeur.soumettre(compter, minimum, cle="tableau", succes=resultats.append)
+        assert executeur.occupe()
+        bloque.set()
+        racine.pomper(lambda: not executeur.occupe())
+        assert resultats == [6, 7]
+        assert activite[-2:] == [True, False]
+
+        # Erreurs rendues au rappel prévu, annulation explicite et appels transmis à l'interface
+        executeur.soumettre(lambda c: c.execute("SELECT * FROM absente"), erreur=erreurs.append)
+        executeur.soumettre(compter, 0, cle="tableau", succes=resultats.append)
+        executeur.annuler("tableau")
+        executeur.dans_interface(resultats.append, "appel")
+        racine.pomper(lambda: erreurs and not executeur.occupe() and "appel" in resultats)
+        assert "absente" in str(erreurs[0]) and resultats == [6, 7, "appel"]
+
+        executeur.arreter()
+        executeur._thread.join(5)
+        assert not executeur._thread.is_alive() and not racine.rappels
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_executeur_bd()
+    print("Tous les tests ont réussi.")
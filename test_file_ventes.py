@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+from base_donnees import ouvrir_connexion, fermer_connexions
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients
+from gestion_articles import initialiser_articles, ajouter_article
+from gestion_caisse import initialiser_vente, initialiser_detail_vente
+from file_ventes import FileVentes
+
+
+def _preparer_base(chemin):
+    conn = ouvrir_connexion(chemin)
+    initialiser_parametres(conn)
+    conn.execute("INSERT OR IGNORE INTO parametres (cle, valeur) VALUES ('sequence_devis', '0')")
+    conn.commit()
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    ajouter_article(conn, "Stylo", stock=100, prix_achat_ht=1, prix_vente_ht=2, tva=19)
+    return conn
+
+
+class _FileObservee(FileVentes):
+    """
+    File qui relève le contenu du journal après chaque réécriture.
+    """
+
+    def _reecrire_journal(self):
+        super()._reecrire_journal()
+        self.journaux = getattr(self, "journaux", [])
+        with open(self.chemin_journal, encoding="utf-8") as journal:
+            self.journaux.append([json.loads(ligne)["doc_num"] for ligne in journal])
+
+
+def test_file_ventes():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "caisse.db")
+        conn = _preparer_base(chemin)
+        stylo = conn.execute("SELECT id FROM articles").fetchone()[0]
+
+        file = FileVentes(chemin, taille_max=2, synchroniser=False)
+        premier = file.ajouter(1, [{"article_id": stylo, "quantite": 1}], "cash")
+        assert premier == "1-193"
+        file.vider()
+        assert conn.execute("SELECT COUNT(*) FROM DAT").fetchone()[0] == 1
+        assert os.path.getsize(file.chemin_journal) == 0
+
+        # Base verrouillée : les numéros du bloc déjà réservé restent disponibles, les tickets attendent,
+        # puis la file pleine refuse le suivant
+        verrou = ouvrir_connexion(chemin)
+        verrou.execute("BEGIN IMMEDIATE")
+        doc_nums = [file.ajouter(1, [{"article_id": stylo, "quantite": 2}], "carte") for _ in range(2)]
+        assert doc_nums == ["1-194", "1-195"]
+        try:
+            file.ajouter(1, [{"article_id": stylo, "quantite": 1}], "cash", timeout=0.1)
+            assert False, "La file pleine doit refuser le ticket"
+        except RuntimeError:
+            pass
+        assert file.en_attente() == 2
+
+        # Les tickets gardent le prix du moment où ils ont été acceptés
+        verrou.execute("UPDATE articles SET prix_vente_ht = 3 WHERE id = ?", (stylo,))
+        verrou.commit()
+        file.vider()
+        assert conn.execute("SELECT tot_htva FROM DAT WHERE doc_num = ?", (doc_nums[0],)).fetchone()[0] == 4
+        assert conn.execute("SELECT tot_htva FROM DAT WHERE doc_num = '1-196'").fetchone() is None
+        try:
+            file.ajouter(1, [{"article_id": 999, "quantite": 1}], "cash")
+            assert False, "Un article inconnu doit être refusé à l'acceptation"
+        except ValueError:
+            pass
+
+        # Un ticket refusé par la base est écarté sans bloquer les autres
+        ajouter_article(conn, "Gomme", stock=0, prix_achat_ht=1, prix_vente_ht=1, tva=19)
+        gomme = conn.execute("SELECT id FROM articles WHERE nom = 'Gomme'").fetchone()[0]
+        verrou.execute("BEGIN IMMEDIATE")
+        file.ajouter(1, [{"article_id": gomme, "quantite": 1}], "cash")
+        verrou.execute("DELETE FROM articles WHERE id = ?", (gomme,))
+        verrou.commit()
+        verrou.close()
+        file.arreter()
+        assert [doc_num for doc_num, _ in file.echecs] == ["1-196"]
+        assert conn.execute("SELECT stock FROM articles WHERE id = ?", (stylo,)).fetchone()[0] == 95
+        assert sorted(row[0] for row in conn.execute("SELECT doc_num FROM DAT")) == [premier] + doc_nums
+
+        # Attendre une file arrêtée ne bloque pas
+        attente = threading.Thread(target=file.vider, daemon=True)
+        attente.start()
+        attente.join(timeout=5)
+        assert not attente.is_alive()
+
+        # Reprise après arrêt brutal : seuls les tickets absents de DAT sont rejoués ; un ticket chiffré
+        # garde ses totaux, un ticket d'un ancien journal (sans lignes) est chiffré aux prix actuels
+        with open(file.chemin_journal, "w", encoding="utf-8") as journal:
+            for doc_num in (doc_nums[0], "3-1", "3-2"):
+                ticket = {"doc_num": doc_num, "doc_type": int(doc_num[0]), "mode_paiement": "cash",
+                          "articles": [{"article_id": stylo, "quantite": 5}], "client_id": None,
+                          "date_vente": "2024-03-01T10:00:00"}
+                if doc_num == "3-1":
+                    ticket.update(lignes=[[stylo, 5, 2, 0, 10, 11.9]], totaux=[10, 1.9, 11.9], timbre_fiscal=1)
+                journal.write(json.dumps(ticket) + "\n")
+        file = FileVentes(chemin, synchroniser=False)
+        assert file.recuperes == 2
+        file.arreter()
+        assert conn.execute("SELECT doc_date, doc_heure FROM DAT WHERE doc_num = '3-1'").fetchone() == ("2024-03-01",
+                                                                                                      "10:00:00")
+        assert conn.execute("SELECT tot_htva FROM DAT WHERE doc_num = '3-1'").fetchone()[0] == 10
+        assert conn.execute("SELECT tot_htva FROM DAT WHERE doc_num = '3-2'").fetchone()[0] == 15
+        assert conn.execute("SELECT stock FROM articles WHERE id = ?", (stylo,)).fetchone()[0] == 85
+        conn.close()
+        fermer_connexions()
+
+
+def test_journal_compacte(tmp_path):
+    chemin = os.path.join(tmp_path, "caisse.db")
+    conn = _preparer_base(chemin)
+    stylo = conn.execute("SELECT id FROM articles").fetchone()[0]
+
+    # Un lot par ticket : après le premier lot, le journal ne garde que le ticket encore en attente
+    file = _FileObservee(chemin, taille_lot=1, synchroniser=False)
+    file.ajouter(1, [{"article_id": stylo, "quantite": 1}], "cash")  # Réserve le bloc de numéros
+    file.vider()
+    file.journaux = []
+    verrou = ouvrir_connexion(chemin)
+    verrou.execute("BEGIN IMMEDIATE")
+    doc_nums = [file.ajouter(1, [{"article_id": stylo, "quantite": 1}], "cash") for _ in range(2)]
+    verrou.rollback()
+    verrou.close()
+    file.vider()
+    assert file.journaux == [[doc_nums[1]], []]
+    file.arreter()
+    conn.close()
+    fermer_connexions()
+
+
+if __name__ == "__main__":
+    test_file_ventes()
+    with tempfile.TemporaryDirectory() as dossier:
+        test_journal_compacte(dossier)
+    print("Tous les tests ont réussi.")
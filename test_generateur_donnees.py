@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from datetime import date
+from base_donnees import ouvrir_connexion
+from gestion_stock import verifier_stocks
+from gestion_caisse import CLES_SEQUENCES
+from generateur_donnees import generer_base, _code_ean13
+from benchmark import executer_benchmarks, enregistrer_resultats, comparer
+
+
+def _contenu(chemin):
+    conn = ouvrir_connexion(chemin)
+    contenu = {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+               for table in ("articles", "code_barres", "clients", "DAT", "DES", "parametres")}
+    conn.close()
+    return contenu
+
+
+def test_generation_reproductible(tmp_path):
+    dossier = str(tmp_path)
+    chemins = [os.path.join(dossier, nom) for nom in ("a.db", "b.db")]
+    for chemin in chemins:
+        resume = generer_base(chemin, 50, 20, 300, annees=1, date_fin=date(2024, 12, 31), taille_lot=70)
+        assert resume["ventes"] == 300
+    assert _contenu(chemins[0]) == _contenu(chemins[1])
+
+    conn = ouvrir_connexion(chemins[0])
+    assert verifier_stocks(conn) == []
+    premier, dernier = conn.execute("SELECT MIN(doc_date), MAX(doc_date) FROM DAT").fetchone()
+    assert "2024-01-01" <= premier <= dernier <= "2024-12-31"
+    # Résumé des ventes et séquences cohérents avec DAT
+    assert conn.execute("SELECT SUM(nb_documents) FROM resume_ventes").fetchone()[0] == \
+        conn.execute("SELECT COUNT(*) FROM DAT WHERE etat IN (0, 1)").fetchone()[0]
+    for doc_type, nombre in conn.execute("SELECT doc_type, COUNT(*) FROM DAT GROUP BY doc_type").fetchall():
+        assert conn.execute("SELECT valeur FROM parametres WHERE cle = ?",
+                            (CLES_SEQUENCES[doc_type],)).fetchone() == (str(nombre),)
+    conn.close()
+
+    # Une base déjà peuplée est refusée
+    try:
+        generer_base(chemins[0], 5, 5, 5)
+        assert False, "Une base non vide aurait dû être refusée"
+    except ValueError:
+        pass
+
+
+def test_code_ean13():
+    assert _code_ean13(1) == "6190000000019"
+    assert len({_code_ean13(numero) for numero in range(1, 1000)}) == 999
+
+
+def test_benchmark(tmp_path):
+    dossier = str(tmp_path)
+    chemin = os.path.join(dossier, "bench.db")
+    generer_base(chemin, 30, 10, 100, annees=1, date_fin=date(2024, 12, 31))
+    avant = _contenu(chemin)
+    resultats = executer_benchmarks(chemin, repetitions=2, taille_echantillon=5)
+    assert {"creer_vente", "rapport_journalier", "rechercher_vente", "rechercher_client",
+            "code_barre"} <= set(resultats)
+    assert resultats["creer_vente"]["appels"] == 10
+    # Les ventes mesurées sont faites sur une copie : la base mesurée est intacte
+    assert _contenu(chemin) == avant
+
+    sortie = os.path.join(dossier, "resultats.json")
+    enregistrer_resultats(sortie, resultats, "test")
+    with open(sortie, encoding="utf-8") as fichier:
+        contenu = json.load(fichier)
+    assert contenu["resultats"] == resultats
+    assert comparer(contenu, contenu) == []
+    lent = {"resultats": {mesure: dict(stats, mediane=stats["mediane"] * 2 + 1) for mesure, stats in resultats.items()}}
+    assert {mesure for mesure, _, _, _ in comparer(contenu, lent)} == set(resultats)
+
+
+if __name__ == "__main__":
+    for test in (test_generation_reproductible, test_benchmark):
+        with tempfile.TemporaryDirectory() as dossier:
+            test(dossier)
+    test_code_ean13()
+    print("Tous les tests ont réussi.")
@@ -0,0 +1,63 @@
+from base_donnees import ouvrir_connexion
+from gestion_articles import initialiser_articles, ajouter_article, modifier_article
+from cache_articles import prix_articles
+from gestion_achats import (initialiser_receptions, calculer_prix_moyen_pondere, creer_reception,
+                            creer_receptions_batch, lister_details_reception)
+
+
+def test_calculer_prix_moyen_pondere():
+    assert calculer_prix_moyen_pondere(10, 2, 10, 4) == 3
+    assert calculer_prix_moyen_pondere(0, 2, 5, 4) == 4
+    assert calculer_prix_moyen_pondere(-3, 2, 5, 4) == 4
+    assert calculer_prix_moyen_pondere(3, 0, 1, 4) == 4
+
+
+def test_receptions():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    initialiser_receptions(conn)
+    ajouter_article(conn, "Stylo", stock=10, prix_achat_ht=1, prix_vente_ht=2)
+    ajouter_article(conn, "Cahier", stock=0, prix_achat_ht=3, prix_vente_ht=5)
+    stylo, cahier = [ligne[0] for ligne in conn.execute("SELECT id FROM articles ORDER BY id")]
+    assert prix_articles(conn, [stylo])[stylo][3] == 10
+
+    reception_id = creer_reception(conn, [{"article_id": stylo, "quantite": 30, "prix_achat_ht": 1.4}],
+                                   fournisseur="F1", ref_document="BL-77")
+    ligne = conn.execute("SELECT stock, prix_moyen_pondere, prix_achat_ht, marge_brute FROM articles WHERE id = ?",
+                         (stylo,)).fetchone()
+    assert ligne == (40, 1.3, 1.4, 53.846)
+    assert lister_details_reception(conn, reception_id) == [(stylo, 30, 1.4, 1, 1.3)]
+    assert prix_articles(conn, [stylo])[stylo][3] == 40
+
+    # Plusieurs lignes d'un même article dans un lot : le PMP s'enchaîne ligne par ligne
+    ids = creer_receptions_batch(conn, [
+        {"lignes": [{"article_id": cahier, "quantite": 10, "prix_achat_ht": 2},
+                    {"article_id": stylo, "quantite": 10, "prix_achat_ht": 1.8}]},
+        {"lignes": [{"article_id": cahier, "quantite": 10, "prix_achat_ht": 4}]},
+    ])
+    assert len(ids) == 2
+    assert conn.execute("SELECT stock, prix_moyen_pondere FROM articles WHERE id = ?", (cahier,)).fetchone() == (20, 3)
+    assert conn.execute("SELECT stock, prix_moyen_pondere FROM articles WHERE id = ?", (stylo,)).fetchone() == (50, 1.4)
+    assert conn.execute("SELECT tot_ht FROM receptions WHERE id = ?", (ids[1],)).fetchone()[0] == 40
+
+    # Un lot invalide n'écrit rien
+    try:
+        creer_receptions_batch(conn, [{"lignes": [{"article_id": cahier, "quantite": 1, "prix_achat_ht": 1},
+                                                  {"article_id": 999, "quantite": 1, "prix_achat_ht": 1}]}])
+        assert False, "Un article inconnu doit annuler la réception"
+    except ValueError:
+        pass
+    assert conn.execute("SELECT stock FROM articles WHERE id = ?", (cahier,)).fetchone()[0] == 20
+    assert conn.execute("SELECT COUNT(*) FROM receptions").fetchone()[0] == 3
+
+    # Modifier le prix d'achat ne remplace plus le PMP
+    modifier_article(conn, cahier, prix_achat_ht=10)
+    assert conn.execute("SELECT prix_moyen_pondere, marge_brute FROM articles WHERE id = ?",
+                        (cahier,)).fetchone() == (3, 66.667)
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_calculer_prix_moyen_pondere()
+    test_receptions()
+    print("Tous les tests ont réussi.")
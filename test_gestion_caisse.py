@@ -1,8 +1,19 @@
 import sqlite3
+from base_donnees import ouvrir_connexion
+from gestion_articles import initialiser_articles, ajouter_article
+from gestion_parametres import initialiser_parametres, modifier_parametre
+from cache_articles import invalider_articles
+from gestion_clients import initialiser_clients, ajouter_client
 from gestion_caisse import (
     initialiser_vente,
     initialiser_detail_vente,
     creer_vente,
+    creer_ventes_batch,
+    reconstruire_resume_ventes,
+    reconstruire_stats_clients,
+    statistiques_client,
+    bl_impayes_client,
+    rapport_periode,
     modifier_etat_vente,
     rechercher_vente,
     rapport_journalier,
@@ -42,5 +53,156 @@ def test_gestion_caisse():
     conn.close()
 
 
+def test_creer_ventes_batch():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    ajouter_article(conn, "Stylo", stock=100, tva=19, prix_vente_ht=2)
+    ajouter_article(conn, "Cahier", stock=50, tva=7, prix_vente_ht=5)
+
+    ventes = [
+        {"doc_type": 1, "articles": [{"article_id": 1, "quantite": 2, "remise": 10}], "mode_paiement": "cash"},
+        {"doc_type": 2, "articles": [{"article_id": 1, "quantite": 1}, {"article_id": 2, "quantite": 3}],
+         "mode_paiement": "carte"},
+        {"doc_type": 1, "articles": [{"article_id": 2, "quantite": 1}], "mode_paiement": "cash"},
+    ]
+    assert creer_ventes_batch(conn, ventes) == ["1-193", "2-31", "1-194"]
+
+    # Lignes reliées à leur entête et stocks décrémentés
+    lignes = conn.execute("""
+        SELECT DAT.doc_num, COUNT(*) FROM DES JOIN DAT ON DAT.id = DES.doc_id GROUP BY DAT.doc_num
+    """).fetchall()
+    assert dict(lignes) == {"1-193": 1, "2-31": 2, "1-194": 1}
+    assert conn.execute("SELECT stock FROM articles ORDER BY id").fetchall() == [(97,), (46,)]
+    assert conn.execute("SELECT tot_htva FROM DAT WHERE doc_num = '1-193'").fetchone()[0] == 3.6
+
+    # Un article inconnu annule tout le lot
+    try:
+        creer_ventes_batch(conn, [ventes[0], {"doc_type": 1, "articles": [{"article_id": 99, "quantite": 1}],
+                                              "mode_paiement": "cash"}])
+        assert False, "Une erreur était attendue."
+    except ValueError:
+        pass
+    assert conn.execute("SELECT COUNT(*) FROM DAT").fetchone()[0] == 3
+    assert conn.execute("SELECT valeur FROM parametres WHERE cle = 'sequence_facture'").fetchone()[0] == "194"
+
+    # Timbre fiscal configuré ; TVA par défaut pour un article sans taux
+    modifier_parametre(conn, "timbre_fiscal", "0.6")
+    conn.execute("UPDATE articles SET tva = NULL WHERE id = 2")
+    conn.commit()
+    invalider_articles(conn)
+    doc_num = creer_vente(conn, 1, [{"article_id": 2, "quantite": 1}], "cash")
+    assert conn.execute("SELECT timbre_fiscal, tot_tva FROM DAT WHERE doc_num = ?", (doc_num,)).fetchone() == (0.6, 0.95)
+    conn.close()
+
+
+def arrondir(lignes):
+    return [tuple(round(v, 3) if isinstance(v, float) else v for v in ligne) for ligne in lignes]
+
+
+def test_resume_ventes():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    ajouter_article(conn, "Stylo", stock=100, tva=19, prix_vente_ht=2)
+
+    # Historique antérieur à la création du résumé
+    conn.execute("DROP TABLE resume_ventes")
+    conn.execute("""
+        INSERT INTO DAT (doc_type, doc_num, doc_date, doc_heure, mode_paiement, tot_htva, tot_tva, tot_ttc,
+                         timbre_fiscal, etat)
+        VALUES (1, '1-1', '2024-01-15', '10:00:00', 'cash', 10, 1.9, 11.9, 1, 1),
+               (1, '1-2', '2024-02-03', '10:00:00', 'cash', 20, 3.8, 23.8, 1, 9)
+    """)
+    conn.commit()
+    initialiser_vente(conn)
+    assert rapport_periode(conn, "2024-01-01", "2024-12-31", "annee") == [("2024", 1, 1, 10, 1.9, 11.9, 1)]
+
+    # Les ventes et changements d'état mettent le résumé à jour
+    articles = [{"article_id": 1, "quantite": 5}]
+    creer_vente(conn, 1, articles, "cash")
+    creer_vente(conn, 2, articles, "carte")
+    aujourdhui = conn.execute("SELECT MAX(doc_date) FROM DAT").fetchone()[0]
+    assert arrondir(rapport_journalier(conn, aujourdhui)) == [(1, 11.9, 1.9, 1), (2, 11.9, 1.9, 1)]
+
+    bl_id = conn.execute("SELECT id FROM DAT WHERE doc_type = 2").fetchone()[0]
+    modifier_etat_vente(conn, bl_id, 1)   # reste comptabilisé
+    modifier_etat_vente(conn, bl_id, 9)   # sort du résumé
+    assert arrondir(rapport_journalier(conn, aujourdhui)) == [(1, 11.9, 1.9, 1)]
+    modifier_etat_vente(conn, bl_id, 0)   # y revient
+    par_mode = rapport_periode(conn, aujourdhui, aujourdhui, par_mode_paiement=True)
+    assert [(ligne[1], ligne[2], ligne[3]) for ligne in par_mode] == [(1, "cash", 1), (2, "carte", 1)]
+
+    # Le résumé incrémental est identique à un recalcul complet
+    mois = arrondir(rapport_periode(conn, "2024-01-01", "2099-12-31", "mois"))
+    reconstruire_resume_ventes(conn)
+    assert arrondir(rapport_periode(conn, "2024-01-01", "2099-12-31", "mois")) == mois
+    conn.close()
+
+
+def test_stats_clients():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    ajouter_article(conn, "Stylo", stock=100, tva=19, prix_vente_ht=2)
+    ajouter_client(conn, "Ali Ben Salah", email="ali@exemple.tn", telephone="22123456")
+    client_id = conn.execute("SELECT MAX(id) FROM clients").fetchone()[0]
+
+    # Historique antérieur : une facture de l'an dernier
+    conn.execute("""
+        INSERT INTO DAT (doc_type, doc_num, doc_date, doc_heure, client_id, mode_paiement, tot_htva, tot_tva,
+                         tot_ttc, timbre_fiscal, etat)
+        VALUES (1, '1-1', '2023-03-10', '10:00:00', ?, 'cash', 10, 1.9, 11.9, 1, 1)
+    """, (client_id,))
+    conn.commit()
+    reconstruire_stats_clients(conn)
+
+    articles = [{"article_id": 1, "quantite": 5}]
+    creer_vente(conn, 1, articles, "cash", client_id=client_id)
+    creer_vente(conn, 2, articles, "carte", client_id=client_id)
+    creer_vente(conn, 1, articles, "cash")                        # sans client
+    aujourdhui = conn.execute("SELECT MAX(doc_date) FROM DAT").fetchone()[0]
+
+    stats = statistiques_client(conn, client_id, date_reference=aujourdhui)
+    assert (stats["nb_documents"], stats["derniere_date"], stats["nb_impayes"]) == (3, aujourdhui, 1)
+    assert round(stats["tot_ttc"], 3) == 35.7 and round(stats["panier_moyen"], 3) == 11.9
+    assert stats["nb_documents_periode"] == 2 and round(stats["tot_impayes"], 3) == 11.9
+    assert [ligne[2] for ligne in bl_impayes_client(conn, client_id)] == ["2-31"]
+
+    # Le BL réglé n'est plus impayé, puis son annulation le retire des achats
+    bl_id = conn.execute("SELECT id FROM DAT WHERE doc_type = 2").fetchone()[0]
+    modifier_etat_vente(conn, bl_id, 1)
+    assert statistiques_client(conn, client_id)["nb_impayes"] == 0
+    modifier_etat_vente(conn, bl_id, 9)
+    assert statistiques_client(conn, client_id)["nb_documents"] == 2
+    for doc_id, in conn.execute("SELECT id FROM DAT WHERE doc_date = ? AND client_id = ?",
+                                (aujourdhui, client_id)).fetchall():
+        modifier_etat_vente(conn, doc_id, 9)
+    stats = statistiques_client(conn, client_id, date_reference=aujourdhui)
+    assert (stats["nb_documents"], stats["derniere_date"], stats["nb_documents_periode"]) == (1, "2023-03-10", 0)
+
+    # Les statistiques incrémentales sont identiques à un recalcul complet
+    modifier_etat_vente(conn, bl_id, 0)
+    avant = statistiques_client(conn, client_id, date_reference=aujourdhui)
+    reconstruire_stats_clients(conn)
+    apres = statistiques_client(conn, client_id, date_reference=aujourdhui)
+    assert {cle: round(v, 3) if isinstance(v, float) else v for cle, v in apres.items()} == \
+        {cle: round(v, 3) if isinstance(v, float) else v for cle, v in avant.items()}
+    assert statistiques_client(conn, 999)["nb_documents"] == 0
+    conn.close()
+
+
 if __name__ == "__main__":
     test_gestion_caisse()
+    test_creer_ventes_batch()
+    test_resume_ventes()
+    test_stats_clients()
@@ -1,10 +1,17 @@
+import os
 import sqlite3
+import tempfile
+import threading
+from base_donnees import ouvrir_connexion
 from gestion_parametres import (
     initialiser_parametres,
     lire_parametre,
     modifier_parametre,
     ajouter_parametre,
     incremente_sequence,
+    obtenir_parametre,
+    cache_parametres,
+    AllocateurSequence,
 )
 
 def test_gestion_parametres():
@@ -38,5 +45,77 @@ def test_gestion_parametres():
     # Nettoyage
     conn.close()
 
+def test_allocateur_sequence():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+        conn = ouvrir_connexion(chemin)
+        initialiser_parametres(conn)
+
+        # Plusieurs caisses, chacune avec sa connexion, tirent des numéros en parallèle
+        numeros = []
+
+        def caisse():
+            conn_caisse = ouvrir_connexion(chemin)
+            allocateur = AllocateurSequence(conn_caisse, "sequence_bl", taille_bloc=10)
+            numeros.extend(allocateur.suivant() for _ in range(25))
+            conn_caisse.close()
+
+        threads = [threading.Thread(target=caisse) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(numeros) == len(set(numeros)) == 100
+        # 3 blocs de 10 réservés par caisse à partir de 30
+        assert lire_parametre(conn, "sequence_bl") == "150"
+
+        # Sans trou : le numéro est rendu si la transaction est annulée
+        allocateur = AllocateurSequence(conn, "sequence_facture", sans_trou=True)
+        assert allocateur.suivant() == 193
+        conn.rollback()
+        assert allocateur.suivant() == 193
+        conn.commit()
+        assert lire_parametre(conn, "sequence_facture") == "193"
+        conn.close()
+
+
+def test_cache_parametres():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+        conn = ouvrir_connexion(chemin)
+        initialiser_parametres(conn)
+
+        # Valeurs typées, lues en une requête puis depuis la mémoire
+        assert obtenir_parametre(conn, "tva_default") == 19.0
+        assert obtenir_parametre(conn, "theme_sombre") is True
+        assert obtenir_parametre(conn, "sequence_bl") == 30
+        assert obtenir_parametre(conn, "inexistant", "defaut") == "defaut"
+        cache = cache_parametres(conn)
+        valeurs = cache.obtenir(conn)
+        assert cache.obtenir(conn) is valeurs
+
+        # Une modification par la même connexion est vue aussitôt
+        modifier_parametre(conn, "timbre_fiscal", "0.6")
+        assert obtenir_parametre(conn, "timbre_fiscal") == 0.6
+
+        # Celle d'un autre processus (écriture directe), après la vérification de PRAGMA data_version
+        autre = sqlite3.connect(chemin)
+        autre.execute("UPDATE parametres SET valeur = 'false' WHERE cle = 'theme_sombre'")
+        autre.commit()
+        autre.close()
+        assert obtenir_parametre(conn, "theme_sombre") is True
+        cache.modifications.verifications[conn] = (cache.modifications.verifications[conn][0], 0.0)
+        assert obtenir_parametre(conn, "theme_sombre") is False
+        conn.close()
+
+        # Une connexion sqlite3 de base est aussi acceptée
+        brute = sqlite3.connect(chemin)
+        assert obtenir_parametre(brute, "tva_default") == 19.0
+        brute.close()
+
+
 if __name__ == "__main__":
     test_gestion_parametres()
+    test_allocateur_sequence()
+    test_cache_parametres()
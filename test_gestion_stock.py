@@ -0,0 +1,71 @@
+from datetime import datetime
+from base_donnees import ouvrir_connexion
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients
+from gestion_articles import initialiser_articles, ajouter_article, modifier_article, ajuster_stock
+from gestion_caisse import initialiser_vente, initialiser_detail_vente, creer_vente
+from gestion_achats import initialiser_receptions, creer_reception
+from gestion_stock import (initialiser_mouvements_stock, enregistrer_mouvements, creer_snapshots_stock,
+                           stock_a_date, verifier_stocks)
+
+
+def test_ouverture_registre():
+    conn = ouvrir_connexion(":memory:")
+    conn.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY, stock INTEGER)")
+    conn.executemany("INSERT INTO articles (id, stock) VALUES (?, ?)", [(1, 5), (2, 0), (3, -2)])
+    conn.commit()
+    initialiser_mouvements_stock(conn)
+    initialiser_mouvements_stock(conn)  # Sans effet une seconde fois
+    mouvements = conn.execute("SELECT article_id, type_mouvement, quantite FROM mouvements_stock ORDER BY id")
+    assert mouvements.fetchall() == [(1, "ouverture", 5), (3, "ouverture", -2)]
+    assert verifier_stocks(conn) == []
+    conn.close()
+
+
+def test_mouvements_stock():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    initialiser_receptions(conn)
+    ajouter_article(conn, "Stylo", stock=10, prix_achat_ht=1, prix_vente_ht=2)
+    ajouter_article(conn, "Cahier", prix_achat_ht=3, prix_vente_ht=5)
+    stylo, cahier = [ligne[0] for ligne in conn.execute("SELECT id FROM articles ORDER BY id")]
+
+    # Ventes, réceptions, ajustements et retours alimentent le registre et le compteur
+    creer_vente(conn, 1, [{"article_id": stylo, "quantite": 3}, {"article_id": stylo, "quantite": 1}], "cash")
+    creer_reception(conn, [{"article_id": cahier, "quantite": 8, "prix_achat_ht": 3}])
+    modifier_article(conn, cahier, stock=6)
+    assert ajuster_stock(conn, stylo, 2, "retour", reference_id=1) == 8
+    types = conn.execute("SELECT type_mouvement, quantite FROM mouvements_stock ORDER BY id").fetchall()
+    assert types == [("ouverture", 10), ("vente", -4), ("reception", 8), ("ajustement", -2), ("retour", 2)]
+    assert verifier_stocks(conn) == []
+
+    # Historique daté : photo du 2 janvier, puis stock à date par photo + mouvements suivants
+    cursor = conn.cursor()
+    enregistrer_mouvements(cursor, [(cahier, "reception", 5, None)], datetime(2020, 1, 1, 9))
+    enregistrer_mouvements(cursor, [(cahier, "vente", -2, None)], datetime(2020, 1, 3, 9))
+    enregistrer_mouvements(cursor, [(cahier, "vente", -1, None)], datetime(2020, 1, 3, 18))
+    conn.commit()
+    assert creer_snapshots_stock(conn, "2020-01-02") == 1
+    assert conn.execute("SELECT stock FROM snapshots_stock WHERE date_snapshot = '2020-01-02'").fetchone()[0] == 5
+    assert stock_a_date(conn, cahier, "2019-12-31") == 0
+    assert stock_a_date(conn, cahier, "2020-01-02") == 5
+    assert stock_a_date(conn, cahier, "2020-01-03") == 2
+    creer_snapshots_stock(conn, "2020-01-05")
+    assert stock_a_date(conn, cahier, "2020-01-06") == 2
+
+    # Le compteur articles.stock est vérifié puis corrigé depuis le registre
+    assert verifier_stocks(conn) == [(cahier, 6, 8)]
+    assert verifier_stocks(conn, corriger=True) == [(cahier, 6, 8)]
+    assert conn.execute("SELECT stock FROM articles WHERE id = ?", (cahier,)).fetchone()[0] == 8
+    assert verifier_stocks(conn) == []
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_ouverture_registre()
+    test_mouvements_stock()
+    print("Tous les tests ont réussi.")
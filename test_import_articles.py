@@ -0,0 +1,80 @@
+import os
+import tempfile
+from base_donnees import ouvrir_connexion
+from gestion_articles import initialiser_articles, initialiser_codes_barres, ajouter_article
+from cache_articles import article_par_code_barre, charger_index_codes_barres
+from import_articles import lire_catalogue_csv, importer_articles
+
+
+CATALOGUE = """nom;categorie;ref_fournisseur;tva;prix_achat_ht;prix_vente_ht;stock;codes_barres
+Stylo;Papeterie;REF-1;19;1,2;2;100;6190001|6190002
+Cahier;Papeterie;REF-2;7;3;5;50;6190003
+Gomme;;REF-3;19;abc;1;10;
+;Papeterie;REF-4;19;1;2;5;
+Crayon;Papeterie;REF-5;19;0,5;1;30;6190003
+Stylo;Papeterie;REF-1;19;1,2;2,5;;
+"""
+
+
+def test_importer_articles():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "catalogue.csv")
+        with open(chemin, "w", encoding="utf-8") as fichier:
+            fichier.write(CATALOGUE)
+
+        conn = ouvrir_connexion(":memory:")
+        initialiser_articles(conn)
+        initialiser_codes_barres(conn)
+        ajouter_article(conn, "Cahier", ref_fournisseur="REF-2", stock=7, prix_achat_ht=2.5, prix_vente_ht=4)
+        charger_index_codes_barres(conn)
+
+        avancement = []
+        rapport = importer_articles(conn, lire_catalogue_csv(chemin), cle="nom", taille_lot=3,
+                                    progression=lambda r: avancement.append(r["lues"]))
+
+        assert avancement == [3, 6]
+        totaux = (rapport["lues"], rapport["inserees"], rapport["mises_a_jour"], rapport["codes_barres"])
+        assert totaux == (6, 2, 2, 3)
+        assert sorted(numero for numero, _ in rapport["rejets"]) == [4, 5, 6]
+
+        # Calculs dérivés identiques à ajouter_article, champs absents conservés à la mise à jour
+        stylo = conn.execute("""
+            SELECT prix_vente_ht, prix_vente_ttc, marge_brute, prix_moyen_pondere, stock
+            FROM articles WHERE nom = 'Stylo'
+        """).fetchone()
+        assert stylo == (2.5, 2.975, 108.333, 1.2, 100)
+        cahier = conn.execute("SELECT stock, prix_moyen_pondere, prix_achat_ht FROM articles WHERE nom = 'Cahier'")
+        assert cahier.fetchone() == (50, 2.5, 3.0)
+
+        # Codes-barres rattachés et index mis à jour ; un code déjà attribué est rejeté
+        assert article_par_code_barre(conn, "6190002") == 2
+        assert article_par_code_barre(conn, "6190003") == 1
+        conn.close()
+
+    print("Tous les tests ont réussi.")
+
+
+def test_doublons_dans_un_lot():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    initialiser_codes_barres(conn)
+    charger_index_codes_barres(conn)
+    lignes = [
+        {"nom": "Stylo", "ref_fournisseur": "REF-1", "prix_vente_ht": "2", "codes_barres": "6190001"},
+        {"nom": "Stylo", "ref_fournisseur": "REF-2", "prix_vente_ht": "3", "codes_barres": ""},
+        {"nom": "Gomme", "ref_fournisseur": "REF-3", "prix_vente_ht": "1", "codes_barres": "6190001|6190009"},
+    ]
+    rapport = importer_articles(conn, enumerate(lignes, start=1), cle="ref_fournisseur", taille_lot=10)
+
+    # Le nom et le code-barre en double sont rejetés ligne par ligne, le reste du lot est importé
+    assert rapport["inserees"] == 2
+    assert sorted(numero for numero, _ in rapport["rejets"]) == [2, 3]
+    assert conn.execute("SELECT nom FROM articles ORDER BY id").fetchall() == [("Stylo",), ("Gomme",)]
+    assert article_par_code_barre(conn, "6190001") == 1
+    assert article_par_code_barre(conn, "6190009") == 2
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_importer_articles()
+    test_doublons_dans_un_lot()
@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from base_donnees import ouvrir_connexion
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients
+from gestion_articles import initialiser_articles, ajouter_article
+from gestion_caisse import initialiser_vente, initialiser_detail_vente, creer_vente, rapport_journalier
+from instrumentation import (Histogramme, ConnexionInstrumentee, forme_parametres, activer_instrumentation,
+                             desactiver_instrumentation, reinitialiser_mesures, obtenir_mesures, exporter_mesures)
+
+
+def test_histogramme():
+    histogramme = Histogramme()
+    for duree in (0.05, 0.3, 0.3, 4, 4000):
+        histogramme.ajouter(duree)
+    resume = histogramme.resume()
+    assert resume["nombre"] == 5 and resume["max_ms"] == 4000
+    assert resume["p50_ms"] == 0.5 and resume["p99_ms"] == 4000
+    assert resume["classes"]["<=0.1"] == 1 and resume["classes"][">2500"] == 1
+
+
+def test_forme_parametres():
+    assert forme_parametres((1, "a", None, 2.5)) == "(int, str, None, float)"
+    assert forme_parametres({"id": 3}) == "{id: int}"
+    assert forme_parametres([(1, "a"), (2, "b")], plusieurs=True) == "2 × (int, str)"
+
+
+def test_instrumentation():
+    reinitialiser_mesures()
+    activer_instrumentation(seuil_lent_ms=0)
+    try:
+        conn = ouvrir_connexion(":memory:")
+        assert isinstance(conn, ConnexionInstrumentee)
+        initialiser_parametres(conn)
+        initialiser_clients(conn)
+        initialiser_articles(conn)
+        initialiser_vente(conn)
+        initialiser_detail_vente(conn)
+        ajouter_article(conn, "Stylo", stock=10, prix_achat_ht=1, prix_vente_ht=2)
+        creer_vente(conn, 1, [{"article_id": 1, "quantite": 2}], "cash")
+        rapport_journalier(conn, "2024-01-01")
+        try:
+            conn.execute("SELECT * FROM table_absente WHERE id = ?", (1,))
+        except sqlite3.OperationalError:
+            pass
+        conn.close()
+    finally:
+        desactiver_instrumentation()
+
+    mesures = obtenir_mesures()
+    assert {"gestion_caisse.creer_vente", "gestion_caisse.creer_ventes_batch", "gestion_articles.ajouter_article",
+            "gestion_caisse.rapport_journalier"} <= set(mesures["fonctions"])
+    assert mesures["fonctions"]["gestion_caisse.creer_vente"]["nombre"] == 1
+    assert "SELECT * FROM table_absente WHERE id = ?" in mesures["requetes"]
+    assert mesures["compteurs"]["erreurs"] == 1
+    # Seuil à 0 : toutes les requêtes sont journalisées, avec la forme des paramètres et sans leurs valeurs
+    lente = [entree for entree in mesures["lentes"] if "table_absente" in entree["requete"]][0]
+    assert lente["parametres"] == "(int)" and lente["erreur"]
+
+    chemin = os.path.join(tempfile.mkdtemp(), "mesures.json")
+    exporter_mesures(chemin)
+    with open(chemin, encoding="utf-8") as fichier:
+        assert json.load(fichier)["fonctions"].keys() == mesures["fonctions"].keys()
+
+    # Désactivée : connexions ordinaires, plus aucune mesure
+    conn = ouvrir_connexion(":memory:")
+    assert not isinstance(conn, ConnexionInstrumentee)
+    conn.close()
+    reinitialiser_mesures()
+    assert obtenir_mesures()["requetes"] == {}
+
+
+def test_attente_verrou():
+    chemin = os.path.join(tempfile.mkdtemp(), "verrou.db")
+    reinitialiser_mesures()
+    activer_instrumentation()
+    try:
+        conn = ouvrir_connexion(chemin, timeout=2)
+        conn.execute("CREATE TABLE t (x)")
+        conn.commit()
+        verrouille = threading.Event()
+
+        def verrouiller():
+            bloquante = ouvrir_connexion(chemin)
+            bloquante.execute("BEGIN IMMEDIATE")
+            verrouille.set()
+            time.sleep(0.05)
+            bloquante.rollback()
+            bloquante.close()
+
+        thread = threading.Thread(target=verrouiller)
+        thread.start()
+        verrouille.wait()
+        conn.execute("BEGIN IMMEDIATE")  # Attend la fin du verrou de l'autre connexion
+        impatiente = ouvrir_connexion(chemin, timeout=0)
+        try:
+            impatiente.execute("BEGIN IMMEDIATE")
+            assert False, "La base aurait dû être occupée"
+        except sqlite3.OperationalError:
+            pass
+        conn.rollback()
+        thread.join()
+        conn.close()
+        impatiente.close()
+    finally:
+        desactiver_instrumentation()
+    compteurs = obtenir_mesures()["compteurs"]
+    assert compteurs["attentes_verrou"] == 1 and compteurs["duree_attentes_verrou_ms"] >= 40
+    assert compteurs["base_occupee"] == 1
+
+
+if __name__ == "__main__":
+    test_histogramme()
+    test_forme_parametres()
+    test_instrumentation()
+    test_attente_verrou()
+    print("Tous les tests ont réussi.")
@@ -0,0 +1,77 @@
+import sqlite3
+from base_donnees import ouvrir_connexion
+from migrations import MIGRATIONS, appliquer_migrations, version_schema
+from gestion_caisse import rapport_journalier
+
+
+def test_migrations():
+    conn = ouvrir_connexion(":memory:")
+
+    # Base existante à l'ancien schéma : doc_type en texte, pas de colonne etat, colonne cloture
+    conn.executescript("""
+        CREATE TABLE DAT (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doc_type TEXT NOT NULL,
+            doc_num INTEGER NOT NULL UNIQUE,
+            doc_date TEXT NOT NULL,
+            doc_heure TEXT NOT NULL,
+            client_id INTEGER DEFAULT NULL,
+            mode_paiement TEXT NOT NULL,
+            tot_htva REAL NOT NULL DEFAULT 0,
+            tot_tva REAL NOT NULL DEFAULT 0,
+            tot_ttc REAL NOT NULL DEFAULT 0,
+            timbre_fiscal REAL NOT NULL DEFAULT 0,
+            cloture INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO DAT (doc_type, doc_num, doc_date, doc_heure, mode_paiement, tot_htva, tot_tva, tot_ttc,
+                         timbre_fiscal, cloture)
+        VALUES ('facture', 202, '2024-11-28', '18:08:04', 'cash', 19.8, 2.79, 22.59, 1, 1);
+    """)
+
+    assert appliquer_migrations(conn) == [numero for numero, _, _ in MIGRATIONS]
+    assert version_schema(conn) == MIGRATIONS[-1][0]
+
+    # DAT reconstruite avec le schéma de référence, données et colonne supplémentaire conservées
+    colonnes = {ligne[1]: ligne[2] for ligne in conn.execute("PRAGMA table_info(DAT)")}
+    assert colonnes["doc_type"] == "INTEGER" and colonnes["doc_num"] == "TEXT"
+    assert "etat" in colonnes and "cloture" in colonnes
+    assert conn.execute("SELECT doc_type, doc_num, etat, cloture FROM DAT").fetchall() == [(1, "202", 0, 1)]
+    assert rapport_journalier(conn, "2024-11-28") == [(1, 22.59, 2.79, 1)]
+
+    # Index des chemins critiques créés et utilisés
+    index = {ligne[0] for ligne in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_dat_date_etat", "idx_des_doc", "idx_des_article", "idx_code_barres_article"} <= index
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM DES WHERE doc_id = 1").fetchall()
+    assert "idx_des_doc" in plan[0][-1]
+
+    # Rien n'est rejoué au lancement suivant
+    assert appliquer_migrations(conn) == []
+
+    print("Tous les tests ont réussi.")
+    conn.close()
+
+
+def test_migration_en_echec():
+    conn = ouvrir_connexion(":memory:")
+    # Nom déjà pris par une table : l'index de la migration 4 ne peut pas être créé
+    conn.execute("CREATE TABLE idx_details_reception_article (id INTEGER)")
+    conn.commit()
+    try:
+        appliquer_migrations(conn)
+        assert False, "Une erreur était attendue."
+    except sqlite3.Error as e:
+        assert "migration 4" in str(e)
+    assert version_schema(conn) == 3
+
+    # Une fois le conflit levé, la migration est rejouée avec les suivantes
+    conn.execute("DROP TABLE idx_details_reception_article")
+    conn.commit()
+    assert appliquer_migrations(conn) == [numero for numero, _, _ in MIGRATIONS if numero >= 4]
+    index = {ligne[0] for ligne in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_details_reception_article" in index
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_migrations()
+    test_migration_en_echec()
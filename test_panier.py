@@ -0,0 +1,89 @@
+from base_donnees import ouvrir_connexion
+from gestion_parametres import initialiser_parametres
+from gestion_clients import initialiser_clients
+from gestion_articles import initialiser_articles, ajouter_article
+from gestion_caisse import initialiser_vente, initialiser_detail_vente, rapport_journalier
+from panier import Panier, en_millimes, appliquer_taux
+
+
+def preparer_base():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_parametres(conn)
+    initialiser_clients(conn)
+    initialiser_articles(conn)
+    initialiser_vente(conn)
+    initialiser_detail_vente(conn)
+    ajouter_article(conn, "Stylo", stock=100, tva=19, prix_vente_ht=0.1, prix_vente_min=0.09)
+    ajouter_article(conn, "Cahier", stock=50, tva=7, prix_vente_ht=1.255)
+    return conn
+
+
+def test_conversions():
+    assert en_millimes(0.1) == 100 and en_millimes("1.2345") == 1235 and en_millimes(None) == 0
+    assert appliquer_taux(1255, 700) == 88    # 87.85 -> 88
+    assert appliquer_taux(-1255, 700) == -88
+
+
+def test_panier():
+    conn = preparer_base()
+    panier = Panier(conn)
+
+    # Dix scans d'un article à 0,100 : pas de dérive des flottants
+    for _ in range(10):
+        panier.ajouter(1)
+    panier.ajouter(2, 3)
+    assert panier.lignes[1].quantite == 10
+    assert (panier.total_ht, panier.total_tva, panier.total_ttc) == (4765, 454, 5219)
+    assert panier.totaux_par_taux() == {7.0: (3765, 264), 19.0: (1000, 190)}
+    assert panier.net_a_payer == 6219   # timbre fiscal de 1 dinar
+
+    # Remise dans la limite du prix minimum, puis au-delà
+    panier.appliquer_remise(1, 10)
+    assert panier.totaux_par_taux()[19.0] == (900, 171)
+    try:
+        panier.appliquer_remise(1, 15)
+        assert False, "Une erreur était attendue."
+    except ValueError:
+        pass
+    assert panier.lignes[1].remise == 1000
+
+    # Retrait et changement de quantité : totaux mis à jour sans tout recalculer
+    panier.modifier_quantite(2, 1)
+    panier.retirer(1)
+    assert list(panier.lignes) == [2] and (panier.total_ht, panier.total_tva) == (1255, 88)
+    assert panier.totaux_par_taux() == {7.0: (1255, 88)}
+    try:
+        panier.ajouter(99)
+        assert False, "Une erreur était attendue."
+    except ValueError:
+        pass
+    conn.close()
+
+
+def test_enregistrer_panier():
+    conn = preparer_base()
+    panier = Panier(conn)
+    for _ in range(3):
+        panier.ajouter(1)
+    panier.ajouter(2)
+    panier.appliquer_remise(2, 5)
+    totaux = (panier.total_ht, panier.total_tva, panier.total_ttc)
+
+    doc_num = panier.enregistrer(1, "cash")
+    assert not panier.lignes and panier.total_ttc == 0
+    document = conn.execute("SELECT tot_htva, tot_tva, tot_ttc, timbre_fiscal FROM DAT WHERE doc_num = ?",
+                            (doc_num,)).fetchone()
+    assert tuple(en_millimes(montant) for montant in document[:3]) == totaux and document[3] == 1
+    lignes = conn.execute("SELECT article_id, quantite, remise, prix_total_ht, prix_total_ttc FROM DES").fetchall()
+    assert lignes == [(1, 3, 0, 0.3, 0.357), (2, 1, 5, 1.192, 1.275)]
+    assert conn.execute("SELECT stock FROM articles ORDER BY id").fetchall() == [(97,), (49,)]
+    aujourdhui = conn.execute("SELECT doc_date FROM DAT").fetchone()[0]
+    assert en_millimes(rapport_journalier(conn, aujourdhui)[0][1]) == totaux[2]
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_conversions()
+    test_panier()
+    test_enregistrer_panier()
+    print("Tous les tests ont réussi.")
@@ -0,0 +1,43 @@
+from base_donnees import ouvrir_connexion
+from gestion_articles import initialiser_articles, ajouter_article, modifier_article, ajouter_code_barre
+from recherche_articles import initialiser_recherche_articles, rechercher_articles
+
+
+def noms(conn, terme):
+    return [article[1] for article in rechercher_articles(conn, terme)]
+
+
+def test_recherche_articles():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    ajouter_article(conn, "Crème hydratante", categorie="Beauté", ref_fournisseur="CR-220")
+    initialiser_recherche_articles(conn)  # Index rempli depuis les articles existants
+    ajouter_article(conn, "Crayon graphite", categorie="Papeterie", description="Mine HB")
+    ajouter_article(conn, "Cahier", categorie="Papeterie", description="96 pages, crème")
+
+    # Préfixe, sans accents ni casse, le nom étant mieux classé que la description
+    assert noms(conn, "creme") == ["Crème hydratante", "Cahier"]
+    assert noms(conn, "CRA") == ["Crayon graphite"]
+    assert noms(conn, "papet mine") == ["Crayon graphite"]
+    assert noms(conn, "cr 220") == ["Crème hydratante"]
+    assert noms(conn, "  ") == []
+
+    # Index tenu à jour par les déclencheurs
+    ajouter_code_barre(conn, 3, "6191234567890")
+    assert noms(conn, "619123") == ["Cahier"]
+    modifier_article(conn, 2, nom="Crayon de couleur")
+    assert noms(conn, "couleur") == ["Crayon de couleur"]
+    assert noms(conn, "graphite") == []
+
+    # Les articles supprimés sont exclus par défaut
+    conn.execute("UPDATE articles SET etat = 1 WHERE id = 3")
+    conn.commit()
+    assert noms(conn, "cahier") == []
+    assert len(list(rechercher_articles(conn, "cahier", inclure_supprimes=True))) == 1
+
+    print("Tous les tests ont réussi.")
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_recherche_articles()
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+from base_donnees import ouvrir_connexion
+from gestion_clients import initialiser_clients, ajouter_client, modifier_client, supprimer_client
+from recherche_clients import (chercher_clients, replier_texte, cles_client, initialiser_cles_clients,
+                               cache_recherche_clients)
+
+
+def _noms(clients):
+    return [client[1] for client in clients]
+
+
+def test_normalisation():
+    assert replier_texte("Hélène ÇA") == "helene ca"
+    assert sorted(cles_client("Hédi Ben Salah", "Hedi@Exemple.TN", "98 123 456", "1234567/A/M/000")) == [
+        ("email", "hedi@exemple.tn"), ("mf", "1234567AM000"), ("nom", "ben"), ("nom", "hedi"),
+        ("nom", "salah"), ("tel", "98123456"), ("tel_inv", "65432189"),
+    ]
+
+
+def test_chercher_clients():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_clients(conn)
+    ajouter_client(conn, "Hédi Ben Salah", email="Hedi@Exemple.tn", telephone="98123456",
+                   matricule_fiscale="1234567/A/M/000")
+    ajouter_client(conn, "Amira Bensalem", email="amira@exemple.tn", telephone="22123999")
+    ajouter_client(conn, "Ben", telephone="50000456")
+
+    # Nom : début de chaque mot, sans accents ni casse ; l'égalité exacte d'un mot passe en premier
+    assert _noms(chercher_clients(conn, "hedi")) == ["Hédi Ben Salah"]
+    assert _noms(chercher_clients(conn, "BEN")) == ["Ben", "Hédi Ben Salah", "Amira Bensalem"]
+    assert _noms(chercher_clients(conn, "sal hé")) == ["Hédi Ben Salah"]
+    assert chercher_clients(conn, "ben amira zz") == []
+
+    # Téléphone : début ou fin du numéro ; email sans casse ; matricule sans séparateurs
+    assert _noms(chercher_clients(conn, "22 12")) == ["Amira Bensalem"]
+    assert _noms(chercher_clients(conn, "456")) == ["Ben", "Hédi Ben Salah"]
+    assert _noms(chercher_clients(conn, "98123456")) == ["Hédi Ben Salah"]
+    assert _noms(chercher_clients(conn, "HEDI@exe")) == ["Hédi Ben Salah"]
+    assert _noms(chercher_clients(conn, "1234567a")) == ["Hédi Ben Salah"]
+    assert len(chercher_clients(conn, "ben", limite=2)) == 2
+
+    # Sous-chaînes d'au moins trois caractères, après les débuts et fins
+    assert _noms(chercher_clients(conn, "alem")) == ["Amira Bensalem"]
+    assert _noms(chercher_clients(conn, "sal")) == ["Hédi Ben Salah", "Amira Bensalem"]
+    assert _noms(chercher_clients(conn, "1239")) == ["Amira Bensalem"]
+    assert _noms(chercher_clients(conn, "@EXEMPLE.tn")) == ["Amira Bensalem", "Hédi Ben Salah"]
+    assert _noms(chercher_clients(conn, "567am")) == ["Hédi Ben Salah"]
+    assert chercher_clients(conn, "le") == []
+    assert chercher_clients(conn, "  ") == []
+
+    # Les modifications vident le cache et mettent les clés à jour
+    assert cache_recherche_clients(conn).resultats
+    hedi = chercher_clients(conn, "hedi")[0]
+    modifier_client(conn, hedi[0], nom="Hedi Trabelsi", telephone="71000000")
+    assert chercher_clients(conn, "salah") == []
+    assert _noms(chercher_clients(conn, "trab")) == ["Hedi Trabelsi"]
+    assert _noms(chercher_clients(conn, "7100")) == ["Hedi Trabelsi"]
+    supprimer_client(conn, hedi[0])
+    assert chercher_clients(conn, "trab") == []
+    assert conn.execute("SELECT COUNT(*) FROM cles_clients WHERE client_id = ?", (hedi[0],)).fetchone()[0] == 0
+    conn.close()
+
+
+def test_cache_autre_connexion():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "test.db")
+        conn = ouvrir_connexion(chemin)
+        initialiser_clients(conn)
+        ajouter_client(conn, "Sami Jaziri", telephone="20111222")
+        assert _noms(chercher_clients(conn, "sami")) == ["Sami Jaziri"]
+
+        # Client ajouté par une autre caisse : vu après la vérification de PRAGMA data_version
+        autre = ouvrir_connexion(chemin)
+        autre.registre_caches = {}
+        ajouter_client(autre, "Samia Kefi", telephone="20333444")
+        autre.close()
+        cache = cache_recherche_clients(conn)
+        assert _noms(chercher_clients(conn, "sami")) == ["Sami Jaziri"]
+        cache.modifications.verifications[conn] = (cache.modifications.verifications[conn][0], 0.0)
+        assert _noms(chercher_clients(conn, "sami")) == ["Sami Jaziri", "Samia Kefi"]
+        conn.close()
+
+
+def test_clients_existants():
+    conn = ouvrir_connexion(":memory:")
+    conn.execute("CREATE TABLE clients (id INTEGER PRIMARY KEY, nom TEXT, email TEXT, telephone TEXT, "
+                 "matricule_fiscale TEXT)")
+    conn.execute("INSERT INTO clients (nom, telephone) VALUES ('Leïla Gharbi', '55123123')")
+    conn.commit()
+    initialiser_cles_clients(conn)  # Clés calculées pour les clients déjà présents
+    assert _noms(chercher_clients(conn, "leila")) == ["Leïla Gharbi"]
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_normalisation()
+    test_chercher_clients()
+    test_cache_autre_connexion()
+    test_clients_existants()
+    print("Tous les tests ont réussi.")
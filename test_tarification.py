@@ -0,0 +1,83 @@
+import random
+import pytest
+from base_donnees import ouvrir_connexion
+from gestion_articles import (initialiser_articles, ajouter_article, abonner_modifications_articles,
+                              desabonner_modifications_articles)
+from cache_articles import prix_articles
+import tarification
+from tarification import simuler_tarification, appliquer_tarification
+
+
+def test_tarification():
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    ajouter_article(conn, "Stylo", categorie="Papeterie", fournisseur="F1", tva=19,
+                    prix_achat_ht=1, prix_vente_min=1.1, prix_vente_ht=2)
+    ajouter_article(conn, "Cahier", categorie="Papeterie", fournisseur="F2", tva=7,
+                    prix_achat_ht=3, prix_vente_ht=5)
+    ajouter_article(conn, "Lampe", categorie="Maison", fournisseur="F1", tva=19,
+                    prix_achat_ht=10, prix_vente_ht=15)
+    ids = {nom: article_id for article_id, nom in conn.execute("SELECT id, nom FROM articles")}
+
+    # Simulation : aucune écriture, seuls les articles filtrés apparaissent
+    differences = simuler_tarification(conn, {"categorie": "Papeterie"}, {"hausse_pct": 10})
+    assert [d["id"] for d in differences] == [ids["Stylo"], ids["Cahier"]]
+    assert differences[0]["prix_vente_ht"] == (2, 2.2)
+    assert differences[0]["prix_vente_ttc"] == (2.38, 2.618)
+    assert differences[0]["marge_brute"] == (100, 120)
+    assert conn.execute("SELECT prix_vente_ht FROM articles WHERE nom = 'Stylo'").fetchone()[0] == 2
+
+    # Changement de TVA à TTC constant, arrondi au pas de 0.1 et signalement du prix minimum
+    differences = simuler_tarification(conn, {"fournisseur": "F1", "tva": 19},
+                                       {"nouvelle_tva": 7, "conserver_ttc": True})
+    assert differences[0]["tva"] == (19, 7) and differences[0]["prix_vente_ttc"] == (2.38, 2.38)
+    differences = simuler_tarification(conn, {"fournisseur": "F1"},
+                                       {"marge_cible": 5, "arrondi": 0.1})
+    stylo = differences[0]
+    assert stylo["prix_vente_ttc"][1] == 1.3 and stylo["sous_prix_min"]
+
+    try:
+        simuler_tarification(conn, {"couleur": "rouge"}, {})
+        assert False, "Un filtre inconnu doit être refusé"
+    except ValueError:
+        pass
+
+    # Application en une transaction, cache invalidé et abonnés notifiés
+    assert prix_articles(conn, [ids["Lampe"]])[ids["Lampe"]][0] == 15
+    notifies = []
+    abonner_modifications_articles(notifies.extend)
+    try:
+        appliquees = appliquer_tarification(conn, {"fournisseur": "F1"}, {"nouvelle_tva": 13})
+    finally:
+        desabonner_modifications_articles(notifies.extend)
+    assert sorted(notifies) == sorted([ids["Stylo"], ids["Lampe"]]) == sorted(d["id"] for d in appliquees)
+    tva, ttc = conn.execute("SELECT tva, prix_vente_ttc FROM articles WHERE nom = 'Lampe'").fetchone()
+    assert (tva, ttc) == (13, 16.95)
+    assert prix_articles(conn, [ids["Lampe"]])[ids["Lampe"]][1] == 13
+    assert simuler_tarification(conn, {"fournisseur": "F1"}, {"nouvelle_tva": 13}) == []
+    conn.close()
+
+
+def test_calcul_par_colonnes(monkeypatch):
+    pytest.importorskip("numpy")
+    conn = ouvrir_connexion(":memory:")
+    initialiser_articles(conn)
+    aleatoire = random.Random(12)
+    for i in range(2000):
+        prix_achat_ht = aleatoire.choice([0, round(aleatoire.uniform(0.1, 500), 3)])
+        ajouter_article(conn, f"Article {i}", categorie="C", tva=aleatoire.choice([7, 13, 19]),
+                        prix_achat_ht=prix_achat_ht, prix_vente_ht=round(aleatoire.uniform(0.1, 800), 3))
+
+    # Mêmes différences avec NumPy et ligne par ligne, y compris sur les arrondis à la demie
+    regles = [{"hausse_pct": 10}, {"hausse_pct": -3.5, "arrondi": 0.1}, {"marge_cible": 25},
+              {"nouvelle_tva": 13, "conserver_ttc": True}, {"nouvelle_tva": 7, "arrondi": 0.5}]
+    par_colonnes = [simuler_tarification(conn, {"categorie": "C"}, regle) for regle in regles]
+    monkeypatch.setattr(tarification, "np", None)
+    assert [simuler_tarification(conn, {"categorie": "C"}, regle) for regle in regles] == par_colonnes
+    assert all(par_colonnes)
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_tarification()
+    print("Tous les tests ont réussi.")